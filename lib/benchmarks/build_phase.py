@@ -0,0 +1,40 @@
+"""
+Benchmarks the graph build phase of the ingestion with a rdflib Graph and a TripleBuffer.
+
+Run from the lib folder:
+
+    $ python -m benchmarks.build_phase --rows 1000000
+"""
+
+import argparse
+import time
+
+from pizza_services.processes.ingest_pizza import IngestPizza
+
+from .synthetic import SyntheticParser
+
+
+def time_build(rows: int, use_triple_buffer: bool) -> "tuple[float, int]":
+    start = time.perf_counter()
+    graph = IngestPizza(
+        SyntheticParser(rows), use_triple_buffer=use_triple_buffer
+    ).pizzas_graph
+    return time.perf_counter() - start, len(graph)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    graph_time, graph_triples = time_build(args.rows, use_triple_buffer=False)
+    print(f"rdflib Graph : {graph_time:8.2f}s {graph_triples} triples")
+
+    buffer_time, buffer_triples = time_build(args.rows, use_triple_buffer=True)
+    print(f"TripleBuffer : {buffer_time:8.2f}s {buffer_triples} triples")
+
+    print(f"speedup      : {graph_time / buffer_time:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Benchmarks each stage of the ingestion pipeline: parse -> model -> graph -> serialize -> upload.
+
+For each input size a synthetic pizzas.csv shaped file is written, then every stage is timed
+and its peak of python memory is recorded with tracemalloc. The serialize stage builds the
+insertGraph request body, which the upload stage sends as is to a local stub server. The
+results are written as JSON, so the results of two commits can be compared.
+
+Run from the lib folder:
+
+    $ python -m benchmarks.pipeline --rows 10000 100000 1000000 --output results.json
+    $ python -m benchmarks.pipeline --rows 10000 --compare results.json
+
+Timings include the tracemalloc overhead unless --no-memory is passed, so only compare
+results produced with the same options.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pizza_services.parsers.csv_parser import CsvParser
+from pizza_services.processes.ingest_pizza import IngestPizza
+from pizza_services.utils.em_http_client import EMHttpClient
+
+from .synthetic import SyntheticParser, write_synthetic_csv
+
+MAPPER = ["pizza_price", "pizza_name", "pizza_description", "pizza_id"]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Accepts every insertGraph request, like a fast Exchange Manager"""
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = b'{"status": "success"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class StageTimer:
+    """Times the stages of a run and records their peak of memory"""
+
+    def __init__(self, trace_memory: bool):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    def run(self, name: str, func, *args):
+        if self.trace_memory:
+            tracemalloc.start()
+
+        start = time.perf_counter()
+        result = func(*args)
+        stage = {"seconds": time.perf_counter() - start}
+
+        if self.trace_memory:
+            stage["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        self.stages[name] = stage
+        return result
+
+
+def git_commit() -> "str | None":
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, check=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(rows: int, em_base_url: str, trace_memory: bool) -> dict:
+    """Runs every stage of the pipeline over a synthetic csv file of the given size"""
+    timer = StageTimer(trace_memory)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "pizzas.csv")
+        write_synthetic_csv(path, rows)
+
+        rows_list = timer.run("parse", CsvParser(path, MAPPER).parse)
+
+    # batched, so nothing is built at init and each stage is timed separately
+    ingest_pizza = IngestPizza(SyntheticParser(0), batch_size=1)
+    # pylint: disable=protected-access
+    pizza_models = timer.run("model", ingest_pizza._mount_pizza_models, rows_list)
+    del rows_list
+    graph = timer.run("graph", ingest_pizza._mount_pizzas_graph, pizza_models)
+    del pizza_models
+
+    with EMHttpClient(em_base_url, "benchmark", "benchmark") as em_http_client:
+        payload = timer.run("serialize", em_http_client.serialize_graph, graph)
+        # the payload is already serialized, so only the request is timed
+        response = timer.run("upload", em_http_client.send_payload, payload)
+        response.raise_for_status()
+
+    return {
+        "rows": rows,
+        "triples": len(graph),
+        "payload_bytes": len(payload),
+        "stages": timer.stages,
+    }
+
+
+def compare(results: "list[dict]", baseline: "list[dict]", threshold: float) -> bool:
+    """Prints the ratio of each stage against the baseline, returns False on regressions"""
+    baseline_by_rows = {result["rows"]: result for result in baseline}
+    ok = True
+    for result in results:
+        previous = baseline_by_rows.get(result["rows"])
+        if previous is None:
+            continue
+        for stage, values in result["stages"].items():
+            previous_seconds = previous["stages"].get(stage, {}).get("seconds")
+            if not previous_seconds:
+                continue
+            ratio = values["seconds"] / previous_seconds
+            regression = ratio > threshold
+            ok = ok and not regression
+            print(
+                f"{result['rows']:>9} rows {stage:<10} {ratio:6.2f}x"
+                f"{'  REGRESSION' if regression else ''}"
+            )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--output", help="Path of the JSON results file")
+    parser.add_argument("--compare", help="Path of a previous JSON results file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="Slowdown ratio reported as a regression by --compare (default: 1.2)",
+    )
+    parser.add_argument("--no-memory", action="store_true", help="Do not trace memory")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    em_base_url = f"http://127.0.0.1:{server.server_port}"
+
+    results = []
+    try:
+        for rows in args.rows:
+            result = benchmark(rows, em_base_url, trace_memory=not args.no_memory)
+            results.append(result)
+            for stage, values in result["stages"].items():
+                peak = values.get("peak_bytes")
+                print(
+                    f"{rows:>9} rows {stage:<10} {values['seconds']:9.3f}s"
+                    + (f" {peak / 2**20:9.1f} MiB" if peak is not None else "")
+                )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "trace_memory": not args.no_memory,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as baseline:
+            if not compare(results, json.load(baseline)["results"], args.threshold):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
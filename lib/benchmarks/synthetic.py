@@ -0,0 +1,70 @@
+"""
+Synthetic pizzas.csv shaped data shared by the benchmarks.
+"""
+
+import csv
+import random
+from typing import Iterator
+
+from pizza_services.parsers.interfaces.parser_interface import ParserInterface
+
+TOPPINGS = [f"topping {index}" for index in range(200)]
+
+CSV_HEADER = [
+    "id",
+    "restaurant_id",
+    "restaurant_city",
+    "restaurant_zipcode",
+    "restaurant_province",
+    "pizza_id",
+    "pizza_price",
+    "pizza_name",
+    "pizza_description",
+]
+
+
+def iter_synthetic_rows(rows: int, seed: int = 42) -> "Iterator[dict]":
+    """Yields rows with the columns mapped by main.py, with reproducible random values"""
+    rng = random.Random(seed)
+    for index in range(rows):
+        yield {
+            "pizza_id": str(index),
+            "pizza_name": f"Pizza {index}",
+            "pizza_description": ",".join(rng.sample(TOPPINGS, rng.randint(0, 5))),
+            "pizza_price": f"{rng.uniform(5, 30):.2f}",
+        }
+
+
+def write_synthetic_csv(path: str, rows: int, seed: int = 42) -> None:
+    """Writes a csv file with the same columns as pizzas.csv"""
+    with open(path, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(CSV_HEADER)
+        for index, row in enumerate(iter_synthetic_rows(rows, seed)):
+            writer.writerow(
+                [
+                    index,
+                    f"restaurant-{index % 1000}",
+                    "Bend",
+                    "97701",
+                    "OR",
+                    row["pizza_id"],
+                    row["pizza_price"],
+                    row["pizza_name"],
+                    row["pizza_description"],
+                ]
+            )
+
+
+class SyntheticParser(ParserInterface):
+    """Generates the synthetic rows without touching the disk"""
+
+    def __init__(self, rows: int, seed: int = 42):
+        self.rows = rows
+        self.seed = seed
+
+    def parse(self) -> "list[dict]":
+        return list(self.iter_rows())
+
+    def iter_rows(self) -> "Iterator[dict]":
+        return iter_synthetic_rows(self.rows, self.seed)
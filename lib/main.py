@@ -1,50 +1,782 @@
 import argparse
+import json
 import logging
 import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from dotenv import load_dotenv
-from pizza_services.parsers.csv_parser import CsvParser
-from pizza_services.processes.ingest_pizza import IngestPizza
-from pizza_services.utils.em_http_client import EMHttpClient
+# the pizza_services modules are imported where they are used: rdflib and requests take most
+# of the startup time, and --help, --resume or a file export do not need all of them
+# pylint: disable=import-outside-toplevel
 
-# Cli Parser
-parse = argparse.ArgumentParser()
-parse.add_argument(
-    "-p", "--path", help="Path to the csv file to be parsed and ingested"
-)
-args = parse.parse_args()
+# batch size of the file exports, of the pipelined runs and of the cached payloads when no
+# --batch-size is given, so the whole graph is never held in memory
+EXPORT_BATCH_SIZE = 10000
 
+# names of PAYLOAD_FORMATS and SHARD_EXTENSIONS, listed here so parsing the arguments does not
+# import rdflib
+PAYLOAD_FORMAT_NAMES = ("json-ld", "n-triples", "turtle")
+OUTPUT_FORMAT_NAMES = ("json-ld", "n-triples", "turtle")
 
-# application configuration
-load_dotenv()  # take environment variables from .env.
-
-# basic loggin configuration
-logging.basicConfig(
-    level=logging.INFO,
-    handlers=[logging.StreamHandler()],
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+PIZZA_COLUMNS = ["pizza_price", "pizza_name", "pizza_description", "pizza_id"]
 
 logger = logging.getLogger(__name__)
 
-pizza_csv_parser = CsvParser(
-    args.path, ["pizza_price", "pizza_name", "pizza_description", "pizza_id"]
-)
 
+def _file_size(path: str) -> int:
+    """Returns the size of a file, 0 for the standard input or a missing file."""
+    if path == "-":
+        return 0
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def log_summaries(summaries: "list[dict]") -> None:
+    """Logs the summary of each ingested file, then the totals when there are several."""
+    for summary in summaries:
+        if "error" in summary:
+            logger.error("%s: failed, %s", summary["path"], summary["error"])
+            continue
+        logger.info(
+            "%s: %s row(s), %s triple(s), %d file byte(s), %.2fs, %d failed batch(es)",
+            summary["path"],
+            "-" if summary["rows"] is None else summary["rows"],
+            "-" if summary["triples"] is None else summary["triples"],
+            summary["file_bytes"],
+            summary["seconds"],
+            summary["failed_batches"],
+        )
+
+    if len(summaries) > 1:
+        ingested = [summary for summary in summaries if "error" not in summary]
+        logger.info(
+            "%d file(s) ingested, %d failed: %d row(s), %d file byte(s)",
+            len(ingested),
+            len(summaries) - len(ingested),
+            sum(summary["rows"] or 0 for summary in ingested),
+            sum(summary["file_bytes"] for summary in summaries),
+        )
+
+
+def write_summaries(summaries: "list[dict]", path: str) -> None:
+    """Writes the summary of each ingested file to a JSON file."""
+    with open(path, "w", encoding="utf-8") as output:
+        json.dump(summaries, output, indent=2)
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Builds the parser of the command line arguments"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-p",
+        "--path",
+        nargs="+",
+        help="Paths to the csv files to be parsed and ingested: files, directories (their csv "
+        "files), glob patterns (quoted, ** matches the subdirectories), or - to read stdin",
+    )
+    parser.add_argument(
+        "--file-workers",
+        type=int,
+        default=1,
+        help="Number of files ingested concurrently, the largest first, sharing the "
+        "connections and caches (default: 1)",
+    )
+    parser.add_argument(
+        "--summary-output",
+        help="Path of the JSON file the summary of each ingested file is written to: rows, "
+        "triples, bytes, time and failed batches",
+    )
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="Read a plain (not compressed) csv file through a memory map",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=1,
+        help="Number of processes parsing a plain (not compressed) csv file in chunks "
+        "(default: 1)",
+    )
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="With --parse-workers, ingest the parsed chunks as soon as they are ready instead "
+        "of in the order of the file",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=0,
+        help="Number of pizzas sent per insertGraph request (default: all pizzas in one request)",
+    )
+    parser.add_argument(
+        "--max-triples",
+        type=int,
+        default=0,
+        help="Maximum number of triples sent per insertGraph request (default: no limit)",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes building the graph (default: 1)",
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Load the pizzas of each batch in columns instead of one object per pizza",
+    )
+    parser.add_argument(
+        "--pipeline-depth",
+        type=int,
+        default=0,
+        help="Parse, build and upload the batches concurrently, with at most this number of "
+        "batches waiting between two stages (default: 0, the stages run one after the other)",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=1,
+        help="Maximum number of insertGraph requests sent concurrently (default: 1)",
+    )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="Gzip compress the insertGraph request bodies, or the shards written to --output-dir",
+    )
+    parser.add_argument(
+        "--direct-jsonld",
+        action="store_true",
+        help="Build the JSON-LD payloads directly from the pizzas instead of using rdflib",
+    )
+    parser.add_argument(
+        "--payload-format",
+        choices=PAYLOAD_FORMAT_NAMES,
+        default="json-ld",
+        help="Format of the graphs sent to the Exchange Manager. n-triples and turtle are "
+        "streamed in a chunked request body and require server support (default: json-ld)",
+    )
+    parser.add_argument(
+        "--state-db",
+        help="Path to the index of the pizzas already sent. When set only the new or changed "
+        "pizzas are sent",
+    )
+    parser.add_argument(
+        "--metrics-output",
+        help="Path of the file the run metrics are written to, in the Prometheus text format if "
+        "it ends with .prom and as JSON otherwise",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="Number of times a request is retried after a connection error or a 429, 502, 503 "
+        "or 504 response, with an exponential backoff (default: 3)",
+    )
+    parser.add_argument(
+        "--outbox",
+        help="Directory keeping the payload of each batch until it is accepted by the Exchange "
+        "Manager, so the failed batches can be sent again with --resume",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Send again the batches left in the --outbox directory, without parsing the csv",
+    )
+    parser.add_argument(
+        "--payload-cache",
+        help="Directory caching the payload of each batch, so the unchanged batches of a later "
+        "run are sent without building their graph again",
+    )
+    parser.add_argument(
+        "--payload-cache-size",
+        type=int,
+        default=1024,
+        help="Maximum size of the --payload-cache directory in MiB, the least recently used "
+        "payloads are removed beyond it (default: 1024)",
+    )
+    parser.add_argument(
+        "--track-jobs",
+        action="store_true",
+        help="Poll the status of each insertGraph request until the Exchange Manager processed "
+        "it, and report the throughput and completion latency",
+    )
+    parser.add_argument(
+        "--job-timeout",
+        type=float,
+        default=600.0,
+        help="With --track-jobs, seconds after which a request still being processed is given up "
+        "(default: 600)",
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="Write the graph to shard files in this directory instead of sending it to the "
+        "Exchange Manager",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=OUTPUT_FORMAT_NAMES,
+        default="n-triples",
+        help="Format of the shards written to --output-dir (default: n-triples)",
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=1_000_000,
+        help="Number of triples after which a new shard is started in --output-dir "
+        "(default: 1000000)",
+    )
+    parser.add_argument(
+        "--watch",
+        help="Run as a daemon ingesting each csv file dropped into this directory, keeping "
+        "the connections and caches warm between the files",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=2.0,
+        help="With --watch, seconds between two scans of the directory (default: 2)",
+    )
+    parser.add_argument(
+        "--archive-dir",
+        help="With --watch, directory the files are moved to once all their batches are "
+        "inserted",
+    )
+    return parser
+
+
+def parse_args(argv: "list[str]" = None) -> argparse.Namespace:
+    """
+    Parses and validates the command line arguments.
+
+    Args:
+        argv (list[str], optional): The arguments. Defaults to None (sys.argv).
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.resume and not args.outbox:
+        parser.error("--resume requires --outbox")
+    if args.resume and args.pipeline_depth:
+        parser.error("--pipeline-depth can not be used with --resume")
+    if args.direct_jsonld and args.payload_format != "json-ld":
+        parser.error("--direct-jsonld requires the json-ld --payload-format")
+    if args.output_dir and (args.outbox or args.resume or args.track_jobs):
+        parser.error(
+            "--outbox, --resume and --track-jobs can not be used with --output-dir"
+        )
+    if args.payload_cache and (
+        args.output_dir
+        or args.resume
+        or args.state_db
+        or args.max_triples
+        or args.workers > 1
+    ):
+        parser.error(
+            "--payload-cache can not be used with --output-dir, --resume, --state-db, "
+            "--max-triples and --workers"
+        )
+    if args.state_db and (args.direct_jsonld or args.workers > 1 or args.columnar):
+        parser.error(
+            "--state-db can not be used with --direct-jsonld, --workers and --columnar"
+        )
+    if args.columnar and args.max_triples:
+        parser.error("--columnar can not be used with --max-triples")
+    if args.direct_jsonld and args.max_triples:
+        parser.error("--direct-jsonld can not be used with --max-triples")
+    if args.output_dir and args.direct_jsonld and args.output_format != "json-ld":
+        parser.error("--direct-jsonld requires the json-ld --output-format")
+    if args.watch and (args.path or args.resume):
+        parser.error("--watch can not be used with --path and --resume")
+    if args.archive_dir and not args.watch:
+        parser.error("--archive-dir requires --watch")
+    if not (args.path or args.resume or args.watch):
+        parser.error("one of --path, --resume or --watch is required")
+    if args.path and "-" in args.path and len(args.path) > 1:
+        parser.error("- (stdin) can not be ingested with other files")
+    if args.file_workers < 1:
+        parser.error("--file-workers must be at least 1")
+    return args
+
+
+class IngestionRunner:
+    """
+    Ingests csv files into the output sink of a run.
+
+    The sink, with the connection pool of the http client, the job tracker, the state index,
+    the payload cache and the topping nodes already added are created once and shared by every
+    file ingested by the runner, including the files ingested concurrently.
+    """
+
+    def __init__(self, args: argparse.Namespace):
+        """
+        Initializes the IngestionRunner class, creating the output sink of the run.
+
+        Args:
+            args (argparse.Namespace): The command line arguments.
+        """
+        self.args = args
+        self.metrics = None
+        if args.metrics_output:
+            from pizza_services.utils.metrics import Metrics
+
+            self.metrics = Metrics()
+
+        self.em_http_client = None
+        if args.output_dir:
+            from pizza_services.utils.file_sink import FileSink
+
+            self.output_sink = FileSink(
+                args.output_dir,
+                output_format=args.output_format,
+                shard_size=args.shard_size,
+                compress=args.gzip,
+                metrics=self.metrics,
+            )
+            self.destination = args.output_dir
+        else:
+            self.em_http_client = self._create_em_http_client()
+            self.output_sink = self.em_http_client
+            self.destination = "Exchange Manager"
+
+        self.job_tracker = None
+        if args.track_jobs:
+            from pizza_services.utils.job_tracker import JobTracker
+
+            self.job_tracker = JobTracker(
+                self.em_http_client, timeout=args.job_timeout, metrics=self.metrics
+            )
+
+        self.state_index = None
+        if args.state_db:
+            from pizza_services.utils.state_index import StateIndex
+
+            self.state_index = StateIndex(args.state_db)
+
+        self.topping_registry = None
+        if not args.resume:
+            from pizza_services.models.topping_registry import ToppingRegistry
+
+            # a topping is registered once a batch carrying its node is inserted, so the
+            # batches after a failed one still carry the node
+            self.topping_registry = ToppingRegistry(deferred=True)
+
+        self.payload_cache = None
+        if args.payload_cache:
+            from pizza_services.utils.payload_cache import PayloadCache
+
+            self.payload_cache = PayloadCache(
+                args.payload_cache,
+                max_bytes=args.payload_cache_size << 20,
+                metrics=self.metrics,
+            )
+
+    def _create_em_http_client(self):
+        """Creates the Exchange Manager client, configured by the environment."""
+        from dotenv import load_dotenv
+        from pizza_services.utils.em_http_client import EMHttpClient
+        from pizza_services.utils.outbox import Outbox
+
+        load_dotenv()  # take environment variables from .env.
+
+        args = self.args
+        payload_format = None
+        if args.payload_format != "json-ld":
+            from pizza_services.utils.payload_formats import PAYLOAD_FORMATS
+
+            payload_format = PAYLOAD_FORMATS[args.payload_format]()
+
+        return EMHttpClient(
+            em_base_url=os.getenv("EM_BASE_URL"),
+            em_api_key=os.getenv("EM_API_KEY"),
+            em_client_name=os.getenv("EM_CLIENT_NAME"),
+            # the files ingested concurrently share the pool, each with its requests in flight
+            pool_size=max(args.max_in_flight, 1) * args.file_workers,
+            compress=args.gzip,
+            metrics=self.metrics,
+            retries=args.retries,
+            outbox=Outbox(args.outbox) if args.outbox else None,
+            payload_format=payload_format,
+        )
+
+    def _log_graphs(self, graphs, source: str):
+        """Logs each graph batch as it is handed to the output sink"""
+        for batch_number, graph in enumerate(graphs, start=1):
+            logger.info(
+                "Inserting graph batch %d of %s into %s",
+                batch_number,
+                source,
+                self.destination,
+            )
+            yield graph
+
+    def resume(self) -> int:
+        """
+        Sends again the batches left in the outbox.
+
+        Returns:
+            int: The number of batches that failed again.
+        """
+        outbox = self.em_http_client.outbox
+        logger.info("Sending again the %d batch(es) of the outbox", len(outbox))
+        responses = self.em_http_client.replay_outbox(
+            max_in_flight=self.args.max_in_flight
+        )
+        return self._handle_responses(responses, None, "the outbox")
+
+    def ingest_files(self, paths: "list[str]") -> "list[dict]":
+        """
+        Ingests several csv files in a pool of --file-workers threads.
+
+        The files are handed to the threads largest first: each thread takes the next file as
+        soon as it is done with the previous one, so the small files fill the gaps left by the
+        large ones and the run ends soon after its largest file.
+
+        Args:
+            paths (list[str]): The paths to the csv files.
+
+        Returns:
+            list[dict]: The summary of each file, in the order of the paths.
+        """
+        sizes = {path: _file_size(path) for path in paths}
+        scheduled = sorted(paths, key=lambda path: sizes[path], reverse=True)
+        if len(paths) > 1:
+            logger.info(
+                "Ingesting %d files with %d worker(s)",
+                len(paths),
+                self.args.file_workers,
+            )
+
+        summaries = {}
+        with ThreadPoolExecutor(max_workers=self.args.file_workers) as executor:
+            futures = {
+                executor.submit(self._ingest_safely, path): path for path in scheduled
+            }
+            for future in as_completed(futures):
+                summaries[futures[future]] = future.result()
+        return [summaries[path] for path in paths]
+
+    def _ingest_safely(self, path: str) -> dict:
+        """Ingests a file, recording the error in its summary if it fails."""
+        try:
+            return self.ingest(path)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.exception("Error ingesting %s", path)
+            return {"path": path, "file_bytes": _file_size(path), "error": str(e)}
+
+    def ingest(self, path: str) -> dict:
+        """
+        Parses a csv file and inserts its pizzas into the output sink.
+
+        Args:
+            path (str): The path to the csv file, - to read stdin.
+
+        Returns:
+            dict: The summary of the file: the rows, triples and batches (None if they are not
+            counted, e.g. with --direct-jsonld), the size of the file, the seconds spent and
+            the number of failed batches.
+        """
+        from pizza_services.utils.metrics import CountingMetrics, ScopedMetrics
+
+        start = time.perf_counter()
+        args = self.args
+        if self.metrics is not None:
+            # the metrics of the file are also recorded in the metrics of the run
+            metrics = ScopedMetrics(self.metrics)
+        else:
+            # only the counters of the summary, the per pizza timers are not worth their cost
+            metrics = CountingMetrics()
+        source = "stdin" if path == "-" else path
+        if args.parse_workers > 1:
+            from pizza_services.parsers.parallel_csv_parser import ParallelCsvParser
+
+            pizza_csv_parser = ParallelCsvParser(
+                path,
+                PIZZA_COLUMNS,
+                workers=args.parse_workers,
+                ordered=not args.unordered,
+                metrics=metrics,
+            )
+        else:
+            from pizza_services.parsers.csv_parser import CsvParser
+
+            pizza_csv_parser = CsvParser(
+                path, PIZZA_COLUMNS, metrics=metrics, use_mmap=args.mmap
+            )
+
+        ingest_options = {
+            "batch_size": args.batch_size
+            or (
+                EXPORT_BATCH_SIZE
+                if args.output_dir or args.pipeline_depth or args.payload_cache
+                else 0
+            ),
+            "max_triples": args.max_triples,
+            "workers": args.workers,
+            "columnar": args.columnar,
+            "state_index": self.state_index,
+            "topping_registry": self.topping_registry,
+        }
+
+        if args.pipeline_depth:
+            from pizza_services.processes.ingest_pipeline import IngestPipeline
+
+            ingest_pipeline = IngestPipeline(
+                pizza_csv_parser,
+                self.output_sink,
+                queue_depth=args.pipeline_depth,
+                max_in_flight=args.max_in_flight,
+                direct_jsonld=args.direct_jsonld,
+                payload_cache=self.payload_cache,
+                metrics=metrics,
+                **ingest_options,
+            )
+            ingest_pizza = ingest_pipeline.ingest_pizza
+            responses = ingest_pipeline.run(
+                self._log_graphs(ingest_pipeline.batches(), source)
+            )
+        else:
+            from pizza_services.processes.ingest_pizza import IngestPizza
+
+            ingest_pizza = IngestPizza(
+                parser_service=pizza_csv_parser, metrics=metrics, **ingest_options
+            )
+            if self.payload_cache is not None:
+                responses = self.em_http_client.insert_payloads(
+                    self._log_graphs(
+                        ingest_pizza.iter_payloads(
+                            self.em_http_client, self.payload_cache, args.direct_jsonld
+                        ),
+                        source,
+                    ),
+                    max_in_flight=args.max_in_flight,
+                )
+            elif args.direct_jsonld:
+                responses = self.output_sink.insert_jsonld_graphs(
+                    self._log_graphs(ingest_pizza.iter_jsonld(), source),
+                    max_in_flight=args.max_in_flight,
+                )
+            else:
+                responses = self.output_sink.insert_graphs(
+                    self._log_graphs(ingest_pizza.iter_graphs(), source),
+                    max_in_flight=args.max_in_flight,
+                )
+
+        failed_batches = self._handle_responses(responses, ingest_pizza, source)
+        if self.state_index is not None:
+            logger.info(
+                "%d unchanged pizza(s) of %s skipped",
+                ingest_pizza.skipped_pizzas,
+                source,
+            )
+
+        counters = metrics.to_dict()["counters"]
+        return {
+            "path": path,
+            "rows": counters.get("csv_rows"),
+            "triples": counters.get("triples"),
+            "file_bytes": _file_size(path),
+            "batches": counters.get("graphs"),
+            "failed_batches": failed_batches,
+            "seconds": time.perf_counter() - start,
+        }
+
+    def _handle_responses(self, responses, ingest_pizza, source: str) -> int:
+        """Logs the result of each batch, returning the number of failed batches."""
+        failed_batches = 0
+        for batch_number, response in enumerate(responses, start=1):
+            inserted = self.output_sink.is_success(response)
+            if ingest_pizza is not None:
+                ingest_pizza.acknowledge_batch(sent=inserted)
+
+            if inserted:
+                logger.info(
+                    "Graph batch %d of %s inserted successfully", batch_number, source
+                )
+                if self.job_tracker is not None:
+                    try:
+                        self.job_tracker.track(response, submitted_at=response.sent_at)
+                    except ValueError as e:
+                        logger.warning(
+                            "Graph batch %d of %s can not be tracked: %s",
+                            batch_number,
+                            source,
+                            e,
+                        )
+            else:
+                failed_batches += 1
+                logger.error(
+                    "Error inserting the graph batch %d of %s into %s",
+                    batch_number,
+                    source,
+                    self.destination,
+                )
+                # no response when the request could not be sent
+                if self.em_http_client is not None and response is not None:
+                    logger.error("Response: %s", response.text)
+
+        if failed_batches:
+            logger.error(
+                "%d graph batch(es) of %s failed to be inserted", failed_batches, source
+            )
+            if self.args.outbox:
+                logger.error(
+                    "Send them again with --outbox %s --resume", self.args.outbox
+                )
+        return failed_batches
+
+    def write_metrics(self) -> None:
+        """Writes the metrics of the run so far, if they are recorded."""
+        if self.metrics is not None:
+            self.metrics.write(self.args.metrics_output)
+            logger.info("Metrics written to %s", self.args.metrics_output)
+
+    def close(self) -> None:
+        """Waits for the tracked jobs, then releases the resources of the run."""
+        job_tracker = self.job_tracker
+        if job_tracker is not None:
+            logger.info("Waiting for the Exchange Manager to process the requests")
+            job_tracker.wait()
+            job_tracker.close()
+            report = job_tracker.report()
+            logger.info(
+                "%d request(s) processed, %d failed, %d timed out, %d lost, "
+                "%.2f request(s)/s",
+                report["succeeded"],
+                report["failed"],
+                report["timed_out"],
+                report["lost"],
+                report["throughput"],
+            )
+            if report["latency"] is not None:
+                logger.info(
+                    "Completion latency: p50 %.2fs, p95 %.2fs, max %.2fs",
+                    report["latency"]["p50"],
+                    report["latency"]["p95"],
+                    report["latency"]["max"],
+                )
+
+        self.output_sink.close()
+
+        if self.args.output_dir:
+            logger.info(
+                "%d shard(s) written to %s",
+                len(self.output_sink.shards),
+                self.args.output_dir,
+            )
+
+        if self.state_index is not None:
+            self.state_index.close()
+
+        if self.payload_cache is not None:
+            logger.info(
+                "%d payload(s) cached in %s (%.1f MiB)",
+                len(self.payload_cache),
+                self.args.payload_cache,
+                self.payload_cache.size / (1 << 20),
+            )
+
+        self.write_metrics()
+
+
+def watch(runner: IngestionRunner, stop: threading.Event) -> None:
+    """
+    Ingests the csv files dropped into the watched directory until stop is set.
+
+    Args:
+        runner (IngestionRunner): The runner ingesting the files.
+        stop (threading.Event): Set to stop watching, the file being ingested is completed.
+    """
+    from pizza_services.utils.directory_watcher import DirectoryWatcher
+
+    args = runner.args
+    watcher = DirectoryWatcher(args.watch)
+    if args.archive_dir:
+        os.makedirs(args.archive_dir, exist_ok=True)
+    logger.info("Watching %s for csv files", args.watch)
+
+    summaries = []
+    while not stop.is_set():
+        for path in watcher.poll():
+            if stop.is_set():
+                break
+            logger.info("Ingesting %s", path)
+            summary = runner.ingest_files([path])[0]
+            if args.output_dir:
+                # the shard of the file is completed, so a bulk loader sees it before the
+                # daemon stops
+                runner.output_sink.close()
+            summaries.append(summary)
+            log_summaries([summary])
+            runner.write_metrics()
+            if args.summary_output:
+                write_summaries(summaries, args.summary_output)
+            if (
+                args.archive_dir
+                and "error" not in summary
+                and not summary["failed_batches"]
+            ):
+                os.replace(path, os.path.join(args.archive_dir, os.path.basename(path)))
+        stop.wait(args.poll_interval)
+
+
+def main(argv: "list[str]" = None) -> None:
+    """
+    Runs the ingestion described by the command line arguments.
+
+    Args:
+        argv (list[str], optional): The arguments. Defaults to None (sys.argv).
+    """
+    args = parse_args(argv)
+
+    # basic loggin configuration
+    logging.basicConfig(
+        level=logging.INFO,
+        handlers=[logging.StreamHandler()],
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
 
-ingest_pizza = IngestPizza(parser_service=pizza_csv_parser)
+    runner = IngestionRunner(args)
+    try:
+        if args.resume:
+            if runner.resume():
+                raise SystemExit(1)
+        elif args.watch:
+            stop = threading.Event()
+            # a SIGTERM stops the daemon once the current file is ingested
+            signal.signal(signal.SIGTERM, lambda *_: stop.set())
+            try:
+                watch(runner, stop)
+            except KeyboardInterrupt:
+                logger.info("Stopped watching %s", args.watch)
+        else:
+            from pizza_services.parsers.csv_sources import expand_csv_paths
 
-em_http_client = EMHttpClient(
-    em_base_url=os.getenv("EM_BASE_URL"),
-    em_api_key=os.getenv("EM_API_KEY"),
-    em_client_name=os.getenv("EM_CLIENT_NAME"),
-)
-logger.info("Inserting graph into Exchange Manager")
+            paths = expand_csv_paths(args.path)
+            if not paths:
+                logger.error("No csv file matches %s", " ".join(args.path))
+                raise SystemExit(1)
+            summaries = runner.ingest_files(paths)
+            log_summaries(summaries)
+            if args.summary_output:
+                write_summaries(summaries, args.summary_output)
+            if any(
+                "error" in summary or summary["failed_batches"] for summary in summaries
+            ):
+                raise SystemExit(1)
+    finally:
+        runner.close()
 
-response = em_http_client.insert_graph(ingest_pizza.pizzas_graph)
 
-if response.status_code // 100 == 2:
-    logger.info("Graph inserted successfully")
-else:
-    logger.error("Error inserting the graph into Exchange Manager")
-    logger.error("Response: %s", response.text)
+# the worker processes started with spawn import this module, they must not run the ingestion
+if __name__ == "__main__":
+    main()
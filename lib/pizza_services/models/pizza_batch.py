@@ -0,0 +1,203 @@
+from array import array
+from typing import Iterable
+
+from rdflib import Graph, Literal
+from rdflib.namespace import RDF, RDFS
+
+from .topping_registry import ToppingRegistry, split_toppings
+from .vocabulary import (
+    PIZZA_CLASS,
+    PRICE_PROPERTY,
+    TOPPING_PROPERTY,
+    canonical_price,
+    float_literal,
+    kb_uri,
+    node_uuid,
+)
+
+# columns of the CSV file a batch is built from
+PIZZA_COLUMNS = ("pizza_id", "pizza_name", "pizza_price", "pizza_description")
+
+
+class PizzaBatch:
+    """
+    Columnar representation of a batch of pizzas.
+
+    Instead of one PizzaModel per row, the batch keeps parallel columns of ids, labels and
+    prices. The toppings of the pizza at index i are the entries
+    topping_indexes[topping_offsets[i]:topping_offsets[i + 1]] of the toppings table, where
+    each distinct topping name is stored only once.
+
+    The prices are validated when the batch is built: the prices column holds the canonical
+    xsd:float lexical form of each price, or None for an invalid price, which gets no price
+    triple.
+    """
+
+    __slots__ = (
+        "pizza_ids",
+        "labels",
+        "prices",
+        "topping_offsets",
+        "topping_indexes",
+        "toppings",
+        "invalid_prices",
+        "_topping_table",
+    )
+
+    def __init__(self) -> None:
+        self.pizza_ids = []
+        self.labels = []
+        self.prices = []
+        self.topping_offsets = array("I", [0])
+        self.topping_indexes = array("I")
+        # interned topping names, and their index in the list
+        self.toppings = []
+        # number of pizzas whose price is not a finite, non negative, number
+        self.invalid_prices = 0
+        self._topping_table = {}
+
+    @classmethod
+    def from_rows(cls, pizzas: "Iterable[dict]") -> "PizzaBatch":
+        """
+        Builds a batch from an iterable of dictionaries.
+
+        Args:
+            pizzas (Iterable): An iterable of dictionaries. Each dictionary represents a pizza.
+
+        Returns:
+            PizzaBatch: The batch with all the pizzas appended.
+        """
+        batch = cls()
+        for pizza in pizzas:
+            batch.append(pizza)
+
+        return batch
+
+    @classmethod
+    def from_columns(cls, columns: "dict[str, list]") -> "PizzaBatch":
+        """
+        Builds a batch from column lists, e.g. a chunk yielded by a parser iter_columns.
+
+        The prices and the descriptions repeat across a menu, so each distinct value is
+        validated, or split in toppings, only once per batch and the result is reused by
+        every row having it.
+
+        Args:
+            columns (dict[str, list]): The values of the PIZZA_COLUMNS, one list per column,
+            all of the same length.
+
+        Returns:
+            PizzaBatch: The batch with all the pizzas.
+        """
+        batch = cls()
+        batch.pizza_ids = list(columns["pizza_id"])
+        batch.labels = list(columns["pizza_name"])
+
+        prices = {}
+        for price in columns["pizza_price"]:
+            if price not in prices:
+                # if the price is empty, set the default to zero
+                prices[price] = canonical_price(price or "0.0")
+        batch.prices = [prices[price] for price in columns["pizza_price"]]
+        batch.invalid_prices = batch.prices.count(None)
+
+        descriptions = {}
+        topping_indexes = batch.topping_indexes
+        topping_offsets = batch.topping_offsets
+        for description in columns["pizza_description"]:
+            indexes = descriptions.get(description)
+            if indexes is None:
+                indexes = descriptions[description] = array(
+                    "I", map(batch._topping_index, split_toppings(description or ""))
+                )
+            topping_indexes.extend(indexes)
+            topping_offsets.append(len(topping_indexes))
+
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.pizza_ids)
+
+    def append(self, pizza_dict: dict) -> None:
+        """
+        Appends a pizza to the batch, with the same mapping as PizzaModel.
+
+        Args:
+            pizza_dict (dict): The dictionary representing the pizza.
+        """
+        self.pizza_ids.append(pizza_dict.get("pizza_id", ""))
+        self.labels.append(pizza_dict.get("pizza_name", ""))
+        # if the price is empty, set the default to zero
+        price = canonical_price(pizza_dict.get("pizza_price") or "0.0")
+        self.prices.append(price)
+        if price is None:
+            self.invalid_prices += 1
+
+        for topping in split_toppings(pizza_dict.get("pizza_description") or ""):
+            self.topping_indexes.append(self._topping_index(topping))
+
+        self.topping_offsets.append(len(self.topping_indexes))
+
+    def _topping_index(self, topping: str) -> int:
+        """Returns the index of a topping in the toppings table, adding it if it is new."""
+        topping_index = self._topping_table.get(topping)
+        if topping_index is None:
+            topping_index = self._topping_table[topping] = len(self.toppings)
+            self.toppings.append(topping)
+        return topping_index
+
+    def toppings_of(self, index: int) -> "list[str]":
+        """
+        Returns the toppings of a pizza of the batch.
+
+        Args:
+            index (int): The index of the pizza in the batch.
+
+        Returns:
+            list[str]: The topping names of the pizza.
+        """
+        start, stop = self.topping_offsets[index], self.topping_offsets[index + 1]
+        return [self.toppings[i] for i in self.topping_indexes[start:stop]]
+
+    def build_node(
+        self, rooted_node: Graph = None, topping_registry: ToppingRegistry = None
+    ) -> Graph:
+        """
+        Builds the RDF graph for all the pizzas of the batch.
+
+        The triples are the same that PizzaModel.build_node produces for each pizza, but the
+        topping nodes are built once per distinct topping of the batch.
+
+        Args:
+            rooted_node (Graph, optional): The graph to add the pizzas to.
+            If the graph is None, a new graph is created. Defaults to None.
+            topping_registry (ToppingRegistry, optional): Shared by the batches of a run, so
+            the nodes of their toppings are added only once. Defaults to None.
+
+        Returns:
+            Graph: The graph with the pizzas added.
+        """
+        graph = Graph() if rooted_node is None else rooted_node
+        if topping_registry is None:
+            topping_registry = ToppingRegistry()
+
+        topping_uris = [
+            topping_registry.add(topping, graph) for topping in self.toppings
+        ]
+
+        offsets = self.topping_offsets
+        for index, (pizza_id, label, price) in enumerate(
+            zip(self.pizza_ids, self.labels, self.prices)
+        ):
+            pizza_uri = kb_uri(node_uuid(pizza_id))
+            graph.add((pizza_uri, RDF.type, PIZZA_CLASS))
+            if price is not None:
+                graph.add((pizza_uri, PRICE_PROPERTY, float_literal(price)))
+            graph.add((pizza_uri, RDFS.label, Literal(label, lang="en")))
+
+            for topping_index in self.topping_indexes[
+                offsets[index] : offsets[index + 1]
+            ]:
+                graph.add((pizza_uri, TOPPING_PROPERTY, topping_uris[topping_index]))
+
+        return graph
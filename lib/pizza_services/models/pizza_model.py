@@ -1,17 +1,39 @@
-import uuid
-
-from rdflib import Graph, Literal, URIRef
+from rdflib import Graph, Literal
 from rdflib.namespace import RDF, RDFS, XSD
 
+from .topping_registry import ToppingRegistry, split_toppings
+from .vocabulary import (
+    PIZZA_CLASS,
+    PRICE_PROPERTY,
+    TOPPING_PROPERTY,
+    canonical_price,
+    float_literal,
+    kb_uri,
+    node_uuid,
+)
+
+
+def _add_jsonld_value(node: dict, key: str, value) -> None:
+    """
+    Appends a value to a JSON-LD node property, ignoring duplicated values like a rdflib
+    Graph ignores duplicated triples.
+    """
+    values = node.setdefault(key, [])
+    if value not in values:
+        values.append(value)
+
 
 class PizzaModel:
+    # no per instance __dict__, a large file holds many models at the same time
+    __slots__ = ("pizza_id", "label", "ingredients", "price", "uuid")
+
     def __init__(self, pizza_dict: dict) -> None:
         # Do the mapping from the json keys to the object attributes
         self.pizza_id = pizza_dict.get("pizza_id", "")
 
         self.label = pizza_dict.get("pizza_name", "")
-        # pizza ingredient has multiple values
-        self.ingredients = pizza_dict.get("pizza_description", []).split(",")
+        # pizza ingredient has multiple values, the spellings of a topping share a single node
+        self.ingredients = split_toppings(pizza_dict.get("pizza_description") or "")
         # if the price is empty, set the default to zero
         self.price = pizza_dict.get("pizza_price") or "0.0"
 
@@ -37,21 +59,15 @@ class PizzaModel:
         Returns:
             Graph: The graph with the id added.
         """
-        if not rooted_node:
+        if rooted_node is None:
             g = Graph()
         else:
             g = rooted_node
 
         if not self.uuid:
-            self.uuid = uuid.uuid5(uuid.NAMESPACE_DNS, self.pizza_id)
+            self.uuid = node_uuid(self.pizza_id)
 
-        g.add(
-            (
-                URIRef(f"http://www.perfect-memory.com/profile/pizza/kb/{self.uuid}"),
-                RDF.type,
-                URIRef("http://www.perfect-memory.com/ontology/pizza/1.1#Pizza"),
-            )
-        )
+        g.add((kb_uri(self.uuid), RDF.type, PIZZA_CLASS))
         return g
 
     def _add_price(self, id_pizza: str, price: str, rooted_node: Graph) -> Graph:
@@ -64,16 +80,12 @@ class PizzaModel:
             rooted_node (Graph): The graph to add the price to.
 
         Returns:
-            The graph with the price added.
+            The graph with the price added. An invalid price is not added.
 
         """
-        rooted_node.add(
-            (
-                URIRef(f"http://www.perfect-memory.com/profile/pizza/kb/{id_pizza}"),
-                URIRef("http://www.perfect-memory.com/ontology/pizza/1.1#price"),
-                Literal(price, datatype=XSD.float),
-            )
-        )
+        price = canonical_price(price)
+        if price is not None:
+            rooted_node.add((kb_uri(id_pizza), PRICE_PROPERTY, float_literal(price)))
         return rooted_node
 
     def _add_en_label(self, id_pizza: str, label: str, rooted_node: Graph) -> Graph:
@@ -89,16 +101,17 @@ class PizzaModel:
             The graph with the label added.
         """
 
-        rooted_node.add(
-            (
-                URIRef(f"http://www.perfect-memory.com/profile/pizza/kb/{id_pizza}"),
-                RDFS.label,
-                Literal(label, lang="en"),
-            )
-        )
+        # pizza labels are mostly unique, interning them would only churn the cache
+        rooted_node.add((kb_uri(id_pizza), RDFS.label, Literal(label, lang="en")))
         return rooted_node
 
-    def _add_toppings(self, id_pizza: str, toppings: list, rooted_node: Graph) -> Graph:
+    def _add_toppings(
+        self,
+        id_pizza: str,
+        toppings: list,
+        rooted_node: Graph,
+        topping_registry: ToppingRegistry = None,
+    ) -> Graph:
         """
         Adds the toppings to an existing graph.
 
@@ -106,62 +119,38 @@ class PizzaModel:
             id_pizza (str): The id of the node to add the toppings to.
             toppings (list): The list of toppings to add to the node.
             rooted_node (Graph): The graph to add the toppings to.
+            topping_registry (ToppingRegistry, optional): The topping nodes already added to
+            the graph. If None, the nodes of all the toppings are added. Defaults to None.
 
         Returns:
             The graph with the toppings added.
         """
+        if topping_registry is None:
+            topping_registry = ToppingRegistry()
 
+        pizza_uri = kb_uri(id_pizza)
         for topping in toppings:
-            # Create a URI for the topping
-            topping_uuid = uuid.uuid5(uuid.NAMESPACE_DNS, topping)
-            topping_uri = URIRef(
-                f"http://www.perfect-memory.com/profile/pizza/kb/{topping_uuid}"
-            )
-
-            # add topping to the graph
             # Doubt: Is the Topping in th pizza kb namespace of should has a different namespace
-            # add the Topping
-            rooted_node.add(
-                (
-                    topping_uri,
-                    RDF.type,
-                    URIRef("http://www.perfect-memory.com/ontology/pizza/1.1#Topping"),
-                )
-            )
+            # the type and label of the topping are added with its node, once per registry
+            topping_node = topping_registry.add(topping, rooted_node)
 
             # Add a triple to the graph stating that the pizza has the topping
-            rooted_node.add(
-                (
-                    URIRef(
-                        f"http://www.perfect-memory.com/profile/pizza/kb/{id_pizza}"
-                    ),
-                    URIRef("http://www.perfect-memory.com/ontology/pizza/1.1#topping"),
-                    topping_uri,
-                )
-            )
-
-            # Add a triple to the graph stating the type of the topping
-            rooted_node.add(
-                (
-                    topping_uri,
-                    RDF.type,
-                    URIRef("http://www.perfect-memory.com/ontology/pizza/1.1#Topping"),
-                )
-            )
-
-            # Add a triple to the graph stating the label of the topping (optional)
-            if topping != "":
-                rooted_node.add((topping_uri, RDFS.label, Literal(topping, lang="en")))
+            rooted_node.add((pizza_uri, TOPPING_PROPERTY, topping_node))
 
         return rooted_node
 
-    def build_node(self, rooted_node: Graph = None) -> Graph:
+    def build_node(
+        self, rooted_node: Graph = None, topping_registry: ToppingRegistry = None
+    ) -> Graph:
         """
         Builds the RDF graph for the pizza.
 
         Args:
             rooted_node (Graph, optional): The graph to add the pizza to.
             If the graph is None, a new graph is created. Defaults to None.
+            topping_registry (ToppingRegistry, optional): Shared by the pizzas of a run, so
+            the nodes of their toppings are added only once. If None, the graph gets the nodes
+            of all the toppings of the pizza. Defaults to None.
 
         Returns:
             Graph: The graph with the pizza added.
@@ -171,10 +160,61 @@ class PizzaModel:
         graph = self._add_en_label(self.uuid, self.label, graph)
 
         if self.ingredients:
-            graph = self._add_toppings(self.uuid, self.ingredients, graph)
+            graph = self._add_toppings(
+                self.uuid, self.ingredients, graph, topping_registry
+            )
 
         return graph
 
+    def build_jsonld(
+        self, nodes: dict = None, topping_registry: ToppingRegistry = None
+    ) -> dict:
+        """
+        Builds the JSON-LD nodes for the pizza directly, without a rdflib Graph.
+
+        The nodes have the same expanded shape that rdflib's json-ld serializer outputs for
+        the graph built by build_node, so they can be sent as the @graph of an insertGraph
+        request without the serialize and parse round-trip.
+
+        Args:
+            nodes (dict, optional): The JSON-LD nodes to add the pizza to, indexed by @id.
+            If None, a new dict is created. Defaults to None.
+            topping_registry (ToppingRegistry, optional): Same as for build_node.
+            Defaults to None.
+
+        Returns:
+            dict: The JSON-LD nodes with the pizza and its toppings added, indexed by @id.
+        """
+        if nodes is None:
+            nodes = {}
+        if topping_registry is None:
+            topping_registry = ToppingRegistry()
+
+        if not self.uuid:
+            self.uuid = node_uuid(self.pizza_id)
+
+        pizza_id = str(kb_uri(self.uuid))
+        pizza_node = nodes.setdefault(pizza_id, {"@id": pizza_id})
+
+        _add_jsonld_value(pizza_node, "@type", str(PIZZA_CLASS))
+        price = canonical_price(self.price)
+        if price is not None:
+            _add_jsonld_value(
+                pizza_node,
+                str(PRICE_PROPERTY),
+                # the lexical form is the one normalized by rdflib, e.g. "10.00" -> "10.0"
+                {"@type": str(XSD.float), "@value": str(float_literal(price))},
+            )
+        _add_jsonld_value(
+            pizza_node, str(RDFS.label), {"@language": "en", "@value": self.label}
+        )
+
+        for topping in self.ingredients:
+            topping_id = topping_registry.add_jsonld(topping, nodes)
+            _add_jsonld_value(pizza_node, str(TOPPING_PROPERTY), {"@id": topping_id})
+
+        return nodes
+
     def serialize_node(self) -> dict:
         """
         Serializes the node to a string.
@@ -0,0 +1,153 @@
+from functools import lru_cache
+from typing import Iterable
+
+from rdflib import Graph, URIRef
+from rdflib.namespace import RDF, RDFS
+
+from .vocabulary import TERM_CACHE_SIZE, TOPPING_CLASS, en_literal, topping_uri
+
+
+@lru_cache(maxsize=TERM_CACHE_SIZE)
+def normalize_topping(name: str) -> str:
+    """
+    Normalizes a topping name, so the spellings of a topping share the same node.
+
+    Args:
+        name (str): The topping name, as written in the pizza description.
+
+    Returns:
+        str: The name without leading, trailing and repeated whitespaces, case folded,
+        e.g. " Mozzarella  Cheese" -> "mozzarella cheese".
+    """
+    return " ".join(name.split()).casefold()
+
+
+def split_toppings(description: str) -> "list[str]":
+    """
+    Splits a pizza description in its toppings.
+
+    Args:
+        description (str): The comma separated toppings of the pizza.
+
+    Returns:
+        list[str]: The distinct toppings, in order, without leading, trailing and repeated
+        whitespaces. Two spellings of a topping are the same topping, the first one is kept.
+        Empty names are skipped.
+    """
+    toppings = {}
+    for name in description.split(","):
+        topping = " ".join(name.split())
+        if topping:
+            toppings.setdefault(normalize_topping(topping), topping)
+    return list(toppings.values())
+
+
+class ToppingRegistry:
+    """
+    Index of the topping nodes already added during a run.
+
+    Toppings repeat across most pizzas of a menu. The registry adds the type and label triples
+    of each topping node the first time it is met, then the pizzas only reference the node.
+    The node of a topping is keyed by its normalized name, and labeled with the first spelling
+    met. Shared by a whole run, the topping nodes are written once even when the pizzas are
+    sent in several batches, or several files ingested by concurrent threads. A topping met by
+    two threads at the same time may be added to both of their graphs, which only repeats its
+    triples.
+
+    When the batches can fail, a deferred registry only registers a topping once a batch
+    carrying its node is confirmed as sent: until then every batch using the topping carries
+    its node, so a failed batch never leaves the later ones linking to a node never sent.
+    """
+
+    __slots__ = ("deferred", "_nodes", "_labels")
+
+    def __init__(self, deferred: bool = False) -> None:
+        """
+        Initializes the ToppingRegistry class.
+
+        Args:
+            deferred (bool, optional): Whether the toppings are registered by confirm, once
+            the batch carrying their node is sent, instead of when their node is added.
+            Defaults to False.
+        """
+        self.deferred = deferred
+        # normalized topping name -> URI of its node, once its node was added (or sent)
+        self._nodes = {}
+        # normalized topping name -> first spelling met, the label of its node
+        self._labels = {}
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, topping: str) -> bool:
+        return normalize_topping(topping) in self._nodes
+
+    def _node(self, topping: str) -> "tuple[URIRef, str | None]":
+        """
+        Returns the node of a topping, and the label of the node if it must be added to the
+        graph, None if it is registered.
+        """
+        key = normalize_topping(topping)
+        node = self._nodes.get(key)
+        if node is not None:
+            return node, None
+
+        node = topping_uri(key)
+        if not self.deferred:
+            self._nodes[key] = node
+        return node, self._labels.setdefault(key, topping)
+
+    def add(self, topping: str, rooted_node: Graph) -> URIRef:
+        """
+        Returns the node of a topping, adding its type and label to the graph if it is new.
+
+        Args:
+            topping (str): The topping name.
+            rooted_node (Graph): The graph the topping node is added to.
+
+        Returns:
+            URIRef: The URI of the topping node.
+        """
+        node, label = self._node(topping)
+        if label is not None:
+            rooted_node.add((node, RDF.type, TOPPING_CLASS))
+            rooted_node.add((node, RDFS.label, en_literal(label)))
+        return node
+
+    def add_jsonld(self, topping: str, nodes: dict) -> str:
+        """
+        Returns the @id of a topping, adding its JSON-LD node if it is new.
+
+        Args:
+            topping (str): The topping name.
+            nodes (dict): The JSON-LD nodes the topping node is added to, indexed by @id.
+
+        Returns:
+            str: The @id of the topping node.
+        """
+        node, label = self._node(topping)
+        if label is not None:
+            nodes.setdefault(
+                str(node),
+                {
+                    "@id": str(node),
+                    "@type": [str(TOPPING_CLASS)],
+                    str(RDFS.label): [{"@language": "en", "@value": label}],
+                },
+            )
+        return str(node)
+
+    def confirm(self, toppings: "Iterable[str]") -> None:
+        """
+        Registers the toppings of a batch sent successfully, so the later batches only
+        reference their nodes. Does nothing when the registry is not deferred.
+
+        Args:
+            toppings (Iterable[str]): The toppings of the batch.
+        """
+        if not self.deferred:
+            return
+        for topping in toppings:
+            key = normalize_topping(topping)
+            if key not in self._nodes:
+                self._nodes[key] = topping_uri(key)
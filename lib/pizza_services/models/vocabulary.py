@@ -0,0 +1,136 @@
+import math
+import uuid
+from functools import lru_cache
+
+from rdflib import Literal, URIRef
+from rdflib.namespace import XSD
+
+PIZZA_KB = "http://www.perfect-memory.com/profile/pizza/kb/"
+PIZZA_ONTOLOGY = "http://www.perfect-memory.com/ontology/pizza/1.1#"
+
+# ontology constants, created once and shared by every node
+PIZZA_CLASS = URIRef(f"{PIZZA_ONTOLOGY}Pizza")
+TOPPING_CLASS = URIRef(f"{PIZZA_ONTOLOGY}Topping")
+TOPPING_PROPERTY = URIRef(f"{PIZZA_ONTOLOGY}topping")
+PRICE_PROPERTY = URIRef(f"{PIZZA_ONTOLOGY}price")
+
+# version of the triples built from a row. Must be changed whenever the model builds them
+# differently, so the payloads cached by previous versions are not sent anymore
+MODEL_VERSION = "2"
+
+# toppings and prices repeat across thousands of pizzas, so they get a large cache
+TERM_CACHE_SIZE = 65536
+# a pizza subject is only reused while its own node is built
+SUBJECT_CACHE_SIZE = 1024
+
+
+def node_uuid(name: str) -> uuid.UUID:
+    """
+    Returns the deterministic uuid of a node of the knowledge base.
+
+    Args:
+        name (str): The name identifying the node, e.g. the pizza id or the topping name.
+
+    Returns:
+        uuid.UUID: The uuid5 of the name in the DNS namespace.
+    """
+    return uuid.uuid5(uuid.NAMESPACE_DNS, name)
+
+
+@lru_cache(maxsize=SUBJECT_CACHE_SIZE)
+def kb_uri(node_id) -> URIRef:
+    """
+    Returns the interned URI of a node of the pizza knowledge base.
+
+    Args:
+        node_id (uuid.UUID | str): The uuid of the node.
+
+    Returns:
+        URIRef: The URI of the node.
+    """
+    return URIRef(f"{PIZZA_KB}{node_id}")
+
+
+@lru_cache(maxsize=TERM_CACHE_SIZE)
+def topping_uri(topping: str) -> URIRef:
+    """
+    Returns the interned URI of a topping, computing its uuid5 only once per topping.
+
+    Args:
+        topping (str): The name of the topping.
+
+    Returns:
+        URIRef: The URI of the topping node.
+    """
+    return URIRef(f"{PIZZA_KB}{node_uuid(topping)}")
+
+
+@lru_cache(maxsize=TERM_CACHE_SIZE)
+def en_literal(text: str) -> Literal:
+    """
+    Returns an interned english literal. Meant for values that repeat, like topping labels.
+
+    Args:
+        text (str): The text of the literal.
+
+    Returns:
+        Literal: The literal with the "en" language tag.
+    """
+    return Literal(text, lang="en")
+
+
+@lru_cache(maxsize=TERM_CACHE_SIZE)
+def float_literal(value: str) -> Literal:
+    """
+    Returns an interned xsd:float literal.
+
+    Args:
+        value (str): The lexical value of the literal, e.g. a price.
+
+    Returns:
+        Literal: The xsd:float literal.
+    """
+    return Literal(value, datatype=XSD.float)
+
+
+@lru_cache(maxsize=TERM_CACHE_SIZE)
+def canonical_price(value: str) -> "str | None":
+    """
+    Validates a price and returns its canonical xsd:float lexical form.
+
+    Args:
+        value (str): The price, as written in the CSV file.
+
+    Returns:
+        str: The canonical lexical form, e.g. "10.00" -> "10.0", or None if the price is not
+        a finite, non negative, number.
+    """
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(price) or price < 0:
+        return None
+    return repr(price)
+
+
+_INTERNED_FACTORIES = (kb_uri, topping_uri, en_literal, float_literal, canonical_price)
+
+
+def intern_cache_info() -> "dict[str, dict]":
+    """
+    Returns the statistics of the interning caches.
+
+    Returns:
+        dict: The hits, misses, maxsize and currsize of each cache, indexed by cache name.
+    """
+    return {
+        factory.__name__: factory.cache_info()._asdict()
+        for factory in _INTERNED_FACTORIES
+    }
+
+
+def clear_intern_cache() -> None:
+    """Empties the interning caches and resets their statistics."""
+    for factory in _INTERNED_FACTORIES:
+        factory.cache_clear()
@@ -1,50 +1,83 @@
 import csv
+from itertools import islice
+from operator import itemgetter
+from typing import IO, Callable, Iterator, Union
 
+from ..utils.metrics import Metrics, NullMetrics
+from .csv_sources import open_csv_source
 from .interfaces.parser_interface import ParserInterface
 
 
+def _row_getter(indexes: "list[int]") -> "Callable[[list], tuple]":
+    """
+    Precompiles the extraction of the mapped columns of a row.
+
+    Returns a callable returning the values at the indexes of a row, always as a tuple.
+    """
+    if not indexes:
+        return lambda row: ()
+    if len(indexes) == 1:
+        # itemgetter returns a single value, not a tuple, for a single index
+        index = indexes[0]
+        return lambda row: (row[index],)
+    return itemgetter(*indexes)
+
+
 class CsvParser(ParserInterface):
     """Implements a Csv Parser"""
 
-    def __init__(self, path_to_csv: str, mapper: "list[str]"):
+    def __init__(
+        self,
+        path_to_csv: "Union[str, IO]",
+        mapper: "list[str]",
+        metrics: Metrics = None,
+        use_mmap: bool = False,
+    ):
         """
         Initializes the CsvPizzaParser class.
 
+        The file is not read at init: the column mapping is resolved from the header row by
+        the same reader that streams the rows, so the file is opened only once.
+
         Args:
-            path_to_csv (str): The path to the CSV file to be parsed.
+            path_to_csv (str | IO): The path to the CSV file to be parsed, "-" to read the
+            standard input, or an already opened file-like object (text or binary). The standard
+            input and file-like objects can be parsed only once. Files ending with .gz, .bz2,
+            .xz or .zst are decompressed on the fly.
             mapper (list): A list of string mapping the columns names in the CSV file to be
             extract in the parse stage. The dict output from parse method will have the data
             extract from the columns that have a column in the mapping.
+            metrics (Metrics, optional): Records the parse duration ("csv_parse") and the
+            number of rows ("csv_rows"). Defaults to None (nothing is recorded).
+            use_mmap (bool, optional): Whether a plain CSV file is read through a memory map.
+            Defaults to False.
         """
 
         self.path_to_csv = path_to_csv
-        self._mapper = self._build_mapper(mapper)
+        self.metrics = metrics if metrics is not None else NullMetrics()
+        self.use_mmap = use_mmap
+        self._columns = mapper
+        # resolved from the header row when the file is read
+        self._mapper = None
 
-    def _build_mapper(self, mapper: "list[str]") -> dict:
+    def _build_mapper(self, header: "list[str]") -> dict:
         """
         generate a mapper dict that maps the key to the index of the column in the
         csv file to help in the parse step
 
         Args:
-            mapper (list): A list of string mapping the columns names in the CSV file
-            to be extract in the parse stage.
+            header (list): The header row of the CSV file.
 
         Return a ``dict`` containing the key and the index of the respecting key in the csv file
         """
 
         # cast the array to a set to make the search O(1) instead of O(n)
-        column_map_set = set(mapper)
+        column_map_set = set(self._columns)
 
         mapper_dict = {}
-        with open(self.path_to_csv, "r", encoding="utf-8") as csvfile:
-            reader = csv.reader(csvfile)
-            for row in reader:
-                # iterates only in the header row of the table
-                for index, column in enumerate(row):
-                    if column in column_map_set:
-                        mapper_dict[column] = index
-
-                break
+        for index, column in enumerate(header):
+            if column in column_map_set:
+                mapper_dict[column] = index
 
         return mapper_dict
 
@@ -55,16 +88,84 @@ class CsvParser(ParserInterface):
         The parsed is performed based on the path of the csv file and in the mapper list that was
         passed in the class constructor
         """
-        result = []
-        with open(self.path_to_csv, "r", encoding="utf-8") as csvfile:
+        return list(self.iter_rows())
+
+    def iter_rows(self) -> "Iterator[dict]":
+        """
+        Lazily parses the CSV file yielding one mapped dict per row.
+
+        Only the current row is held in memory, so the memory usage does not depend on the
+        size of the CSV file.
+        """
+        return self.metrics.timed_iter("csv_parse", self._iter_csv_rows())
+
+    def iter_columns(
+        self, columns: "list[str]", batch_size: int = 0
+    ) -> "Iterator[dict[str, list]]":
+        """
+        Lazily parses the CSV file yielding the mapped columns in chunks of batch_size rows.
+
+        The values of a chunk are transposed straight from the CSV records, no dict is built
+        per row. Only the current chunk is held in memory.
+
+        Args:
+            columns (list[str]): The columns to extract. A column that is not mapped, or not in
+            the header, is "" for every row.
+            batch_size (int, optional): Maximum number of rows per chunk.
+            Defaults to 0 (a single chunk).
+
+        Yields:
+            dict[str, list]: The values of each column, in the order of the rows.
+        """
+        return self.metrics.timed_iter(
+            "csv_parse", self._iter_csv_columns(columns, batch_size)
+        )
+
+    def _iter_csv_columns(
+        self, columns: "list[str]", batch_size: int
+    ) -> "Iterator[dict[str, list]]":
+        """Yields the column chunks of the CSV file, counting the rows."""
+        rows = 0
+        with open_csv_source(self.path_to_csv, self.use_mmap) as csvfile:
             reader = csv.reader(csvfile)
 
-            for index, row in enumerate(reader):
-                # Skip header row
-                if index == 0:
-                    continue
-                # pylint: disable=consider-using-dict-items
-                row_dict = dict([(key, row[self._mapper[key]]) for key in self._mapper])
-                result.append(row_dict)
+            self._mapper = self._build_mapper(next(reader, []))
+            present = [column for column in columns if column in self._mapper]
+            get_values = _row_getter([self._mapper[column] for column in present])
+
+            try:
+                while True:
+                    records = islice(reader, batch_size) if batch_size else reader
+                    values = [get_values(row) for row in records]
+                    if not values:
+                        return
+                    rows += len(values)
+                    chunk = dict.fromkeys(columns, None)
+                    chunk.update(zip(present, map(list, zip(*values))))
+                    for column, column_values in chunk.items():
+                        if column_values is None:
+                            chunk[column] = [""] * len(values)
+                    yield chunk
+                    if not batch_size:
+                        return
+            finally:
+                self.metrics.increment("csv_rows", rows)
+
+    def _iter_csv_rows(self) -> "Iterator[dict]":
+        """Yields the mapped rows of the CSV file, counting them."""
+        rows = 0
+        with open_csv_source(self.path_to_csv, self.use_mmap) as csvfile:
+            reader = csv.reader(csvfile)
 
-        return result
+            # the header row gives the mapping, the other rows are data
+            self._mapper = self._build_mapper(next(reader, []))
+            keys = tuple(self._mapper)
+            get_values = _row_getter(list(self._mapper.values()))
+
+            try:
+                for row in reader:
+                    # counted before it is yielded, the consumer may not ask for the next one
+                    rows += 1
+                    yield dict(zip(keys, get_values(row)))
+            finally:
+                self.metrics.increment("csv_rows", rows)
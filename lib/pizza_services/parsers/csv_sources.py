@@ -0,0 +1,139 @@
+import bz2
+import glob
+import gzip
+import io
+import lzma
+import mmap
+import os
+import sys
+from contextlib import contextmanager
+from typing import IO, Iterable, Iterator, Union
+
+# path meaning that the csv is read from the standard input
+STDIN_PATH = "-"
+
+# compressed files decompressed on the fly by the standard library, by extension
+COMPRESSED_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+# files taken as csv sources in a directory, the csv files and their compressed versions
+CSV_EXTENSIONS = (".csv", ".csv.gz", ".csv.bz2", ".csv.xz", ".csv.zst")
+
+
+def _text(binary: IO) -> io.TextIOWrapper:
+    """Wraps a binary stream in the text stream expected by the csv module"""
+    return io.TextIOWrapper(binary, encoding="utf-8", newline="")
+
+
+@contextmanager
+def _open_zstd(path: str) -> "Iterator[IO]":
+    """Opens a zstandard compressed file as a text stream"""
+    try:
+        # optional dependency, only needed for .zst files
+        import zstandard  # pylint: disable=import-outside-toplevel
+    except ImportError as e:
+        raise ImportError("Reading .zst files requires the zstandard package.") from e
+
+    with open(path, "rb") as compressed:
+        with zstandard.ZstdDecompressor().stream_reader(compressed) as binary:
+            yield _text(binary)
+
+
+@contextmanager
+def _open_mmap(path: str) -> "Iterator[Iterable[str]]":
+    """Reads a plain file through a read only memory map, yielding its lines"""
+    with open(path, "rb") as binary:
+        if os.fstat(binary.fileno()).st_size == 0:
+            # empty files can not be mapped
+            yield iter(())
+            return
+
+        with mmap.mmap(binary.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, "madvise"):
+                # the file is read once from start to end
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            yield (line.decode("utf-8") for line in iter(mapped.readline, b""))
+
+
+@contextmanager
+def open_csv_source(
+    source: "Union[str, IO]", use_mmap: bool = False
+) -> "Iterator[Iterable[str]]":
+    """
+    Opens a csv source as an iterable of text lines, as expected by csv.reader.
+
+    Compressed files (.gz, .bz2, .xz and .zst, the latter requiring the zstandard package) are
+    decompressed on the fly, without writing the decompressed file to disk.
+
+    Args:
+        source (str | IO): The path to the file, "-" to read the standard input, or an already
+        opened file-like object (text or binary). A file-like object is not closed.
+        use_mmap (bool, optional): Whether a plain, not compressed, file is read through a
+        memory map instead of buffered reads. Defaults to False.
+
+    Yields:
+        Iterable[str]: The lines of the source.
+    """
+    if source == STDIN_PATH:
+        source = sys.stdin.buffer
+
+    if isinstance(source, str):
+        extension = os.path.splitext(source)[1].lower()
+        if extension in COMPRESSED_OPENERS:
+            with COMPRESSED_OPENERS[extension](
+                source, "rt", encoding="utf-8", newline=""
+            ) as csvfile:
+                yield csvfile
+        elif extension == ".zst":
+            with _open_zstd(source) as csvfile:
+                yield csvfile
+        elif use_mmap:
+            with _open_mmap(source) as lines:
+                yield lines
+        else:
+            with open(source, "r", encoding="utf-8", newline="") as csvfile:
+                yield csvfile
+    elif isinstance(source, (io.RawIOBase, io.BufferedIOBase)):
+        csvfile = _text(source)
+        try:
+            yield csvfile
+        finally:
+            # the caller owns the binary stream, it must not be closed with the wrapper
+            csvfile.detach()
+    else:
+        yield source
+
+
+def _is_csv_file(path: str) -> bool:
+    return path.lower().endswith(CSV_EXTENSIONS) and os.path.isfile(path)
+
+
+def expand_csv_paths(patterns: "Iterable[str]") -> "list[str]":
+    """
+    Expands the csv sources given on the command line into file paths.
+
+    Args:
+        patterns (Iterable[str]): Paths to csv files, directories (their csv files are taken,
+        not the ones of their subdirectories), glob patterns ("**" matches subdirectories) or
+        "-" for the standard input.
+
+    Returns:
+        list[str]: The paths, each one once, in the order of the patterns. The paths matched by
+        a directory or a glob pattern are sorted.
+    """
+    paths = {}
+    for pattern in patterns:
+        if pattern == STDIN_PATH or os.path.isfile(pattern):
+            paths[pattern] = None
+        elif os.path.isdir(pattern):
+            with os.scandir(pattern) as entries:
+                matches = sorted(
+                    entry.path for entry in entries if _is_csv_file(entry.path)
+                )
+            paths.update(dict.fromkeys(matches))
+        elif glob.escape(pattern) != pattern:
+            # the pattern has wildcards
+            matches = sorted(glob.glob(pattern, recursive=True))
+            paths.update(dict.fromkeys(path for path in matches if _is_csv_file(path)))
+        else:
+            paths[pattern] = None
+    return list(paths)
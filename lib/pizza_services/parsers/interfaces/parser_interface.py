@@ -1,6 +1,46 @@
+from itertools import islice
+from typing import Iterator
+
+
 class ParserInterface:
     """Parse interface class"""
 
     def parse(self) -> dict:  # pragma: no cover
         """parse method to be implement in the child classes"""
         raise NotImplementedError
+
+    def iter_rows(self) -> "Iterator[dict]":
+        """
+        Lazily yields the parsed rows one by one.
+
+        Child classes that can stream their input should override this method, the default
+        implementation falls back to the materialized result of the parse method.
+        """
+        yield from self.parse()
+
+    def iter_columns(
+        self, columns: "list[str]", batch_size: int = 0
+    ) -> "Iterator[dict[str, list]]":
+        """
+        Lazily yields the parsed rows in column chunks.
+
+        Child classes that can build the columns without a dict per row should override this
+        method, the default implementation transposes the rows of iter_rows.
+
+        Args:
+            columns (list[str]): The columns to extract. A column missing from a row is "".
+            batch_size (int, optional): Maximum number of rows per chunk.
+            Defaults to 0 (a single chunk).
+
+        Yields:
+            dict[str, list]: The values of each column, in the order of the rows. Empty chunks
+            are never yielded.
+        """
+        rows = self.iter_rows()
+        while True:
+            chunk = list(islice(rows, batch_size)) if batch_size else list(rows)
+            if not chunk:
+                return
+            yield {column: [row.get(column, "") for row in chunk] for column in columns}
+            if not batch_size:
+                return
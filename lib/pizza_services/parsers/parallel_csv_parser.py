@@ -0,0 +1,179 @@
+import csv
+import io
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+from ..utils.concurrency import map_in_flight
+from ..utils.metrics import Metrics
+from .csv_parser import CsvParser, _row_getter
+from .csv_sources import COMPRESSED_OPENERS, STDIN_PATH
+from .interfaces.parser_interface import ParserInterface
+
+# bytes of the csv file parsed by each process pool task
+CHUNK_SIZE = 16 * 2**20
+
+
+def _next_record_start(mapped: mmap.mmap, record_start: int, position: int) -> int:
+    """
+    Finds the first record starting at or after a position of the file.
+
+    A newline ends a record only when it is outside of a quoted field, that is when an even
+    number of quotes was read since the start of a record. Escaped quotes ("") count twice, so
+    they do not change the parity.
+
+    Args:
+        mapped (mmap): The memory map of the csv file.
+        record_start (int): The offset of a record starting before the position.
+        position (int): The offset where the search starts.
+
+    Returns:
+        int: The offset of the record, or the size of the file if there is none.
+    """
+    quotes = mapped[record_start:position].count(b'"')
+    while True:
+        newline = mapped.find(b"\n", position)
+        if newline == -1:
+            return len(mapped)
+        quotes += mapped[position:newline].count(b'"')
+        position = newline + 1
+        if quotes % 2 == 0:
+            return position
+
+
+def _record_boundaries(mapped: mmap.mmap, start: int, chunk_size: int) -> "list[int]":
+    """
+    Splits the file from an offset into chunks of about chunk_size bytes, each one starting
+    and ending on a record boundary.
+
+    Returns:
+        list: The offsets of the boundaries, the first one being start and the last one the
+        size of the file.
+    """
+    boundaries = [start]
+    while boundaries[-1] + chunk_size < len(mapped):
+        boundary = _next_record_start(
+            mapped, boundaries[-1], boundaries[-1] + chunk_size
+        )
+        if boundary >= len(mapped):
+            break
+        boundaries.append(boundary)
+    boundaries.append(len(mapped))
+    return boundaries
+
+
+def _parse_chunk(task: "tuple[str, int, int, list[int]]") -> "list[tuple]":
+    """
+    Parses the records of a byte range of the csv file. Runs in a worker process.
+
+    Each worker reads its own range of the file, so only the offsets are sent to the process
+    and only the mapped values are sent back.
+
+    Args:
+        task (tuple): The path of the file, the start and end offsets of the chunk and the
+        indexes of the mapped columns.
+
+    Returns:
+        list: The values of the mapped columns of each record.
+    """
+    path, start, end, indexes = task
+    with open(path, "rb") as binary:
+        binary.seek(start)
+        text = binary.read(end - start).decode("utf-8")
+
+    get_values = _row_getter(indexes)
+    return [get_values(row) for row in csv.reader(io.StringIO(text, newline=""))]
+
+
+class ParallelCsvParser(CsvParser):
+    """
+    Parses a large plain CSV file in a pool of processes.
+
+    The file is split in byte ranges aligned on record boundaries, quoted fields containing
+    commas or newlines included, and each range is parsed by a worker process.
+    """
+
+    def __init__(
+        self,
+        path_to_csv: str,
+        mapper: "list[str]",
+        workers: int = 2,
+        chunk_size: int = CHUNK_SIZE,
+        ordered: bool = True,
+        metrics: Metrics = None,
+    ):
+        """
+        Initializes the ParallelCsvParser class.
+
+        Args:
+            path_to_csv (str): The path to a plain, not compressed, CSV file. Its quoted fields
+            are expected to follow RFC 4180: a quote inside a field is escaped as "".
+            mapper (list): A list of string mapping the columns names in the CSV file to be
+            extract in the parse stage.
+            workers (int, optional): Number of processes parsing the chunks. Defaults to 2.
+            chunk_size (int, optional): Approximate number of bytes parsed per task.
+            Defaults to CHUNK_SIZE.
+            ordered (bool, optional): Whether the rows are yielded in the order of the file.
+            Otherwise the rows of each chunk are yielded as soon as it is parsed.
+            Defaults to True.
+            metrics (Metrics, optional): Records the parse duration ("csv_parse") and the
+            number of rows ("csv_rows"). Defaults to None (nothing is recorded).
+
+        Raises:
+            ValueError: If the path is not a plain file, or workers or chunk_size is below 1.
+        """
+        if not isinstance(path_to_csv, str) or path_to_csv == STDIN_PATH:
+            raise ValueError("Parallel parsing requires the path to a file.")
+        extension = os.path.splitext(path_to_csv)[1].lower()
+        if extension in COMPRESSED_OPENERS or extension == ".zst":
+            raise ValueError("Parallel parsing does not support compressed files.")
+        if workers < 1:
+            raise ValueError("workers must be at least 1.")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1.")
+
+        super().__init__(path_to_csv, mapper, metrics=metrics)
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.ordered = ordered
+
+    # the columns are transposed from the rows parsed by the pool, not read serially
+    iter_columns = ParserInterface.iter_columns
+
+    def _iter_csv_rows(self) -> "Iterator[dict]":
+        """Yields the mapped rows of the chunks parsed by the process pool, counting them."""
+        with open(self.path_to_csv, "rb") as binary:
+            if os.fstat(binary.fileno()).st_size == 0:
+                # empty files can not be mapped
+                self._mapper = self._build_mapper([])
+                return
+            with mmap.mmap(binary.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                # the header is parsed here, the workers only get the indexes of the columns
+                header_end = _next_record_start(mapped, 0, 0)
+                header_text = mapped[:header_end].decode("utf-8")
+                header = next(csv.reader(io.StringIO(header_text, newline="")), [])
+                boundaries = _record_boundaries(mapped, header_end, self.chunk_size)
+
+        self._mapper = self._build_mapper(header)
+        keys = tuple(self._mapper)
+        indexes = list(self._mapper.values())
+        tasks = (
+            (self.path_to_csv, start, end, indexes)
+            for start, end in zip(boundaries, boundaries[1:])
+            if start < end
+        )
+
+        rows = 0
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                # at most two chunks per worker are parsed and not yet consumed
+                for chunk in map_in_flight(
+                    executor, _parse_chunk, tasks, 2 * self.workers, self.ordered
+                ):
+                    for values in chunk:
+                        # counted before it is yielded, the consumer may not ask for the next
+                        rows += 1
+                        yield dict(zip(keys, values))
+        finally:
+            self.metrics.increment("csv_rows", rows)
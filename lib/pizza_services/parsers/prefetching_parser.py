@@ -0,0 +1,61 @@
+from itertools import islice
+from typing import Iterator
+
+from ..utils.concurrency import prefetch
+from .interfaces.parser_interface import ParserInterface
+
+# rows handed from the parse thread to the consumer at once, to amortize the queue overhead
+ROWS_PER_CHUNK = 1024
+
+
+def _iter_row_chunks(rows: "Iterator[dict]") -> "Iterator[list[dict]]":
+    while True:
+        chunk = list(islice(rows, ROWS_PER_CHUNK))
+        if not chunk:
+            return
+        yield chunk
+
+
+class PrefetchingParser(ParserInterface):
+    """
+    Runs another parser in a background thread, ahead of the stage consuming its rows.
+
+    The rows are parsed while the consumer builds the graphs of the previous ones. At most
+    depth chunks of rows are parsed and not yet consumed, so the memory stays bounded when
+    the parser is faster than its consumer.
+    """
+
+    def __init__(self, parser_service: ParserInterface, depth: int = 2):
+        """
+        Initializes the PrefetchingParser class.
+
+        Args:
+            parser_service (ParserInterface): The parser run in the background thread.
+            depth (int, optional): Maximum number of chunks of rows parsed ahead, a chunk is
+            ROWS_PER_CHUNK rows or a chunk of iter_columns. Defaults to 2.
+
+        Raises:
+            ValueError: If depth is below 1.
+        """
+        if depth < 1:
+            raise ValueError("depth must be at least 1.")
+
+        self.parser_service = parser_service
+        self.depth = depth
+
+    def parse(self) -> "list[dict]":
+        return list(self.iter_rows())
+
+    def iter_rows(self) -> "Iterator[dict]":
+        chunks = _iter_row_chunks(iter(self.parser_service.iter_rows()))
+        for chunk in prefetch(chunks, self.depth, name="parse"):
+            yield from chunk
+
+    def iter_columns(
+        self, columns: "list[str]", batch_size: int = 0
+    ) -> "Iterator[dict[str, list]]":
+        return prefetch(
+            self.parser_service.iter_columns(columns, batch_size),
+            self.depth,
+            name="parse",
+        )
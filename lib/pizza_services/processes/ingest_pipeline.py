@@ -0,0 +1,118 @@
+from typing import Iterable, Iterator
+
+from ..parsers.interfaces.parser_interface import ParserInterface
+from ..parsers.prefetching_parser import PrefetchingParser
+from ..utils.concurrency import prefetch
+from ..utils.em_http_client import EMHttpClient
+from ..utils.interfaces.output_sink_interface import OutputSinkInterface
+from ..utils.metrics import Metrics, NullMetrics
+from ..utils.payload_cache import PayloadCache
+from .ingest_pizza import IngestPizza
+
+
+class IngestPipeline:
+    """
+    Runs the parsing, the graph build and the upload of an ingestion as concurrent stages.
+
+    The parser runs in its own thread, ahead of the graph builder, which runs in another
+    thread, ahead of the output sink. Bounded queues link the stages: batch N is uploaded while
+    batch N + 1 is built and the next rows are parsed, and a stage blocks when the queue after
+    it is full, so at most queue_depth batches wait between two stages whatever the size of
+    the CSV file.
+    """
+
+    def __init__(
+        self,
+        parser_service: ParserInterface,
+        output_sink: OutputSinkInterface,
+        queue_depth: int = 2,
+        max_in_flight: int = 1,
+        direct_jsonld: bool = False,
+        payload_cache: PayloadCache = None,
+        metrics: Metrics = None,
+        **ingest_options,
+    ):
+        """
+        Initializes the IngestPipeline class.
+
+        Args:
+            parser_service (ParserInterface): The parser of the rows.
+            output_sink (OutputSinkInterface): The sink the graph batches are inserted into.
+            queue_depth (int, optional): Maximum number of chunks of rows, and of graph
+            batches, waiting between two stages. Defaults to 2.
+            max_in_flight (int, optional): Maximum number of batches inserted concurrently.
+            Defaults to 1.
+            direct_jsonld (bool, optional): Whether the batches are built as JSON-LD nodes
+            instead of graphs. Defaults to False.
+            payload_cache (PayloadCache, optional): Cache of the serialized payloads, the
+            builder stage then yields the payloads, read from the cache or built. Requires an
+            EMHttpClient output sink. Defaults to None.
+            metrics (Metrics, optional): Records, besides the metrics of IngestPizza, the time
+            the sink waited for the next batch ("pipeline_build_wait"). Defaults to None
+            (nothing is recorded).
+            **ingest_options: The other IngestPizza arguments, batch_size or max_triples
+            must be set.
+
+        Raises:
+            ValueError: If queue_depth is below 1, if the ingestion is not batched, or if a
+            payload cache is given with another sink than an EMHttpClient.
+        """
+        if queue_depth < 1:
+            raise ValueError("queue_depth must be at least 1.")
+        if not (ingest_options.get("batch_size") or ingest_options.get("max_triples")):
+            raise ValueError("The pipeline requires batch_size or max_triples.")
+        if payload_cache is not None and not isinstance(output_sink, EMHttpClient):
+            raise ValueError("The payload cache requires an EMHttpClient output sink.")
+
+        self.output_sink = output_sink
+        self.queue_depth = queue_depth
+        self.max_in_flight = max_in_flight
+        self.direct_jsonld = direct_jsonld
+        self.payload_cache = payload_cache
+        self.metrics = metrics if metrics is not None else NullMetrics()
+        self.ingest_pizza = IngestPizza(
+            PrefetchingParser(parser_service, queue_depth),
+            metrics=metrics,
+            **ingest_options,
+        )
+
+    def batches(self) -> Iterator:
+        """
+        Yields the batches built ahead by the graph builder thread.
+
+        Yields:
+            Graph | list[dict] | bytes: The graph, the JSON-LD nodes or, with a payload cache,
+            the payload of each batch.
+        """
+        if self.payload_cache is not None:
+            batches = self.ingest_pizza.iter_payloads(
+                self.output_sink, self.payload_cache, self.direct_jsonld
+            )
+        elif self.direct_jsonld:
+            batches = self.ingest_pizza.iter_jsonld()
+        else:
+            batches = self.ingest_pizza.iter_graphs()
+        return self.metrics.timed_iter(
+            "pipeline_build_wait", prefetch(batches, self.queue_depth, name="build")
+        )
+
+    def run(self, batches: Iterable = None) -> Iterator:
+        """
+        Inserts the batches into the output sink as they are built.
+
+        Args:
+            batches (Iterable, optional): The batches to insert, e.g. the ones of the batches
+            method wrapped to log them. Defaults to None (the batches method).
+
+        Yields:
+            The result of the insertion of each batch, in the order of the batches.
+        """
+        if batches is None:
+            batches = self.batches()
+        if self.payload_cache is not None:
+            insert = self.output_sink.insert_payloads
+        elif self.direct_jsonld:
+            insert = self.output_sink.insert_jsonld_graphs
+        else:
+            insert = self.output_sink.insert_graphs
+        yield from insert(batches, max_in_flight=self.max_in_flight)
@@ -1,23 +1,444 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Iterable, Iterator
+
 from rdflib import Graph
 
+from ..models.pizza_batch import PIZZA_COLUMNS, PizzaBatch
 from ..models.pizza_model import PizzaModel
+from ..models.topping_registry import ToppingRegistry
+from ..models.vocabulary import MODEL_VERSION, canonical_price
 from ..parsers.interfaces.parser_interface import ParserInterface
+from ..utils.concurrency import map_in_flight
+from ..utils.em_http_client import EMHttpClient
+from ..utils.metrics import Metrics, NullMetrics
+from ..utils.payload_cache import PayloadCache
+from ..utils.state_index import StateIndex
+from ..utils.triple_buffer import TripleBuffer
+
+# number of rows handed to each worker process when a single graph is built
+SHARD_SIZE = 10000
+
+# counters recorded by the worker processes, added to the metrics of the parent
+WORKER_COUNTERS = ("pizzas", "invalid_prices")
+
+
+class _RowsParser(ParserInterface):
+    """Parser over rows that were already parsed, used to ingest a shard in a worker"""
+
+    def __init__(self, rows: "list[dict]"):
+        self.rows = rows
+
+    def parse(self) -> "list[dict]":
+        return self.rows
+
+
+def _build_triples_shard(
+    rows: "list[dict]", max_triples: int = 0, columnar: bool = False
+) -> "tuple[list[list[tuple]], dict]":
+    """
+    Builds the triples of a shard of rows. Runs in the worker processes.
+
+    Args:
+        rows (list[dict]): The rows of the shard.
+        max_triples (int, optional): Maximum number of triples per graph, the shard is split
+        in several graphs if needed. Defaults to 0 (no limit).
+        columnar (bool, optional): Whether the shard is built from a PizzaBatch.
+        Defaults to False.
+
+    Returns:
+        tuple[list[list[tuple]], dict]: The triples of each graph of the shard, and the
+        WORKER_COUNTERS recorded while building them.
+    """
+    metrics = Metrics()
+    ingest_pizza = IngestPizza(
+        _RowsParser(rows),
+        batch_size=len(rows),
+        max_triples=max_triples,
+        use_triple_buffer=True,
+        columnar=columnar,
+        metrics=metrics,
+    )
+    graphs = [list(triple_buffer) for triple_buffer in ingest_pizza.iter_graphs()]
+    counters = {name: metrics.counters.get(name, 0) for name in WORKER_COUNTERS}
+    return graphs, counters
+
+
+def _chunked(items: Iterable, size: int) -> "Iterator[list]":
+    """
+    Groups the items in lists of size items, a single list if size is 0.
+    Empty lists are never yielded.
+    """
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if size and len(chunk) >= size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
 
 
 class IngestPizza:
 
-    def __init__(self, parser_service: ParserInterface):
+    def __init__(
+        self,
+        parser_service: ParserInterface,
+        batch_size: int = 0,
+        max_triples: int = 0,
+        use_triple_buffer: bool = False,
+        workers: int = 1,
+        columnar: bool = False,
+        state_index: StateIndex = None,
+        topping_registry: ToppingRegistry = None,
+        metrics: Metrics = None,
+    ):
         """
         Initializes the CsvPizzaParser class.
 
         Args:
             parser_service (ParserInterface): An implementation of the ParserInterface.
+            batch_size (int, optional): Maximum number of pizzas per graph. When set (or when
+            max_triples is set) the ingestion runs in batched mode: no graph is built at init
+            and the graphs are yielded lazily by iter_graphs. Defaults to 0 (one single graph).
+            max_triples (int, optional): Maximum number of triples per graph in batched mode.
+            A batch is closed as soon as it reaches this size. Defaults to 0 (no limit).
+            use_triple_buffer (bool, optional): Whether the pizzas are accumulated in a
+            TripleBuffer instead of a rdflib Graph. Faster when the triples are only exported,
+            the buffer can be converted to a Graph with its to_graph method.
+            Defaults to False.
+            workers (int, optional): Number of processes building the graphs. With more than
+            one worker the rows are sharded (one shard per batch, or SHARD_SIZE rows when not
+            batched) and the triples built by the workers are merged in this process.
+            Defaults to 1 (built in this process).
+            columnar (bool, optional): Whether the rows of each batch are loaded in a columnar
+            PizzaBatch instead of one PizzaModel per row. Not compatible with max_triples.
+            Defaults to False.
+            state_index (StateIndex, optional): Index of the pizzas already sent. When set the
+            ingestion runs in delta mode: the pizzas whose triples did not change since they
+            were sent are skipped, and acknowledge_batch must be called for each graph once
+            its upload is done. Not compatible with workers and columnar. Defaults to None.
+            topping_registry (ToppingRegistry, optional): The topping nodes already added,
+            shared with the other ingestions of a run so each topping node is added once.
+            With a deferred registry, acknowledge_batch must be called for each batch once its
+            upload is done. With workers each batch carries the nodes of its toppings, as it
+            is built by a worker with a registry of its own. Defaults to None (a registry of
+            its own).
+            metrics (Metrics, optional): Records the graph build durations ("graph_build",
+            including the parsing of the rows it pulls, and "pizza_build_node", not recorded
+            with workers), and the number of pizzas, graphs, triples and invalid prices.
+            Defaults to None (nothing is recorded).
+
+        Raises:
+            ValueError: If both columnar and max_triples are set, or if state_index is set with
+            workers or columnar.
+        """
+        if columnar and max_triples:
+            raise ValueError("max_triples is not supported by the columnar model.")
+        if state_index is not None and (workers > 1 or columnar):
+            raise ValueError("The delta mode does not support workers and columnar.")
+
+        self.parser_service = parser_service
+        self.batch_size = batch_size
+        self.max_triples = max_triples
+        self.use_triple_buffer = use_triple_buffer
+        self.workers = workers
+        self.columnar = columnar
+        self.state_index = state_index
+        self.metrics = metrics if metrics is not None else NullMetrics()
+        # number of pizzas skipped in delta mode because they did not change
+        self.skipped_pizzas = 0
+        # (uuid, digest) of the pizzas of each yielded graph waiting for acknowledge_batch
+        self._pending_records = deque()
+        # with a deferred topping registry, the toppings of the batch being built, then of
+        # each yielded batch waiting for acknowledge_batch
+        self._batch_toppings = set()
+        self._pending_toppings = deque()
+        # the topping nodes are added once per run, the later batches only reference them
+        self.topping_registry = (
+            topping_registry if topping_registry is not None else ToppingRegistry()
+        )
+        self.pizzas_graph = None
+
+        if not self.batched:
+            with self.metrics.time("graph_build"):
+                self.pizzas_graph = self._build_single_graph()
+
+    def _build_single_graph(self) -> "Graph | TripleBuffer":
+        """Builds the single graph of all the pizzas, when not in batched mode."""
+        if self.workers > 1:
+            # the shared topping nodes are deduplicated by the graph when merging
+            pizzas_graph = self._new_graph()
+            for graph in self._iter_parallel_graphs():
+                self._add_triples(pizzas_graph, graph)
+            return pizzas_graph
+
+        if self.columnar:
+            # the columns are streamed in shards, so only one shard is held besides the graph
+            pizzas_graph = self._new_graph()
+            for pizza_batch in self._iter_columnar_batches(SHARD_SIZE):
+                self._collect_toppings(pizza_batch.toppings)
+                pizza_batch.build_node(pizzas_graph, self.topping_registry)
+            return pizzas_graph
+
+        # rows are consumed lazily from the parser, so only the graph is kept in memory
+        pizzas = self._iter_pizza_models(self.parser_service.iter_rows())
+        if self.state_index is not None:
+            return next(self._iter_pizzas_graphs(pizzas), self._new_graph())
+
+        return self._mount_pizzas_graph(pizzas)
+
+    @property
+    def batched(self) -> bool:
+        """Whether the ingestion splits the pizzas in several graphs."""
+        return bool(self.batch_size or self.max_triples)
+
+    def iter_graphs(self) -> "Iterator[Graph]":
+        """
+        Yields the graphs to be inserted into the Exchange Manager.
+
+        In batched mode the rows are streamed from the parser and one graph is yielded each
+        time a batch is full, so only one batch is kept in memory. Otherwise the single graph
+        built at init is yielded. Empty graphs are never yielded.
+
+        Yields:
+            Graph: A Graph object (or TripleBuffer) per batch.
         """
+        if not self.batched:
+            graphs = [self.pizzas_graph] if len(self.pizzas_graph) else []
+        else:
+            graphs = self.metrics.timed_iter("graph_build", self._iter_batched_graphs())
 
-        pizza_array = parser_service.parse()
+        for graph in graphs:
+            self.metrics.increment("graphs")
+            self.metrics.increment("triples", len(graph))
+            self._close_batch_toppings()
+            yield graph
 
-        pizzas = self._mount_pizza_models(pizza_array)
-        self.pizzas_graph = self._mount_pizzas_graph(pizzas)
+    def _iter_batched_graphs(self) -> "Iterator[Graph | TripleBuffer]":
+        """Builds the graph of each batch, in batched mode."""
+        if self.workers > 1:
+            for graph in self._iter_parallel_graphs():
+                yield self._add_triples(self._new_graph(), graph)
+            return
+
+        if self.columnar:
+            for pizza_batch in self._iter_columnar_batches(self.batch_size):
+                self._collect_toppings(pizza_batch.toppings)
+                yield pizza_batch.build_node(self._new_graph(), self.topping_registry)
+            return
+
+        pizzas = self._iter_pizza_models(self.parser_service.iter_rows())
+        yield from self._iter_pizzas_graphs(pizzas)
+
+    def iter_jsonld(self) -> "Iterator[list[dict]]":
+        """
+        Yields the JSON-LD nodes of the graphs to be inserted into the Exchange Manager.
+
+        The nodes are built directly from the PizzaModel objects, skipping the rdflib Graph and
+        its json-ld serializer. The rows are always streamed from the parser and split in
+        batches of batch_size pizzas (a single batch if batch_size is not set). The nodes are
+        always built in this process from PizzaModel objects, the workers and columnar options
+        are not used.
+
+        Raises:
+            ValueError: If max_triples is set, the JSON-LD nodes are not counted in triples,
+            or in delta mode.
+
+        Yields:
+            list[dict]: The JSON-LD nodes of each batch.
+        """
+        if self.max_triples:
+            raise ValueError(
+                "max_triples is not supported when building JSON-LD directly."
+            )
+        if self.state_index is not None:
+            raise ValueError(
+                "The delta mode is not supported when building JSON-LD directly."
+            )
+
+        pizzas = self._iter_pizza_models(self.parser_service.iter_rows())
+        batches = (
+            self._mount_pizzas_jsonld(batch)
+            for batch in self._iter_pizza_batches(pizzas)
+        )
+        for nodes in self.metrics.timed_iter("jsonld_build", batches):
+            self.metrics.increment("graphs")
+            self._close_batch_toppings()
+            yield nodes
+
+    def iter_payloads(
+        self,
+        em_http_client: EMHttpClient,
+        payload_cache: PayloadCache,
+        direct_jsonld: bool = False,
+    ) -> "Iterator[bytes]":
+        """
+        Yields the serialized insertGraph payloads of the batches, reusing the cached ones.
+
+        The payload of a batch is cached under a key computed from its rows, the model version
+        and the payload options of the client, so an unchanged batch of a rerun is read from
+        the cache instead of being built and serialized again. Each batch is built with its
+        own topping nodes, so its payload does not depend on the batches before it.
+
+        Args:
+            em_http_client (EMHttpClient): The client the payloads are built for.
+            payload_cache (PayloadCache): The cache of the payloads.
+            direct_jsonld (bool, optional): Whether the missing payloads are built directly
+            as JSON-LD nodes instead of rdflib graphs. Defaults to False.
+
+        Raises:
+            ValueError: If batch_size is not set, if max_triples or workers is set, or in
+            delta mode.
+
+        Yields:
+            bytes: The payload of each batch, not compressed.
+        """
+        if not self.batch_size or self.max_triples or self.workers > 1:
+            raise ValueError(
+                "The payload cache requires batch_size, without max_triples."
+            )
+        if self.state_index is not None:
+            raise ValueError("The delta mode is not supported with the payload cache.")
+
+        payload_options = [
+            em_http_client.em_client_name,
+            getattr(em_http_client.payload_format, "name", "json-ld"),
+            direct_jsonld,
+        ]
+        for rows in _chunked(self.parser_service.iter_rows(), self.batch_size):
+            key = payload_cache.key_of(MODEL_VERSION, payload_options, rows)
+            payload = payload_cache.get(key)
+            if payload is None:
+                with self.metrics.time("graph_build"):
+                    if direct_jsonld:
+                        payload = em_http_client.build_payload(
+                            self._build_batch_jsonld(rows)
+                        )
+                    else:
+                        payload = em_http_client.serialize_graph(
+                            self._build_batch_graph(rows)
+                        )
+                payload_cache.put(key, payload)
+            self.metrics.increment("pizzas", len(rows))
+            self.metrics.increment("graphs")
+            # each payload carries its topping nodes, there is nothing to confirm
+            self._close_batch_toppings()
+            yield payload
+
+    def _build_batch_graph(self, rows: "list[dict]") -> "Graph | TripleBuffer":
+        """Builds the graph of a batch of rows, with its own topping nodes."""
+        topping_registry = ToppingRegistry()
+        if self.columnar:
+            pizza_batch = PizzaBatch.from_rows(rows)
+            self.metrics.increment("invalid_prices", pizza_batch.invalid_prices)
+            return pizza_batch.build_node(self._new_graph(), topping_registry)
+
+        pizza_graph = self._new_graph()
+        for pizza in self._iter_pizza_models(rows):
+            pizza_graph = pizza.build_node(pizza_graph, topping_registry)
+        return pizza_graph
+
+    def _build_batch_jsonld(self, rows: "list[dict]") -> "list[dict]":
+        """Builds the JSON-LD nodes of a batch of rows, with its own topping nodes."""
+        topping_registry = ToppingRegistry()
+        nodes = {}
+        for pizza in self._iter_pizza_models(rows):
+            nodes = pizza.build_jsonld(nodes, topping_registry)
+        return list(nodes.values())
+
+    def acknowledge_batch(self, sent: bool) -> None:
+        """
+        Acknowledges the oldest graph yielded in delta mode, or with a deferred topping
+        registry, and not acknowledged yet.
+
+        The graphs must be acknowledged in the order they were yielded. Does nothing when not
+        in delta mode and the topping registry is not deferred.
+
+        Args:
+            sent (bool): Whether the graph was inserted successfully. Only the pizzas of the
+            sent graphs are recorded in the state index, so the others are retried next run,
+            and only their toppings are confirmed in the topping registry.
+        """
+        if self.topping_registry.deferred:
+            toppings = self._pending_toppings.popleft()
+            if sent:
+                self.topping_registry.confirm(toppings)
+
+        if self.state_index is None:
+            return
+
+        records = self._pending_records.popleft()
+        if sent:
+            self.state_index.mark_sent(records)
+
+    def _collect_toppings(self, toppings: "Iterable[str]") -> None:
+        """Records the toppings of the batch being built, with a deferred registry."""
+        if self.topping_registry.deferred:
+            self._batch_toppings.update(toppings)
+
+    def _close_batch_toppings(self) -> None:
+        """Keeps the toppings of a yielded batch until it is acknowledged."""
+        if self.topping_registry.deferred:
+            self._pending_toppings.append(self._batch_toppings)
+            self._batch_toppings = set()
+
+    def _new_graph(self) -> "Graph | TripleBuffer":
+        """Creates the empty container the pizzas triples are added to."""
+        return TripleBuffer() if self.use_triple_buffer else Graph()
+
+    @staticmethod
+    def _add_triples(
+        graph: "Graph | TripleBuffer", triples: "Iterable[tuple]"
+    ) -> "Graph | TripleBuffer":
+        """Adds the triples to a Graph or a TripleBuffer, returning it."""
+        if isinstance(graph, TripleBuffer):
+            return graph.update(triples)
+
+        return TripleBuffer(triples).to_graph(graph)
+
+    def _iter_columnar_batches(self, batch_size: int) -> "Iterator[PizzaBatch]":
+        """
+        Loads the column chunks of the parser in PizzaBatch objects.
+
+        Args:
+            batch_size (int): Maximum number of pizzas per batch, 0 for a single batch.
+
+        Yields:
+            PizzaBatch: A batch per chunk of the parser.
+        """
+        for columns in self.parser_service.iter_columns(PIZZA_COLUMNS, batch_size):
+            pizza_batch = PizzaBatch.from_columns(columns)
+            self.metrics.increment("pizzas", len(pizza_batch))
+            self.metrics.increment("invalid_prices", pizza_batch.invalid_prices)
+            yield pizza_batch
+
+    def _iter_parallel_graphs(self) -> "Iterator[list[tuple]]":
+        """
+        Builds the triples in a pool of worker processes.
+
+        The rows are streamed from the parser in shards, at most two shards per worker are
+        pending at the same time so the memory stays bounded.
+
+        Yields:
+            list[tuple]: The triples of each graph, in the same order as the rows.
+        """
+        shards = _chunked(
+            self.parser_service.iter_rows(), self.batch_size or SHARD_SIZE
+        )
+        build_shard = partial(
+            _build_triples_shard, max_triples=self.max_triples, columnar=self.columnar
+        )
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for shard_graphs, counters in map_in_flight(
+                executor, build_shard, shards, 2 * self.workers
+            ):
+                for name, value in counters.items():
+                    self.metrics.increment(name, value)
+                yield from shard_graphs
 
     def _mount_pizza_models(self, pizzas: "list[dict]") -> "list[PizzaModel]":
         """
@@ -36,18 +457,130 @@ class IngestPizza:
 
         return pizza_models
 
-    def _mount_pizzas_graph(self, pizza_models_array: "list[PizzaModel]") -> Graph:
+    def _iter_pizza_models(self, pizzas: "Iterable[dict]") -> "Iterator[PizzaModel]":
+        """
+        Lazily mounts PizzaModel objects from an iterable of dictionaries.
+
+        Args:
+            pizzas (Iterable): An iterable of dictionaries, e.g. the rows yielded by a parser.
+
+        Yields:
+            PizzaModel: One PizzaModel object per dictionary.
+        """
+        for pizza in pizzas:
+            pizza_model = PizzaModel(pizza)
+            if canonical_price(pizza_model.price) is None:
+                # the pizza is still ingested, without its price
+                self.metrics.increment("invalid_prices")
+            yield pizza_model
+
+    def _mount_pizzas_graph(self, pizza_models_array: "Iterable[PizzaModel]") -> Graph:
         """
         Mounts a Graph object from a list of PizzaModel objects.
 
         Args:
-            pizza_models_array (list): A list of PizzaModel objects.
+            pizza_models_array (Iterable): A list, or any iterable, of PizzaModel objects.
 
         Returns:
-            Graph: A Graph object.
+            Graph: A Graph object, or a TripleBuffer if use_triple_buffer is set.
         """
-        pizza_graph = Graph()
+        pizza_graph = self._new_graph()
         for pizza in pizza_models_array:
-            pizza_graph = pizza.build_node(pizza_graph)
+            with self.metrics.time("pizza_build_node"):
+                pizza_graph = pizza.build_node(pizza_graph, self.topping_registry)
+            self._collect_toppings(pizza.ingredients)
+            self.metrics.increment("pizzas")
 
         return pizza_graph
+
+    def _iter_pizzas_graphs(
+        self, pizza_models: "Iterable[PizzaModel]"
+    ) -> "Iterator[Graph]":
+        """
+        Mounts one Graph object per batch of PizzaModel objects.
+
+        A batch is closed when it holds batch_size pizzas or when its graph reaches
+        max_triples triples, whichever comes first. In delta mode the unchanged pizzas are
+        skipped and the records of each yielded graph are kept for acknowledge_batch.
+
+        Args:
+            pizza_models (Iterable): An iterable of PizzaModel objects.
+
+        Yields:
+            Graph: A Graph object (or TripleBuffer) per batch. Empty batches are never yielded.
+        """
+        pizza_graph = self._new_graph()
+        pizzas_in_batch = 0
+        records = []
+        for pizza in pizza_models:
+            if self.state_index is None:
+                with self.metrics.time("pizza_build_node"):
+                    pizza_graph = pizza.build_node(pizza_graph, self.topping_registry)
+            else:
+                with self.metrics.time("pizza_build_node"):
+                    # built with its own topping nodes, so its digest does not depend on the
+                    # pizzas before it
+                    pizza_triples = pizza.build_node(TripleBuffer())
+                record = (str(pizza.uuid), pizza_triples.digest())
+                if self.state_index.is_unchanged(*record):
+                    self.skipped_pizzas += 1
+                    continue
+                pizza_graph = self._add_triples(pizza_graph, pizza_triples)
+                records.append(record)
+            self._collect_toppings(pizza.ingredients)
+            pizzas_in_batch += 1
+            self.metrics.increment("pizzas")
+
+            if (self.batch_size and pizzas_in_batch >= self.batch_size) or (
+                self.max_triples and len(pizza_graph) >= self.max_triples
+            ):
+                yield self._close_batch(pizza_graph, records)
+                pizza_graph = self._new_graph()
+                pizzas_in_batch = 0
+                records = []
+
+        if pizzas_in_batch:
+            yield self._close_batch(pizza_graph, records)
+
+    def _close_batch(
+        self, pizza_graph: "Graph | TripleBuffer", records: "list[tuple[str, str]]"
+    ) -> "Graph | TripleBuffer":
+        """Keeps the records of a batch until it is acknowledged, in delta mode."""
+        if self.state_index is not None:
+            self._pending_records.append(records)
+        return pizza_graph
+
+    def _iter_pizza_batches(
+        self, pizza_models: "Iterable[PizzaModel]"
+    ) -> "Iterator[list[PizzaModel]]":
+        """
+        Groups the PizzaModel objects in lists of batch_size objects.
+
+        Args:
+            pizza_models (Iterable): An iterable of PizzaModel objects.
+
+        Yields:
+            list[PizzaModel]: A batch of PizzaModel objects, all of them if batch_size is not
+            set. Empty batches are never yielded.
+        """
+        yield from _chunked(pizza_models, self.batch_size)
+
+    def _mount_pizzas_jsonld(
+        self, pizza_models_array: "Iterable[PizzaModel]"
+    ) -> "list[dict]":
+        """
+        Mounts the JSON-LD nodes of a list of PizzaModel objects.
+
+        Args:
+            pizza_models_array (Iterable): A list, or any iterable, of PizzaModel objects.
+
+        Returns:
+            list[dict]: The JSON-LD nodes, pizzas and toppings, in insertion order.
+        """
+        nodes = {}
+        for pizza in pizza_models_array:
+            nodes = pizza.build_jsonld(nodes, self.topping_registry)
+            self._collect_toppings(pizza.ingredients)
+            self.metrics.increment("pizzas")
+
+        return list(nodes.values())
@@ -1,9 +1,12 @@
 import csv
+import io
 import os
+import sys
 
 import pytest
 
 from ..parsers.csv_parser import CsvParser
+from ..utils.metrics import Metrics
 
 
 @pytest.fixture(name="csv_file")
@@ -42,7 +45,10 @@ def test_init(csv_file):
     parser = CsvParser(csv_file, ["name", "toppings", "price"])
 
     assert parser.path_to_csv == csv_file
+    # the mapping is resolved from the header when the file is read
     # pylint: disable=protected-access
+    assert parser._mapper is None
+    parser.parse()
     assert parser._mapper == {"name": 0, "toppings": 1, "price": 2}
 
 
@@ -59,3 +65,114 @@ def test_parse(csv_file):
         {"name": "Pepperoni", "toppings": "pepperoni", "price": "12.00"},
         {"name": "Hawaiian", "toppings": "ham,pineapple", "price": "14.00"},
     ]
+
+
+def test_iter_rows(csv_file):
+    """
+    Test the iter_rows method of the CsvPizzaParser class.
+    """
+    parser = CsvParser(csv_file, ["name", "price"])
+
+    rows = parser.iter_rows()
+
+    assert not isinstance(rows, list)
+    assert next(rows) == {"name": "Margherita", "price": "10.00"}
+    assert list(rows) == [
+        {"name": "Pepperoni", "price": "12.00"},
+        {"name": "Hawaiian", "price": "14.00"},
+    ]
+
+
+def test_iter_columns(csv_file):
+    metrics = Metrics()
+    parser = CsvParser(csv_file, ["name", "price"], metrics=metrics)
+
+    chunks = list(parser.iter_columns(["name", "price", "unknown"], batch_size=2))
+
+    assert chunks == [
+        {
+            "name": ["Margherita", "Pepperoni"],
+            "price": ["10.00", "12.00"],
+            "unknown": ["", ""],
+        },
+        {"name": ["Hawaiian"], "price": ["14.00"], "unknown": [""]},
+    ]
+    assert metrics.to_dict()["counters"]["csv_rows"] == 3
+
+
+def test_iter_columns_single_chunk(csv_file):
+    parser = CsvParser(csv_file, ["name", "price"])
+
+    chunks = list(parser.iter_columns(["price"]))
+
+    assert chunks == [{"price": ["10.00", "12.00", "14.00"]}]
+
+
+def test_iter_rows_metrics(csv_file):
+    metrics = Metrics()
+    parser = CsvParser(csv_file, ["name", "price"], metrics=metrics)
+
+    parser.parse()
+
+    assert metrics.to_dict()["counters"]["csv_rows"] == 3
+    assert metrics.to_dict()["timers"]["csv_parse"]["count"] == 3
+
+
+def test_iter_rows_metrics_stopped_early(csv_file):
+    metrics = Metrics()
+    rows = CsvParser(csv_file, ["name", "price"], metrics=metrics).iter_rows()
+
+    next(rows)
+    rows.close()
+
+    assert metrics.to_dict()["counters"]["csv_rows"] == 1
+
+
+def test_parse_opens_file_once(csv_file, monkeypatch):
+    opened = []
+    original_open = open
+
+    def counting_open(*args, **kwargs):
+        opened.append(args[0])
+        return original_open(*args, **kwargs)
+
+    monkeypatch.setattr("builtins.open", counting_open)
+
+    CsvParser(csv_file, ["name"]).parse()
+
+    assert opened == [csv_file]
+
+
+def test_parse_text_file_object():
+    csvfile = io.StringIO('name,price\n"Pizza, Margherita",10.00\n')
+
+    result = CsvParser(csvfile, ["price", "name"]).parse()
+
+    assert result == [{"name": "Pizza, Margherita", "price": "10.00"}]
+    assert not csvfile.closed
+
+
+def test_parse_binary_file_object():
+    csvfile = io.BytesIO("name,price\nMargherita,10.00\n".encode("utf-8"))
+
+    result = CsvParser(csvfile, ["name", "price"]).parse()
+
+    assert result == [{"name": "Margherita", "price": "10.00"}]
+    assert not csvfile.closed
+
+
+def test_parse_stdin(monkeypatch):
+    stdin = io.TextIOWrapper(
+        io.BytesIO(b"name,price\nMargherita,10.00\n"), encoding="utf-8"
+    )
+    monkeypatch.setattr(sys, "stdin", stdin)
+
+    result = CsvParser("-", ["name"]).parse()
+
+    assert result == [{"name": "Margherita"}]
+
+
+def test_parse_unmapped_columns(csv_file):
+    result = CsvParser(csv_file, ["unknown"]).parse()
+
+    assert result == [{}, {}, {}]
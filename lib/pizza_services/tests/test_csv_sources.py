@@ -0,0 +1,118 @@
+import bz2
+import csv
+import gzip
+import lzma
+import sys
+
+import pytest
+
+from ..parsers.csv_parser import CsvParser
+from ..parsers.csv_sources import expand_csv_paths, open_csv_source
+
+CSV_CONTENT = 'name,price\n"Pizza, Margherita",10.00\n"Multi\nline",12.00\n'
+
+
+def read_rows(source, use_mmap=False):
+    with open_csv_source(source, use_mmap) as lines:
+        return list(csv.reader(lines))
+
+
+@pytest.fixture(name="plain_csv")
+def setup_plain_csv(tmp_path):
+    path = tmp_path / "pizzas.csv"
+    path.write_bytes(CSV_CONTENT.encode("utf-8"))
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    "extension, compress",
+    [(".gz", gzip.compress), (".bz2", bz2.compress), (".xz", lzma.compress)],
+)
+def test_open_compressed(tmp_path, extension, compress):
+    path = tmp_path / f"pizzas.csv{extension}"
+    path.write_bytes(compress(CSV_CONTENT.encode("utf-8")))
+
+    assert read_rows(str(path)) == [
+        ["name", "price"],
+        ["Pizza, Margherita", "10.00"],
+        ["Multi\nline", "12.00"],
+    ]
+
+
+def test_open_mmap(plain_csv):
+    assert read_rows(plain_csv, use_mmap=True) == read_rows(plain_csv)
+
+
+def test_open_mmap_empty_file(tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_bytes(b"")
+
+    assert read_rows(str(path), use_mmap=True) == []
+
+
+def test_open_zstd(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    path = tmp_path / "pizzas.csv.zst"
+    path.write_bytes(zstandard.ZstdCompressor().compress(CSV_CONTENT.encode("utf-8")))
+
+    assert read_rows(str(path))[1] == ["Pizza, Margherita", "10.00"]
+
+
+def test_open_zstd_without_zstandard(tmp_path, monkeypatch):
+    path = tmp_path / "pizzas.csv.zst"
+    path.write_bytes(b"")
+    monkeypatch.setitem(sys.modules, "zstandard", None)
+
+    with pytest.raises(ImportError):
+        read_rows(str(path))
+
+
+def test_csv_parser_compressed(tmp_path):
+    path = tmp_path / "pizzas.csv.gz"
+    path.write_bytes(gzip.compress(CSV_CONTENT.encode("utf-8")))
+
+    result = CsvParser(str(path), ["name"]).parse()
+
+    assert result == [{"name": "Pizza, Margherita"}, {"name": "Multi\nline"}]
+
+
+def test_csv_parser_mmap(plain_csv):
+    result = CsvParser(plain_csv, ["name", "price"], use_mmap=True).parse()
+
+    assert result == CsvParser(plain_csv, ["name", "price"]).parse()
+
+
+def test_expand_csv_paths_directory(tmp_path):
+    for name in ("b.csv", "a.csv.gz", "notes.txt", "nested/c.csv"):
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_text("pizza_id\n")
+
+    assert expand_csv_paths([str(tmp_path)]) == [
+        str(tmp_path / "a.csv.gz"),
+        str(tmp_path / "b.csv"),
+    ]
+
+
+def test_expand_csv_paths_glob(tmp_path):
+    for name in ("b.csv", "a.csv", "notes.txt", "nested/c.csv"):
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_text("pizza_id\n")
+
+    assert expand_csv_paths([str(tmp_path / "**" / "*")]) == [
+        str(tmp_path / "a.csv"),
+        str(tmp_path / "b.csv"),
+        str(tmp_path / "nested" / "c.csv"),
+    ]
+
+
+def test_expand_csv_paths_literal(plain_csv, tmp_path):
+    missing = str(tmp_path / "missing.csv")
+
+    # a missing file is kept, its ingestion reports the error; a file given twice is kept once
+    assert expand_csv_paths(
+        ["-", plain_csv, missing, plain_csv, str(tmp_path / "*.csv")]
+    ) == [
+        "-",
+        plain_csv,
+        missing,
+    ]
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from ..utils.directory_watcher import DirectoryWatcher
+
+
+def test_picks_complete_files_once(tmp_path):
+    (tmp_path / "pizzas.csv").write_text("pizza_id\n1\n")
+    (tmp_path / "notes.txt").write_text("not a csv")
+    watcher = DirectoryWatcher(str(tmp_path))
+
+    # a file is ready once it did not change between two polls
+    assert watcher.poll() == []
+    assert watcher.poll() == [str(tmp_path / "pizzas.csv")]
+    assert watcher.poll() == []
+
+
+def test_waits_for_files_being_written(tmp_path):
+    path = tmp_path / "pizzas.csv.gz"
+    path.write_bytes(b"part")
+    watcher = DirectoryWatcher(str(tmp_path))
+    watcher.poll()
+
+    path.write_bytes(b"part and the rest")
+
+    assert watcher.poll() == []
+    assert watcher.poll() == [str(path)]
+
+
+def test_picks_modified_files_again(tmp_path):
+    path = tmp_path / "pizzas.csv"
+    path.write_text("pizza_id\n1\n")
+    watcher = DirectoryWatcher(str(tmp_path))
+    watcher.poll()
+    watcher.poll()
+
+    path.write_text("pizza_id\n1\n2\n")
+    os.utime(path, ns=(1, 1))
+    watcher.poll()
+
+    assert watcher.poll() == [str(path)]
+
+
+def test_oldest_first(tmp_path):
+    for name, mtime in (("b.csv", 2), ("a.csv", 3), ("c.CSV", 1)):
+        (tmp_path / name).write_text("pizza_id\n")
+        os.utime(tmp_path / name, ns=(mtime, mtime))
+    watcher = DirectoryWatcher(str(tmp_path))
+    watcher.poll()
+
+    assert watcher.poll() == [
+        str(tmp_path / name) for name in ("c.CSV", "b.csv", "a.csv")
+    ]
+
+
+def test_missing_directory(tmp_path):
+    with pytest.raises(ValueError):
+        DirectoryWatcher(str(tmp_path / "missing"))
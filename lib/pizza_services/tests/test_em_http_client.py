@@ -1,8 +1,21 @@
+import gzip
+import json
+import logging
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import pytest
+import requests
 import responses
 from rdflib import RDF, RDFS, XSD, Graph, Literal, URIRef
 
+from ..utils import em_http_client as em_http_client_module
 from ..utils.em_http_client import EMHttpClient
+from ..utils.metrics import Metrics
+from ..utils.outbox import Outbox
+from ..utils.payload_formats import NTriplesFormat
 
 
 @pytest.fixture(name="em_http_client")
@@ -41,10 +54,79 @@ def setup_graph():
     return g
 
 
+class DelayedStubHandler(BaseHTTPRequestHandler):
+    """Answers every insertGraph request after a delay, echoing the root of the graph"""
+
+    delays = {}
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        root = payload["inputs"]["graph"]["roots"][0]
+        time.sleep(self.delays.get(root, 0.1))
+
+        body = json.dumps({"root": root}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+@pytest.fixture(name="stub_server_url")
+def setup_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DelayedStubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_port}"
+
+    server.shutdown()
+    server.server_close()
+
+
+def build_pizza_graphs(count: int) -> "list[Graph]":
+    graphs = []
+    for index in range(count):
+        g = Graph()
+        g.add(
+            (
+                URIRef(f"http://www.perfect-memory.com/profile/pizza/kb/{index}"),
+                RDF.type,
+                URIRef("http://www.perfect-memory.com/ontology/pizza/1.1#Pizza"),
+            )
+        )
+        graphs.append(g)
+    return graphs
+
+
 def test_init(em_http_client):
     assert em_http_client.em_base_url == "http://localhost:8080"
     assert em_http_client.em_api_key == "1234567890"
     assert em_http_client.em_client_name == "pizza_service"
+    assert em_http_client.session.headers["x-api-key"] == "1234567890"
+
+
+def test_init_pool_size():
+    em_http_client = EMHttpClient(
+        "http://localhost:8080", "1234567890", "pizza_service", pool_size=16
+    )
+
+    adapter = em_http_client.session.get_adapter("http://localhost:8080")
+    # pylint: disable=protected-access
+    assert adapter._pool_maxsize == 16
+
+
+def test_close(em_http_client, monkeypatch):
+    closed = []
+    monkeypatch.setattr(em_http_client.session, "close", lambda: closed.append(True))
+
+    with em_http_client as client:
+        assert client is em_http_client
+
+    assert closed == [True]
 
 
 @responses.activate
@@ -62,6 +144,93 @@ def test_insert_graph(em_http_client, graph):
     assert response.json() == {"status": "success"}
 
 
+@responses.activate
+def test_insert_graph_reuses_session(em_http_client, graph, monkeypatch):
+    responses.add(
+        responses.POST,
+        "http://localhost:8080/v1/requests",
+        json={"status": "success"},
+        status=200,
+    )
+    monkeypatch.setattr(requests, "post", None)  # module level post must not be used
+
+    em_http_client.insert_graph(graph)
+    em_http_client.insert_graph(graph)
+
+    assert len(responses.calls) == 2
+    assert responses.calls[1].request.headers["x-api-key"] == "1234567890"
+
+
+@responses.activate
+def test_insert_graph_compressed(graph):
+    em_http_client = EMHttpClient(
+        "http://localhost:8080", "1234567890", "pizza_service", compress=True
+    )
+    responses.add(
+        responses.POST,
+        "http://localhost:8080/v1/requests",
+        json={"status": "success"},
+        status=200,
+    )
+
+    em_http_client.insert_graph(graph)
+
+    request = responses.calls[0].request
+    assert request.headers["Content-Encoding"] == "gzip"
+    payload = json.loads(gzip.decompress(request.body))
+    assert payload["item_name"] == "insert_graph"
+    assert payload["inputs"]["graph"]["roots"] == [
+        "http://www.perfect-memory.com/profile/pizza/kb/12345"
+    ]
+
+
+@responses.activate
+def test_insert_jsonld(em_http_client):
+    responses.add(
+        responses.POST,
+        "http://localhost:8080/v1/requests",
+        json={"status": "success"},
+        status=200,
+    )
+    graph_json = [
+        {
+            "@id": "http://www.perfect-memory.com/profile/pizza/kb/12345",
+            "@type": ["http://www.perfect-memory.com/ontology/pizza/1.1#Pizza"],
+        }
+    ]
+
+    response = em_http_client.insert_jsonld(graph_json)
+
+    assert response.status_code == 200
+    payload = json.loads(responses.calls[0].request.body)
+    assert payload["inputs"]["graph"]["value"] == [{"@graph": graph_json}]
+    assert payload["inputs"]["graph"]["roots"] == [
+        "http://www.perfect-memory.com/profile/pizza/kb/12345"
+    ]
+
+
+@responses.activate
+def test_insert_graph_metrics(graph):
+    metrics = Metrics()
+    em_http_client = EMHttpClient(
+        "http://localhost:8080", "1234567890", "pizza_service", metrics=metrics
+    )
+    responses.add(
+        responses.POST,
+        "http://localhost:8080/v1/requests",
+        json={"status": "success"},
+        status=200,
+    )
+
+    em_http_client.insert_graph(graph)
+
+    recorded = metrics.to_dict()
+    assert recorded["counters"]["http_responses_2xx"] == 1
+    assert recorded["counters"]["payload_bytes"] == len(responses.calls[0].request.body)
+    assert recorded["timers"]["http_request"]["count"] == 1
+    assert recorded["timers"]["jsonld_serialize"]["count"] == 1
+
+
 @responses.activate
 def test_insert_graph_error(em_http_client, graph):
     responses.add(
@@ -75,3 +244,315 @@ def test_insert_graph_error(em_http_client, graph):
 
     assert response.status_code == 500
     assert response.json() == {"error": "An error occurred"}
+
+
+@responses.activate
+def test_insert_graphs(em_http_client, graph):
+    responses.add(
+        responses.POST,
+        "http://localhost:8080/v1/requests",
+        json={"status": "success"},
+        status=200,
+    )
+
+    result = list(em_http_client.insert_graphs([graph, graph, graph], max_in_flight=2))
+
+    assert len(result) == 3
+    assert all(response.status_code == 200 for response in result)
+    assert len(responses.calls) == 3
+
+
+def test_insert_graphs_keeps_order(stub_server_url):
+    em_http_client = EMHttpClient(stub_server_url, "1234567890", "pizza_service")
+    # the first graph is the slowest one, so it finishes last
+    DelayedStubHandler.delays = {
+        "http://www.perfect-memory.com/profile/pizza/kb/0": 0.3
+    }
+
+    result = list(em_http_client.insert_graphs(build_pizza_graphs(4), max_in_flight=4))
+
+    assert [response.json()["root"] for response in result] == [
+        f"http://www.perfect-memory.com/profile/pizza/kb/{index}" for index in range(4)
+    ]
+
+
+def test_insert_graphs_bounds_in_flight(em_http_client, monkeypatch):
+    lock = threading.Lock()
+    counters = {"in_flight": 0, "max_in_flight": 0}
+
+    def fake_insert_graph(_graph):
+        with lock:
+            counters["in_flight"] += 1
+            counters["max_in_flight"] = max(
+                counters["max_in_flight"], counters["in_flight"]
+            )
+        time.sleep(0.02)
+        with lock:
+            counters["in_flight"] -= 1
+
+    monkeypatch.setattr(em_http_client, "insert_graph", fake_insert_graph)
+
+    list(em_http_client.insert_graphs(build_pizza_graphs(10), max_in_flight=3))
+
+    assert counters["max_in_flight"] == 3
+
+
+def test_insert_graphs_concurrent_speedup(stub_server_url):
+    em_http_client = EMHttpClient(stub_server_url, "1234567890", "pizza_service")
+    DelayedStubHandler.delays = {}
+    graphs = build_pizza_graphs(8)
+
+    start = time.perf_counter()
+    list(em_http_client.insert_graphs(graphs, max_in_flight=1))
+    serial_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    list(em_http_client.insert_graphs(graphs, max_in_flight=4))
+    concurrent_time = time.perf_counter() - start
+
+    # 8 requests of 0.1s: ~0.8s serial against ~0.2s with 4 requests in flight
+    assert concurrent_time < serial_time / 2
+
+
+@pytest.fixture(name="sleeps")
+def setup_sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(em_http_client_module.time, "sleep", sleeps.append)
+    return sleeps
+
+
+@responses.activate
+def test_insert_graph_retries_transient_status(em_http_client, graph, sleeps):
+    responses.add(
+        responses.POST,
+        "http://localhost:8080/v1/requests",
+        status=503,
+        headers={"Retry-After": "2"},
+    )
+    responses.add(
+        responses.POST,
+        "http://localhost:8080/v1/requests",
+        json={"status": "success"},
+        status=200,
+    )
+
+    response = em_http_client.insert_graph(graph)
+
+    assert response.status_code == 200
+    assert len(responses.calls) == 2
+    assert sleeps == [2.0]
+    assert responses.calls[0].request.body == responses.calls[1].request.body
+
+
+@responses.activate
+def test_insert_graph_retries_connection_error(em_http_client, graph, sleeps):
+    responses.add(
+        responses.POST,
+        "http://localhost:8080/v1/requests",
+        body=requests.ConnectionError("connection refused"),
+    )
+    responses.add(
+        responses.POST,
+        "http://localhost:8080/v1/requests",
+        json={"status": "success"},
+        status=200,
+    )
+
+    response = em_http_client.insert_graph(graph)
+
+    assert response.status_code == 200
+    assert len(sleeps) == 1
+    assert 0 <= sleeps[0] <= em_http_client.backoff_factor
+
+
+@responses.activate
+def test_insert_graph_gives_up(graph, sleeps):
+    metrics = Metrics()
+    em_http_client = EMHttpClient(
+        "http://localhost:8080",
+        "1234567890",
+        "pizza_service",
+        retries=2,
+        metrics=metrics,
+    )
+    responses.add(responses.POST, "http://localhost:8080/v1/requests", status=429)
+
+    response = em_http_client.insert_graph(graph)
+
+    assert response.status_code == 429
+    assert len(responses.calls) == 3
+    assert len(sleeps) == 2
+    assert metrics.counters["http_retries"] == 2
+
+
+@responses.activate
+def test_insert_graph_connection_error_returns_none(em_http_client, graph, sleeps):
+    responses.add(
+        responses.POST,
+        "http://localhost:8080/v1/requests",
+        body=requests.ConnectionError("connection refused"),
+    )
+
+    assert em_http_client.insert_graph(graph) is None
+    assert len(responses.calls) == em_http_client.retries + 1
+
+
+def test_backoff(em_http_client):
+    em_http_client.max_backoff = 4
+
+    assert all(
+        0 <= em_http_client._backoff(attempt, None) <= 4 for attempt in range(10)
+    )
+
+
+def test_backoff_retry_after_date(em_http_client):
+    response = requests.Response()
+    response.headers["Retry-After"] = formatdate(time.time() + 30, usegmt=True)
+
+    assert 25 < em_http_client._backoff(0, response) <= 30
+
+
+def test_backoff_retry_after_capped(em_http_client):
+    response = requests.Response()
+    response.headers["Retry-After"] = "86400"
+
+    assert em_http_client._backoff(0, response) == em_http_client.max_backoff
+
+
+@responses.activate
+def test_insert_graph_logs_connection_errors(em_http_client, graph, sleeps, caplog):
+    responses.add(
+        responses.POST,
+        "http://localhost:8080/v1/requests",
+        body=requests.ConnectionError("connection refused"),
+    )
+
+    with caplog.at_level(logging.WARNING):
+        em_http_client.insert_graph(graph)
+
+    assert len(caplog.records) == em_http_client.retries + 1
+    assert "connection refused" in caplog.records[0].getMessage()
+
+
+def test_build_payload(em_http_client):
+    graph_json = [{"@id": "http://www.perfect-memory.com/profile/pizza/kb/12345"}]
+
+    payload = json.loads(em_http_client.build_payload(graph_json))
+
+    assert payload["client_name"] == "pizza_service"
+    assert payload["inputs"]["graph"]["roots"] == [graph_json[0]["@id"]]
+
+
+@responses.activate
+def test_outbox_keeps_failed_payloads(tmp_path, graph, sleeps):
+    outbox = Outbox(str(tmp_path))
+    em_http_client = EMHttpClient(
+        "http://localhost:8080", "1234567890", "pizza_service", retries=0, outbox=outbox
+    )
+    responses.add(responses.POST, "http://localhost:8080/v1/requests", status=503)
+
+    em_http_client.insert_graph(graph)
+
+    assert len(outbox) == 1
+    assert outbox.read(next(iter(outbox))) == responses.calls[0].request.body
+
+    responses.replace(
+        responses.POST,
+        "http://localhost:8080/v1/requests",
+        json={"status": "success"},
+        status=200,
+    )
+
+    # a new client, as a resumed run would create
+    resumed_client = EMHttpClient(
+        "http://localhost:8080",
+        "1234567890",
+        "pizza_service",
+        outbox=Outbox(str(tmp_path)),
+    )
+    replayed = list(resumed_client.replay_outbox())
+
+    assert [response.status_code for response in replayed] == [200]
+    assert responses.calls[1].request.body == responses.calls[0].request.body
+    assert len(Outbox(str(tmp_path))) == 0
+
+
+@responses.activate
+def test_outbox_removes_sent_payloads(tmp_path, graph):
+    outbox = Outbox(str(tmp_path))
+    em_http_client = EMHttpClient(
+        "http://localhost:8080", "1234567890", "pizza_service", outbox=outbox
+    )
+    responses.add(
+        responses.POST,
+        "http://localhost:8080/v1/requests",
+        json={"status": "success"},
+        status=200,
+    )
+
+    em_http_client.insert_graph(graph)
+
+    assert len(outbox) == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_replay_outbox_requires_outbox(em_http_client):
+    with pytest.raises(ValueError):
+        list(em_http_client.replay_outbox())
+
+
+@pytest.mark.parametrize("compress", [False, True])
+@responses.activate
+def test_insert_graph_streamed(graph, compress):
+    bodies = []
+
+    def read_body(request):
+        body = b"".join(request.body)
+        bodies.append(gzip.decompress(body) if compress else body)
+        return 200, {}, json.dumps({"status": "success"})
+
+    responses.add_callback(
+        responses.POST, "http://localhost:8080/v1/requests", callback=read_body
+    )
+    metrics = Metrics()
+    em_http_client = EMHttpClient(
+        "http://localhost:8080",
+        "1234567890",
+        "pizza_service",
+        compress=compress,
+        metrics=metrics,
+        payload_format=NTriplesFormat(),
+    )
+
+    response = em_http_client.insert_graph(graph)
+
+    assert response.status_code == 200
+    payload = json.loads(bodies[0])
+    assert payload["inputs"]["graph"]["format"] == "application/n-triples"
+    assert set(
+        Graph().parse(data=payload["inputs"]["graph"]["value"], format="nt")
+    ) == set(graph)
+    assert metrics.counters["payload_bytes"] > 0
+
+
+@responses.activate
+def test_insert_graph_streamed_retries(graph, sleeps):
+    bodies = []
+
+    def read_body(request):
+        bodies.append(b"".join(request.body))
+        return (503, {}, "") if len(bodies) == 1 else (200, {}, "{}")
+
+    responses.add_callback(
+        responses.POST, "http://localhost:8080/v1/requests", callback=read_body
+    )
+    em_http_client = EMHttpClient(
+        "http://localhost:8080",
+        "1234567890",
+        "pizza_service",
+        payload_format=NTriplesFormat(),
+    )
+
+    assert em_http_client.insert_graph(graph).status_code == 200
+    # the body is produced again for the retry
+    assert len(bodies) == 2 and bodies[0] == bodies[1] != b""
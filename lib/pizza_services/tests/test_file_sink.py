@@ -0,0 +1,145 @@
+import gzip
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from rdflib import Graph
+
+from ..models.pizza_model import PizzaModel
+from ..utils.file_sink import FileSink
+from ..utils.metrics import Metrics
+from ..utils.triple_buffer import TripleBuffer
+
+
+def build_batches(batches: int, pizzas: int) -> "list[TripleBuffer]":
+    graphs = []
+    for batch in range(batches):
+        graph = TripleBuffer()
+        for index in range(pizzas):
+            PizzaModel(
+                {
+                    "pizza_id": f"{batch}-{index}",
+                    "pizza_name": "Margherita",
+                    "pizza_price": "10.00",
+                    "pizza_description": "Tomato, Mozzarella",
+                }
+            ).build_node(graph)
+        graphs.append(graph)
+    return graphs
+
+
+def read_shards(paths, rdf_format) -> "set[tuple]":
+    triples = set()
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as shard:
+            triples.update(Graph().parse(data=shard.read(), format=rdf_format))
+    return triples
+
+
+@pytest.mark.parametrize(
+    "output_format, rdf_format",
+    [("n-triples", "nt"), ("turtle", "turtle"), ("json-ld", "json-ld")],
+)
+@pytest.mark.parametrize("compress", [False, True])
+def test_write_shards(tmp_path, output_format, rdf_format, compress):
+    graphs = build_batches(5, 3)
+    metrics = Metrics()
+
+    with FileSink(
+        str(tmp_path),
+        output_format=output_format,
+        shard_size=2 * len(graphs[0]),
+        compress=compress,
+        metrics=metrics,
+    ) as sink:
+        results = list(sink.insert_graphs(graphs))
+
+    assert all(sink.is_success(result) for result in results)
+    # two batches per shard, the last one is half full
+    assert len(sink.shards) == 3
+    assert sorted(os.listdir(tmp_path)) == [
+        os.path.basename(path) for path in sink.shards
+    ]
+    assert results == [sink.shards[0]] * 2 + [sink.shards[1]] * 2 + [sink.shards[2]]
+    assert sink.shards[0].endswith(".gz") == compress
+    assert read_shards(sink.shards, rdf_format) == {
+        triple for graph in graphs for triple in graph
+    }
+    assert metrics.counters["shards_written"] == 3
+    assert metrics.counters["output_triples"] == sum(len(graph) for graph in graphs)
+
+
+def test_partial_shard_until_closed(tmp_path):
+    sink = FileSink(str(tmp_path))
+    sink.insert_graph(build_batches(1, 1)[0])
+
+    assert os.listdir(tmp_path) == ["pizzas-00000.nt.part"]
+
+    sink.close()
+
+    assert os.listdir(tmp_path) == ["pizzas-00000.nt"]
+
+
+def test_later_run_adds_shards(tmp_path):
+    first, second = build_batches(2, 1)
+    (tmp_path / "other-00007.nt").write_text("")
+    with FileSink(str(tmp_path), shard_size=1) as sink:
+        list(sink.insert_graphs([first, first]))
+
+    # the shards of the first run are kept, the second run numbers its shards after them
+    with FileSink(str(tmp_path), shard_size=1, compress=True) as sink:
+        list(sink.insert_graphs([second]))
+
+    assert [os.path.basename(path) for path in sink.shards] == ["pizzas-00002.nt.gz"]
+    assert sorted(os.listdir(tmp_path)) == [
+        "other-00007.nt",
+        "pizzas-00000.nt",
+        "pizzas-00001.nt",
+        "pizzas-00002.nt.gz",
+    ]
+    assert read_shards([str(tmp_path / "pizzas-00000.nt")], "nt") == set(first)
+
+
+def test_insert_jsonld(tmp_path):
+    graph = build_batches(1, 2)[0]
+    graph_json = json.loads(graph.serialize(format="json-ld"))
+
+    with FileSink(str(tmp_path), output_format="json-ld", shard_size=1) as sink:
+        list(sink.insert_jsonld_graphs([graph_json, graph_json]))
+
+    assert len(sink.shards) == 2
+    assert read_shards(sink.shards, "json-ld") == set(graph)
+    with open(sink.shards[0], encoding="utf-8") as shard:
+        assert json.load(shard) == graph_json
+
+
+@pytest.mark.parametrize(
+    "output_format, rdf_format", [("n-triples", "nt"), ("json-ld", "json-ld")]
+)
+def test_concurrent_inserts(tmp_path, output_format, rdf_format):
+    graphs = build_batches(40, 5)
+
+    with FileSink(
+        str(tmp_path), output_format=output_format, shard_size=3 * len(graphs[0])
+    ) as sink:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(sink.insert_graph, graphs))
+
+    # every shard is complete and valid, and holds whole batches
+    assert len(sink.shards) == 14
+    assert read_shards(sink.shards, rdf_format) == {
+        triple for graph in graphs for triple in graph
+    }
+
+
+def test_insert_jsonld_requires_jsonld_format(tmp_path):
+    with pytest.raises(ValueError):
+        FileSink(str(tmp_path)).insert_jsonld([{"@id": "http://a"}])
+
+
+@pytest.mark.parametrize("kwargs", [{"output_format": "rdf/xml"}, {"shard_size": 0}])
+def test_invalid_parameters(tmp_path, kwargs):
+    with pytest.raises(ValueError):
+        FileSink(str(tmp_path), **kwargs)
@@ -0,0 +1,142 @@
+import threading
+
+import pytest
+
+from ..parsers.interfaces.parser_interface import ParserInterface
+from ..parsers.prefetching_parser import PrefetchingParser
+from ..processes.ingest_pipeline import IngestPipeline
+from ..processes.ingest_pizza import IngestPizza
+from ..utils.concurrency import prefetch
+from ..utils.interfaces.output_sink_interface import OutputSinkInterface
+from ..utils.metrics import Metrics
+from ..utils.state_index import StateIndex
+
+
+class MockParserService(ParserInterface):
+    def parse(self):
+        return [
+            {
+                "pizza_id": str(i),
+                "pizza_name": f"Pizza {i}",
+                "pizza_description": "mozzarella,cheese",
+                "pizza_price": f"{i}.00",
+            }
+            for i in range(10)
+        ]
+
+
+class RecordingSink(OutputSinkInterface):
+    """Records the inserted batches and the thread inserting them"""
+
+    def __init__(self):
+        self.batches = []
+        self.threads = set()
+
+    def insert_graph(self, graph):
+        self.threads.add(threading.current_thread().name)
+        self.batches.append(set(graph))
+        return len(graph)
+
+    def insert_jsonld(self, graph_json):
+        self.batches.append(graph_json)
+        return len(graph_json)
+
+
+def test_prefetch():
+    assert list(prefetch(iter(range(100)), depth=3)) == list(range(100))
+
+
+def test_prefetch_is_bounded():
+    produced = []
+
+    def produce():
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    items = prefetch(produce(), depth=2)
+    assert next(items) == 0
+    # the producer waits while depth items are not consumed
+    threading.Event().wait(0.2)
+    assert len(produced) <= 4
+    items.close()
+
+
+def test_prefetch_raises_producer_errors():
+    def produce():
+        yield 1
+        raise KeyError("broken")
+
+    items = prefetch(produce(), depth=2)
+
+    assert next(items) == 1
+    with pytest.raises(KeyError):
+        next(items)
+
+
+def test_prefetch_invalid_depth():
+    with pytest.raises(ValueError):
+        list(prefetch([], depth=0))
+
+
+def test_prefetching_parser():
+    parser = PrefetchingParser(MockParserService(), depth=1)
+
+    assert parser.parse() == MockParserService().parse()
+    assert list(parser.iter_columns(["pizza_id"], batch_size=4)) == list(
+        MockParserService().iter_columns(["pizza_id"], batch_size=4)
+    )
+
+
+def test_run_same_as_sequential():
+    sink = RecordingSink()
+    expected = [
+        set(graph)
+        for graph in IngestPizza(MockParserService(), batch_size=3).iter_graphs()
+    ]
+
+    responses = list(IngestPipeline(MockParserService(), sink, batch_size=3).run())
+
+    assert sink.batches == expected
+    assert len(responses) == 4
+    # the batches are inserted by the consumer thread, the other stages run in their own
+    assert sink.threads == {threading.current_thread().name}
+
+
+def test_run_direct_jsonld():
+    sink = RecordingSink()
+    metrics = Metrics()
+
+    ingest_pipeline = IngestPipeline(
+        MockParserService(), sink, direct_jsonld=True, metrics=metrics, batch_size=5
+    )
+    list(ingest_pipeline.run())
+
+    assert len(sink.batches) == 2
+    assert metrics.to_dict()["counters"]["pizzas"] == 10
+    assert metrics.to_dict()["timers"]["pipeline_build_wait"]["count"] == 2
+
+
+def test_run_with_state_index(tmp_path):
+    with StateIndex(str(tmp_path / "state.db")) as state_index:
+        # the index is read by the builder thread and written by the consumer thread
+        ingest_pipeline = IngestPipeline(
+            MockParserService(), RecordingSink(), batch_size=3, state_index=state_index
+        )
+        for _ in ingest_pipeline.run():
+            ingest_pipeline.ingest_pizza.acknowledge_batch(sent=True)
+
+        sink = RecordingSink()
+        ingest_pipeline = IngestPipeline(
+            MockParserService(), sink, batch_size=3, state_index=state_index
+        )
+        list(ingest_pipeline.run())
+
+        assert len(state_index) == 10
+        assert sink.batches == []
+        assert ingest_pipeline.ingest_pizza.skipped_pizzas == 10
+
+
+def test_run_requires_batches():
+    with pytest.raises(ValueError):
+        IngestPipeline(MockParserService(), RecordingSink())
@@ -1,8 +1,16 @@
-from rdflib import Graph
+import pytest
+from rdflib import Graph, Literal
+from rdflib.namespace import XSD
 
 from ..models.pizza_model import PizzaModel
+from ..models.topping_registry import ToppingRegistry
+from ..models.vocabulary import TOPPING_CLASS
 from ..parsers.interfaces.parser_interface import ParserInterface
+from ..processes import ingest_pizza as ingest_pizza_module
 from ..processes.ingest_pizza import IngestPizza
+from ..utils.metrics import Metrics
+from ..utils.state_index import StateIndex
+from ..utils.triple_buffer import TripleBuffer
 
 
 class MockParserService(ParserInterface):
@@ -55,3 +63,364 @@ def test__mount_pizzas_graph():
     assert isinstance(pizza_graph, Graph)
     # we expect 6 triple (id, price, label for each dict)
     assert len(pizza_graph) == 6
+
+
+class StreamingParserService(ParserInterface):
+    def __init__(self):
+        self.consumed = 0
+
+    def parse(self):
+        raise AssertionError("parse should not be called in the streaming path")
+
+    def iter_rows(self):
+        for row in MockParserService().parse():
+            self.consumed += 1
+            yield row
+
+
+def test_init_consumes_iter_rows():
+    parser_service = StreamingParserService()
+    ingest_pizza = IngestPizza(parser_service)
+
+    assert parser_service.consumed == 2
+    assert len(ingest_pizza.pizzas_graph) == len(
+        IngestPizza(MockParserService()).pizzas_graph
+    )
+
+
+def test__iter_pizza_models():
+    ingest_pizza = IngestPizza(MockParserService())
+
+    # pylint: disable=protected-access
+    pizza_models = ingest_pizza._iter_pizza_models(MockParserService().parse())
+
+    assert not isinstance(pizza_models, list)
+    assert all(isinstance(pizza_model, PizzaModel) for pizza_model in pizza_models)
+
+
+def test_init_batched():
+    ingest_pizza = IngestPizza(MockParserService(), batch_size=1)
+
+    assert ingest_pizza.batched
+    assert ingest_pizza.pizzas_graph is None
+
+
+def test_iter_graphs_not_batched():
+    ingest_pizza = IngestPizza(MockParserService())
+
+    graphs = list(ingest_pizza.iter_graphs())
+
+    assert graphs == [ingest_pizza.pizzas_graph]
+
+
+def test_iter_graphs_batch_size():
+    full_graph = IngestPizza(MockParserService()).pizzas_graph
+    ingest_pizza = IngestPizza(MockParserService(), batch_size=1)
+
+    graphs = list(ingest_pizza.iter_graphs())
+
+    assert len(graphs) == 2
+    for graph in graphs:
+        assert isinstance(graph, Graph)
+    assert set(graphs[0]) | set(graphs[1]) == set(full_graph)
+
+
+def test_iter_graphs_max_triples():
+    ingest_pizza = IngestPizza(MockParserService(), max_triples=1)
+
+    graphs = list(ingest_pizza.iter_graphs())
+
+    # every pizza has more than one triple, so each pizza closes its own batch
+    assert len(graphs) == 2
+
+
+def test_iter_graphs_batch_bigger_than_input():
+    ingest_pizza = IngestPizza(MockParserService(), batch_size=10)
+
+    graphs = list(ingest_pizza.iter_graphs())
+
+    assert len(graphs) == 1
+
+
+def test_iter_jsonld():
+    ingest_pizza = IngestPizza(MockParserService(), batch_size=1)
+
+    batches = list(ingest_pizza.iter_jsonld())
+
+    assert len(batches) == 2
+    for batch in batches:
+        assert batch[0]["@type"] == [
+            "http://www.perfect-memory.com/ontology/pizza/1.1#Pizza"
+        ]
+
+
+def test_iter_jsonld_not_batched():
+    ingest_pizza = IngestPizza(MockParserService())
+
+    batches = list(ingest_pizza.iter_jsonld())
+
+    assert len(batches) == 1
+
+
+def test_iter_jsonld_max_triples():
+    ingest_pizza = IngestPizza(MockParserService(), max_triples=10)
+
+    with pytest.raises(ValueError):
+        next(ingest_pizza.iter_jsonld())
+
+
+def test__iter_pizza_batches():
+    ingest_pizza = IngestPizza(MockParserService(), batch_size=2)
+    pizzas = [PizzaModel(pizza) for pizza in MockParserService().parse() * 3]
+
+    # pylint: disable=protected-access
+    batches = list(ingest_pizza._iter_pizza_batches(pizzas))
+
+    assert [len(batch) for batch in batches] == [2, 2, 2]
+
+
+def test_init_triple_buffer():
+    ingest_pizza = IngestPizza(MockParserService(), use_triple_buffer=True)
+
+    assert isinstance(ingest_pizza.pizzas_graph, TripleBuffer)
+    assert set(ingest_pizza.pizzas_graph) == set(
+        IngestPizza(MockParserService()).pizzas_graph
+    )
+
+
+def test_iter_graphs_triple_buffer():
+    ingest_pizza = IngestPizza(
+        MockParserService(), batch_size=1, use_triple_buffer=True
+    )
+
+    graphs = list(ingest_pizza.iter_graphs())
+
+    assert len(graphs) == 2
+    assert all(isinstance(graph, TripleBuffer) for graph in graphs)
+
+
+def test_init_workers():
+    ingest_pizza = IngestPizza(MockParserService(), workers=2)
+
+    assert isinstance(ingest_pizza.pizzas_graph, Graph)
+    assert set(ingest_pizza.pizzas_graph) == set(
+        IngestPizza(MockParserService()).pizzas_graph
+    )
+
+
+def test_init_workers_merges_shards(monkeypatch):
+    monkeypatch.setattr(ingest_pizza_module, "SHARD_SIZE", 1)
+
+    ingest_pizza = IngestPizza(MockParserService(), workers=2, use_triple_buffer=True)
+
+    # both pizzas are built by different shards and share the cheese topping
+    assert set(ingest_pizza.pizzas_graph) == set(
+        IngestPizza(MockParserService()).pizzas_graph
+    )
+    assert len(ingest_pizza.pizzas_graph) == len(
+        IngestPizza(MockParserService()).pizzas_graph
+    )
+
+
+def test_iter_graphs_workers():
+    serial_graphs = list(IngestPizza(MockParserService(), batch_size=1).iter_graphs())
+
+    graphs = list(
+        IngestPizza(MockParserService(), batch_size=1, workers=2).iter_graphs()
+    )
+
+    assert len(graphs) == 2
+    assert [set(graph) for graph in graphs] == [set(graph) for graph in serial_graphs]
+
+
+def test__build_triples_shard():
+    rows = MockParserService().parse()
+
+    # pylint: disable=protected-access
+    shard_graphs, counters = ingest_pizza_module._build_triples_shard(
+        rows, max_triples=1
+    )
+
+    assert len(shard_graphs) == 2
+    assert all(isinstance(triple, tuple) for triple in shard_graphs[0])
+    assert counters == {"pizzas": 2, "invalid_prices": 0}
+
+
+def test_iter_graphs_workers_metrics():
+    metrics = Metrics()
+
+    list(
+        IngestPizza(
+            MockParserService(), batch_size=1, workers=2, metrics=metrics
+        ).iter_graphs()
+    )
+
+    # recorded by the workers, added to the metrics of the parent
+    assert metrics.counters["pizzas"] == 2
+    assert metrics.counters["invalid_prices"] == 0
+
+
+def test_init_columnar():
+    ingest_pizza = IngestPizza(MockParserService(), columnar=True)
+
+    assert set(ingest_pizza.pizzas_graph) == set(
+        IngestPizza(MockParserService()).pizzas_graph
+    )
+
+
+def test_iter_graphs_columnar():
+    serial_graphs = list(IngestPizza(MockParserService(), batch_size=1).iter_graphs())
+
+    graphs = list(
+        IngestPizza(MockParserService(), batch_size=1, columnar=True).iter_graphs()
+    )
+
+    assert [set(graph) for graph in graphs] == [set(graph) for graph in serial_graphs]
+
+
+def test_init_columnar_max_triples():
+    with pytest.raises(ValueError):
+        IngestPizza(MockParserService(), max_triples=10, columnar=True)
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_invalid_prices_metrics(columnar):
+    metrics = Metrics()
+    parser_service = MockParserService()
+    rows = parser_service.parse()
+    rows[0]["pizza_price"] = "free"
+    parser_service.parse = lambda: rows
+
+    ingest_pizza = IngestPizza(parser_service, columnar=columnar, metrics=metrics)
+
+    assert metrics.to_dict()["counters"]["invalid_prices"] == 1
+    # the pizza is ingested without its price
+    assert (
+        len(ingest_pizza.pizzas_graph)
+        == len(IngestPizza(MockParserService()).pizzas_graph) - 1
+    )
+
+
+class IdentifiedParserService(ParserInterface):
+    def __init__(self, price: str = "12.00"):
+        self.price = price
+
+    def parse(self):
+        return [
+            {
+                "pizza_id": "1",
+                "pizza_name": "Margherita",
+                "pizza_description": "mozzarella,cheese",
+                "pizza_price": "10.00",
+            },
+            {
+                "pizza_id": "2",
+                "pizza_name": "Pepperoni",
+                "pizza_description": "pepperoni",
+                "pizza_price": self.price,
+            },
+        ]
+
+
+@pytest.fixture(name="state_index")
+def setup_state_index(tmp_path):
+    with StateIndex(str(tmp_path / "state.db")) as state_index:
+        yield state_index
+
+
+def test_delta_first_run(state_index):
+    ingest_pizza = IngestPizza(IdentifiedParserService(), state_index=state_index)
+
+    assert set(ingest_pizza.pizzas_graph) == set(
+        IngestPizza(IdentifiedParserService()).pizzas_graph
+    )
+    assert ingest_pizza.skipped_pizzas == 0
+
+
+def test_delta_skips_sent_pizzas(state_index):
+    ingest_pizza = IngestPizza(
+        IdentifiedParserService(), batch_size=1, state_index=state_index
+    )
+    for _graph in ingest_pizza.iter_graphs():
+        ingest_pizza.acknowledge_batch(sent=True)
+
+    # the price of the second pizza changed since the last run
+    ingest_pizza = IngestPizza(
+        IdentifiedParserService(price="13.00"), batch_size=1, state_index=state_index
+    )
+    graphs = list(ingest_pizza.iter_graphs())
+
+    assert ingest_pizza.skipped_pizzas == 1
+    assert len(graphs) == 1
+    assert (None, None, Literal("13.00", datatype=XSD.float)) in graphs[0]
+
+
+def test_delta_failed_batch_is_resent(state_index):
+    ingest_pizza = IngestPizza(
+        IdentifiedParserService(), batch_size=1, state_index=state_index
+    )
+    for index, _graph in enumerate(ingest_pizza.iter_graphs()):
+        ingest_pizza.acknowledge_batch(sent=index == 0)
+
+    ingest_pizza = IngestPizza(
+        IdentifiedParserService(), batch_size=1, state_index=state_index
+    )
+    graphs = list(ingest_pizza.iter_graphs())
+
+    assert ingest_pizza.skipped_pizzas == 1
+    assert len(graphs) == 1
+
+
+def test_delta_nothing_changed(state_index):
+    ingest_pizza = IngestPizza(IdentifiedParserService(), state_index=state_index)
+    for _graph in ingest_pizza.iter_graphs():
+        ingest_pizza.acknowledge_batch(sent=True)
+
+    ingest_pizza = IngestPizza(IdentifiedParserService(), state_index=state_index)
+
+    assert ingest_pizza.skipped_pizzas == 2
+    assert not list(ingest_pizza.iter_graphs())
+
+
+def test_delta_not_supported(state_index):
+    with pytest.raises(ValueError):
+        IngestPizza(MockParserService(), workers=2, state_index=state_index)
+
+    with pytest.raises(ValueError):
+        next(IngestPizza(MockParserService(), state_index=state_index).iter_jsonld())
+
+
+def test_metrics():
+    metrics = Metrics()
+    ingest_pizza = IngestPizza(MockParserService(), batch_size=1, metrics=metrics)
+
+    graphs = list(ingest_pizza.iter_graphs())
+
+    recorded = metrics.to_dict()
+    assert recorded["counters"]["pizzas"] == 2
+    assert recorded["counters"]["graphs"] == 2
+    assert recorded["counters"]["triples"] == sum(len(graph) for graph in graphs)
+    assert recorded["timers"]["graph_build"]["count"] == 2
+    assert recorded["timers"]["pizza_build_node"]["count"] == 2
+
+
+def test_metrics_not_batched():
+    metrics = Metrics()
+    ingest_pizza = IngestPizza(MockParserService(), metrics=metrics)
+
+    list(ingest_pizza.iter_graphs())
+
+    recorded = metrics.to_dict()
+    assert recorded["counters"]["graphs"] == 1
+    assert recorded["timers"]["graph_build"]["count"] == 1
+
+
+def test_shared_topping_registry():
+    topping_registry = ToppingRegistry()
+    first = IngestPizza(MockParserService(), topping_registry=topping_registry)
+
+    second = IngestPizza(MockParserService(), topping_registry=topping_registry)
+
+    # the toppings added by the first ingestion are not added again by the second one
+    assert (None, None, TOPPING_CLASS) in first.pizzas_graph
+    assert (None, None, TOPPING_CLASS) not in second.pizzas_graph
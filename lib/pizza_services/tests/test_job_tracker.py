@@ -0,0 +1,189 @@
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from ..utils.em_http_client import EMHttpClient
+from ..utils.job_tracker import Job, JobTracker
+from ..utils.metrics import Metrics
+
+
+class FakeExchangeManagerHandler(BaseHTTPRequestHandler):
+    """
+    Accepts the insertGraph requests, then reports them pending for a number of polls before
+    their final status.
+    """
+
+    ids = itertools.count()
+    # request id -> remaining pending polls and final status
+    requests_state = {}
+    lock = threading.Lock()
+    pending_polls = 2
+    final_status = "done"
+
+    def send_json(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        self.rfile.read(int(self.headers["Content-Length"]))
+        with self.lock:
+            request_id = f"req-{next(self.ids)}"
+            self.requests_state[request_id] = [self.pending_polls, self.final_status]
+        self.send_json(200, {"id": request_id, "status": "pending"})
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        request_id = self.path.rsplit("/", 1)[1]
+        with self.lock:
+            state = self.requests_state.get(request_id)
+            if state is None:
+                self.send_json(404, {"error": "not found"})
+                return
+            if state[0] > 0:
+                state[0] -= 1
+                status = "pending"
+            else:
+                status = state[1]
+        self.send_json(200, {"id": request_id, "status": status})
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+@pytest.fixture(name="em_http_client")
+def setup_fake_exchange_manager():
+    FakeExchangeManagerHandler.requests_state = {}
+    FakeExchangeManagerHandler.pending_polls = 2
+    FakeExchangeManagerHandler.final_status = "done"
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeExchangeManagerHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with EMHttpClient(
+        f"http://127.0.0.1:{server.server_port}", "1234567890", "pizza_service"
+    ) as em_http_client:
+        yield em_http_client
+
+    server.shutdown()
+    server.server_close()
+
+
+GRAPH_JSON = [{"@id": "http://www.perfect-memory.com/profile/pizza/kb/12345"}]
+
+
+def test_track_many_jobs(em_http_client):
+    metrics = Metrics()
+    with JobTracker(
+        em_http_client, poll_interval=0.01, max_poll_interval=0.02, metrics=metrics
+    ) as tracker:
+        jobs = [
+            tracker.track(em_http_client.insert_jsonld(GRAPH_JSON)) for _ in range(20)
+        ]
+
+        assert tracker.wait(timeout=10)
+
+    assert len({job.request_id for job in jobs}) == 20
+    assert all(job.state == Job.SUCCEEDED for job in jobs)
+    assert all(job.status == "done" and job.polls == 3 for job in jobs)
+    assert metrics.counters["jobs_succeeded"] == 20
+    assert metrics.timers["job_latency"]["count"] == 20
+
+    report = tracker.report()
+    assert report["jobs"] == report["succeeded"] == 20
+    assert report["pending"] == 0
+    assert report["throughput"] > 0
+    assert (
+        0
+        < report["latency"]["min"]
+        <= report["latency"]["p50"]
+        <= report["latency"]["max"]
+    )
+
+
+def test_track_failed_job(em_http_client):
+    FakeExchangeManagerHandler.final_status = "failed"
+
+    with JobTracker(em_http_client, poll_interval=0.01) as tracker:
+        job = tracker.track(em_http_client.insert_jsonld(GRAPH_JSON))
+        assert tracker.wait(timeout=10)
+
+    assert job.state == Job.FAILED
+    assert tracker.report()["failed"] == 1
+
+
+def test_track_timeout(em_http_client):
+    FakeExchangeManagerHandler.pending_polls = 10**6
+    metrics = Metrics()
+
+    with JobTracker(
+        em_http_client, poll_interval=0.01, timeout=0.1, metrics=metrics
+    ) as tracker:
+        job = tracker.track(em_http_client.insert_jsonld(GRAPH_JSON))
+        assert tracker.wait(timeout=10)
+
+    assert job.state == Job.TIMED_OUT
+    assert job.status == "pending"
+    report = tracker.report()
+    assert report["timed_out"] == 1
+    assert report["latency"] is None
+    assert "job_latency" not in metrics.timers
+
+
+def test_track_with_the_time_the_request_was_sent(em_http_client):
+    response = em_http_client.insert_jsonld(GRAPH_JSON)
+    # the response waits to be tracked, e.g. behind the other requests in flight
+    time.sleep(0.05)
+
+    with JobTracker(em_http_client, poll_interval=0.01) as tracker:
+        job = tracker.track(response, submitted_at=response.sent_at)
+        estimated = tracker.track(response)
+        assert tracker.wait(timeout=10)
+
+    assert job.submitted_at == response.sent_at
+    assert estimated.submitted_at - job.submitted_at >= 0.05
+
+
+def test_track_unknown_job_polls_again(em_http_client):
+    metrics = Metrics()
+    response = em_http_client.insert_jsonld(GRAPH_JSON)
+    # the status of an unknown id is an error, polled again until the timeout
+    response._content = json.dumps({"id": "unknown"}).encode()
+
+    with JobTracker(
+        em_http_client, poll_interval=0.01, timeout=0.1, metrics=metrics
+    ) as tracker:
+        job = tracker.track(response)
+        assert tracker.wait(timeout=10)
+
+    assert job.state == Job.TIMED_OUT
+    assert metrics.counters["job_poll_errors"] >= 1
+
+
+def test_track_unknown_job_given_up(em_http_client):
+    response = em_http_client.insert_jsonld(GRAPH_JSON)
+    response._content = json.dumps({"id": "unknown"}).encode()
+
+    # without a timeout, the job is given up after max_poll_errors failed polls in a row
+    with JobTracker(em_http_client, poll_interval=0.01, max_poll_errors=3) as tracker:
+        job = tracker.track(response)
+        assert tracker.wait(timeout=10)
+
+    assert job.state == Job.LOST
+    assert job.polls == 3
+    assert tracker.report()["lost"] == 1
+
+
+def test_track_response_without_id(em_http_client):
+    response = requests.Response()
+    response._content = b'{"status": "success"}'
+
+    with JobTracker(em_http_client) as tracker:
+        with pytest.raises(ValueError):
+            tracker.track(response)
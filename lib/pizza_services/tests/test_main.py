@@ -0,0 +1,221 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+import main
+
+PIZZAS_CSV = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, os.pardir, "pizzas.csv"
+)
+
+
+def run_watch(args: "list[str]", drop: "list[str]", archive_dir) -> None:
+    """Runs the watch daemon until the dropped files are archived, then stops it."""
+    runner = main.IngestionRunner(main.parse_args(args))
+    stop = threading.Event()
+    daemon = threading.Thread(target=main.watch, args=(runner, stop))
+    daemon.start()
+    try:
+        for path in drop:
+            shutil.copy(PIZZAS_CSV, path)
+            deadline = time.monotonic() + 10
+            while not (archive_dir / os.path.basename(path)).exists():
+                assert time.monotonic() < deadline, f"{path} was not archived"
+                time.sleep(0.01)
+    finally:
+        stop.set()
+        daemon.join()
+        runner.close()
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--resume"],
+        ["-p", "pizzas.csv", "--resume", "--outbox", "outbox", "--pipeline-depth", "2"],
+        ["-p", "pizzas.csv", "--direct-jsonld", "--payload-format", "turtle"],
+        ["-p", "pizzas.csv", "--output-dir", "out", "--track-jobs"],
+        ["-p", "pizzas.csv", "--payload-cache", "cache", "--workers", "2"],
+        ["-p", "pizzas.csv", "--state-db", "state.db", "--direct-jsonld"],
+        ["-p", "pizzas.csv", "--state-db", "state.db", "--columnar"],
+        ["-p", "pizzas.csv", "--columnar", "--max-triples", "10"],
+        ["-p", "pizzas.csv", "--direct-jsonld", "--max-triples", "10"],
+        ["-p", "pizzas.csv", "--output-dir", "out", "--direct-jsonld"],
+        ["--watch", "incoming", "-p", "pizzas.csv"],
+        ["-p", "pizzas.csv", "--archive-dir", "done"],
+        [],
+        ["-p", "-", "pizzas.csv"],
+        ["-p", "pizzas.csv", "--file-workers", "0"],
+    ],
+)
+def test_parse_args_rejects(argv):
+    with pytest.raises(SystemExit) as error:
+        main.parse_args(argv)
+
+    assert error.value.code == 2
+
+
+def test_parse_args():
+    args = main.parse_args(["-p", "a.csv", "incoming/", "--file-workers", "2"])
+
+    assert args.path == ["a.csv", "incoming/"]
+    assert args.file_workers == 2
+
+
+def test_watch_archives_each_file_with_its_shard(tmp_path):
+    incoming, archive, output = tmp_path / "in", tmp_path / "done", tmp_path / "out"
+    incoming.mkdir()
+    args = [
+        "--watch",
+        str(incoming),
+        "--poll-interval",
+        "0.01",
+        "--archive-dir",
+        str(archive),
+        "--output-dir",
+        str(output),
+    ]
+
+    run_watch(args, [str(incoming / "a.csv"), str(incoming / "b.csv")], archive)
+
+    assert sorted(os.listdir(archive)) == ["a.csv", "b.csv"]
+    assert os.listdir(incoming) == []
+    # the shard of each file is completed once it is ingested
+    assert sorted(os.listdir(output)) == ["pizzas-00000.nt", "pizzas-00001.nt"]
+    first_shards = [(output / name).read_text() for name in sorted(os.listdir(output))]
+
+    # a restarted daemon adds its shards, the ones of the archived files are kept
+    run_watch(args, [str(incoming / "c.csv")], archive)
+
+    shards = sorted(os.listdir(output))
+    assert shards == ["pizzas-00000.nt", "pizzas-00001.nt", "pizzas-00002.nt"]
+    assert [(output / name).read_text() for name in shards[:2]] == first_shards
+
+
+def write_pizzas(path, rows: int) -> None:
+    """Writes the header and the first rows of pizzas.csv to a file."""
+    with open(PIZZAS_CSV, encoding="utf-8") as source:
+        lines = source.readlines()
+    path.write_text("".join(lines[: rows + 1]), encoding="utf-8")
+
+
+def test_ingest_files_largest_first(tmp_path):
+    paths = []
+    for name, rows in [("small.csv", 2), ("large.csv", 20), ("medium.csv", 10)]:
+        write_pizzas(tmp_path / name, rows)
+        paths.append(str(tmp_path / name))
+    runner = main.IngestionRunner(
+        main.parse_args(["-p", *paths, "--output-dir", str(tmp_path / "out")])
+    )
+    ingested = []
+    runner.ingest = lambda path: ingested.append(path) or {"path": path}
+
+    try:
+        summaries = runner.ingest_files(paths)
+    finally:
+        runner.close()
+
+    assert [os.path.basename(path) for path in ingested] == [
+        "large.csv",
+        "medium.csv",
+        "small.csv",
+    ]
+    # the summaries are in the order of the paths
+    assert [summary["path"] for summary in summaries] == paths
+
+
+def test_main_writes_the_summary_of_each_file(tmp_path):
+    write_pizzas(tmp_path / "a.csv", 3)
+    write_pizzas(tmp_path / "b.csv", 5)
+    summary_output = tmp_path / "summary.json"
+
+    main.main(
+        [
+            "-p",
+            str(tmp_path / "*.csv"),
+            "--output-dir",
+            str(tmp_path / "out"),
+            "--summary-output",
+            str(summary_output),
+            "--file-workers",
+            "2",
+        ]
+    )
+
+    summaries = json.loads(summary_output.read_text(encoding="utf-8"))
+    assert [os.path.basename(summary["path"]) for summary in summaries] == [
+        "a.csv",
+        "b.csv",
+    ]
+    assert [summary["rows"] for summary in summaries] == [3, 5]
+    for summary in summaries:
+        assert summary["file_bytes"] == os.path.getsize(summary["path"])
+        assert summary["triples"] > 0
+        assert summary["failed_batches"] == 0
+        assert "error" not in summary
+
+
+def test_main_exits_with_failure_when_a_file_fails(tmp_path):
+    write_pizzas(tmp_path / "a.csv", 3)
+    summary_output = tmp_path / "summary.json"
+
+    with pytest.raises(SystemExit) as error:
+        main.main(
+            [
+                "-p",
+                str(tmp_path / "a.csv"),
+                str(tmp_path / "missing.csv"),
+                "--output-dir",
+                str(tmp_path / "out"),
+                "--summary-output",
+                str(summary_output),
+            ]
+        )
+
+    assert error.value.code == 1
+    summaries = json.loads(summary_output.read_text(encoding="utf-8"))
+    assert "error" not in summaries[0]
+    assert "error" in summaries[1]
+
+
+def test_main_exits_with_failure_when_a_batch_fails(tmp_path, monkeypatch):
+    from pizza_services.utils.file_sink import FileSink
+
+    write_pizzas(tmp_path / "a.csv", 3)
+    monkeypatch.setattr(FileSink, "is_success", staticmethod(lambda response: False))
+
+    with pytest.raises(SystemExit) as error:
+        main.main(
+            ["-p", str(tmp_path / "a.csv"), "--output-dir", str(tmp_path / "out")]
+        )
+
+    assert error.value.code == 1
+
+
+def test_resume_exits_with_failure_when_a_batch_fails_again(tmp_path, monkeypatch):
+    from pizza_services.utils.outbox import Outbox
+
+    Outbox(str(tmp_path / "outbox")).put(b"[]")
+    # nothing listens on the port, the batch fails again and stays in the outbox
+    monkeypatch.setenv("EM_BASE_URL", "http://127.0.0.1:9")
+    monkeypatch.setenv("EM_API_KEY", "key")
+    monkeypatch.setenv("EM_CLIENT_NAME", "client")
+
+    with pytest.raises(SystemExit) as error:
+        main.main(["--outbox", str(tmp_path / "outbox"), "--resume", "--retries", "0"])
+
+    assert error.value.code == 1
+    assert len(Outbox(str(tmp_path / "outbox"))) == 1
+
+
+def test_main_exits_with_failure_without_matching_file(tmp_path):
+    with pytest.raises(SystemExit) as error:
+        main.main(
+            ["-p", str(tmp_path / "*.csv"), "--output-dir", str(tmp_path / "out")]
+        )
+
+    assert error.value.code == 1
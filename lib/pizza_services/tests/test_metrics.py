@@ -0,0 +1,115 @@
+import json
+
+import pytest
+
+from ..utils.metrics import CountingMetrics, Metrics, NullMetrics, ScopedMetrics
+
+
+@pytest.fixture(name="metrics")
+def setup_metrics():
+    return Metrics()
+
+
+def test_time(metrics):
+    with metrics.time("stage"):
+        pass
+    with metrics.time("stage"):
+        pass
+
+    timer = metrics.to_dict()["timers"]["stage"]
+    assert timer["count"] == 2
+    assert timer["total_seconds"] >= timer["max_seconds"] >= 0
+
+
+def test_observe(metrics):
+    metrics.observe("stage", 1.0)
+    metrics.observe("stage", 3.0)
+
+    assert metrics.to_dict()["timers"]["stage"] == {
+        "count": 2,
+        "total_seconds": 4.0,
+        "max_seconds": 3.0,
+    }
+
+
+def test_increment(metrics):
+    metrics.increment("rows")
+    metrics.increment("rows", 10)
+
+    assert metrics.to_dict()["counters"] == {"rows": 11}
+
+
+def test_timed_iter(metrics):
+    items = list(metrics.timed_iter("stage", iter([1, 2, 3])))
+
+    assert items == [1, 2, 3]
+    assert metrics.to_dict()["timers"]["stage"]["count"] == 3
+
+
+def test_to_json(metrics):
+    metrics.increment("rows", 2)
+
+    assert json.loads(metrics.to_json()) == {"timers": {}, "counters": {"rows": 2}}
+
+
+def test_to_prometheus(metrics):
+    metrics.observe("http_request", 0.5)
+    metrics.increment("payload_bytes", 100)
+
+    assert metrics.to_prometheus() == (
+        "# TYPE pizza_ingestion_http_request_seconds summary\n"
+        "pizza_ingestion_http_request_seconds_count 1\n"
+        "pizza_ingestion_http_request_seconds_sum 0.5\n"
+        "# TYPE pizza_ingestion_http_request_seconds_max gauge\n"
+        "pizza_ingestion_http_request_seconds_max 0.5\n"
+        "# TYPE pizza_ingestion_payload_bytes_total counter\n"
+        "pizza_ingestion_payload_bytes_total 100\n"
+    )
+
+
+def test_write(metrics, tmp_path):
+    metrics.increment("rows")
+
+    metrics.write(str(tmp_path / "metrics.json"))
+    metrics.write(str(tmp_path / "metrics.prom"))
+
+    assert json.loads((tmp_path / "metrics.json").read_text())["counters"] == {
+        "rows": 1
+    }
+    assert "pizza_ingestion_rows_total 1" in (tmp_path / "metrics.prom").read_text()
+
+
+def test_null_metrics():
+    metrics = NullMetrics()
+
+    with metrics.time("stage"):
+        pass
+    metrics.increment("rows")
+    assert list(metrics.timed_iter("stage", [1])) == [1]
+
+    assert metrics.to_dict() == {"timers": {}, "counters": {}}
+
+
+def test_counting_metrics():
+    metrics = CountingMetrics()
+
+    with metrics.time("stage"):
+        metrics.increment("rows", 2)
+    metrics.observe("stage", 1.0)
+    metrics.increment("rows")
+
+    assert metrics.to_dict() == {"timers": {}, "counters": {"rows": 3}}
+
+
+def test_scoped_metrics(metrics):
+    first = ScopedMetrics(metrics)
+    second = ScopedMetrics(metrics)
+
+    first.increment("rows", 2)
+    second.increment("rows")
+    first.observe("stage", 1.0)
+
+    assert first.to_dict()["counters"] == {"rows": 2}
+    assert second.to_dict()["counters"] == {"rows": 1}
+    assert metrics.to_dict()["counters"] == {"rows": 3}
+    assert metrics.to_dict()["timers"]["stage"]["count"] == 1
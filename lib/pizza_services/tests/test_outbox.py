@@ -0,0 +1,53 @@
+import os
+
+from ..utils.outbox import Outbox
+
+
+def test_put_read_remove(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox"))
+
+    key = outbox.put(b'{"pizza": 1}')
+
+    assert len(outbox) == 1
+    assert list(outbox) == [key]
+    assert outbox.read(key) == b'{"pizza": 1}'
+
+    outbox.remove(key)
+
+    assert len(outbox) == 0
+    assert os.listdir(tmp_path / "outbox") == []
+
+
+def test_put_same_payload_once(tmp_path):
+    outbox = Outbox(str(tmp_path))
+
+    assert outbox.put(b"payload") == outbox.put(b"payload")
+    assert len(outbox) == 1
+
+
+def test_keeps_order_across_instances(tmp_path):
+    outbox = Outbox(str(tmp_path))
+    keys = [outbox.put(f"payload {index}".encode()) for index in range(5)]
+
+    reopened = Outbox(str(tmp_path))
+
+    assert list(reopened) == keys
+    assert [reopened.read(key) for key in reopened] == [
+        f"payload {index}".encode() for index in range(5)
+    ]
+
+
+def test_ignores_temporary_files(tmp_path):
+    (tmp_path / "00000000000000000001-abc.json.tmp").write_bytes(b"truncated")
+
+    assert len(Outbox(str(tmp_path))) == 0
+
+
+def test_ignores_other_files(tmp_path):
+    (tmp_path / "notes.json").write_bytes(b"{}")
+    (tmp_path / "00000000000000000001-abc.json").write_bytes(b"{}")
+    key = Outbox(str(tmp_path)).put(b"payload")
+
+    outbox = Outbox(str(tmp_path))
+
+    assert list(outbox) == [key]
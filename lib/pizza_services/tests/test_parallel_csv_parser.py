@@ -0,0 +1,101 @@
+import mmap
+
+import pytest
+
+from ..parsers.csv_parser import CsvParser
+from ..parsers.parallel_csv_parser import ParallelCsvParser, _record_boundaries
+from ..processes.ingest_pizza import IngestPizza
+from ..utils.metrics import Metrics
+
+MAPPER = ["pizza_id", "pizza_name", "pizza_price"]
+
+CSV_CONTENT = (
+    "pizza_id,pizza_name,pizza_description,pizza_price\n"
+    + "".join(
+        f'{i},"Pizza, {i}","Tomato,\nCheese and ""{i}""",{i}.00\n' for i in range(50)
+    )
+    + "50,Last,Plain,5.00"
+)
+
+
+@pytest.fixture(name="csv_path")
+def setup_csv_path(tmp_path):
+    path = tmp_path / "pizzas.csv"
+    path.write_bytes(CSV_CONTENT.encode("utf-8"))
+    return str(path)
+
+
+def test_record_boundaries_skip_quoted_newlines(csv_path):
+    with open(csv_path, "rb") as binary:
+        with mmap.mmap(binary.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            boundaries = _record_boundaries(mapped, 0, 7)
+
+    assert boundaries[0] == 0
+    assert boundaries[-1] == len(CSV_CONTENT)
+    # every chunk, but the header one, starts with a pizza id
+    records = [CSV_CONTENT[start:end] for start, end in zip(boundaries, boundaries[1:])]
+    assert records[0].startswith("pizza_id,")
+    assert [record.split(",", 1)[0] for record in records[1:]] == [
+        str(i) for i in range(51)
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 64, 2**20])
+def test_parse_ordered(csv_path, chunk_size):
+    parser = ParallelCsvParser(csv_path, MAPPER, workers=2, chunk_size=chunk_size)
+
+    assert parser.parse() == CsvParser(csv_path, MAPPER).parse()
+    assert parser._mapper == {"pizza_id": 0, "pizza_name": 1, "pizza_price": 3}
+
+
+def test_parse_unordered(csv_path):
+    parser = ParallelCsvParser(
+        csv_path, MAPPER, workers=2, chunk_size=64, ordered=False
+    )
+    rows = parser.parse()
+
+    assert sorted(rows, key=lambda row: int(row["pizza_id"])) == (
+        CsvParser(csv_path, MAPPER).parse()
+    )
+
+
+def test_parse_records_metrics(csv_path):
+    metrics = Metrics()
+    ParallelCsvParser(csv_path, MAPPER, chunk_size=64, metrics=metrics).parse()
+
+    assert metrics.counters["csv_rows"] == 51
+
+
+def test_parse_empty_file(tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_bytes(b"")
+
+    assert ParallelCsvParser(str(path), MAPPER).parse() == []
+
+
+@pytest.mark.parametrize("path", ["-", "pizzas.csv.gz", "pizzas.csv.zst"])
+def test_unsupported_sources(path):
+    with pytest.raises(ValueError):
+        ParallelCsvParser(path, MAPPER)
+
+
+def test_feeds_ingest_pizza(csv_path):
+    parser = ParallelCsvParser(
+        csv_path, ["pizza_id", "pizza_name", "pizza_price", "pizza_description"]
+    )
+    serial = CsvParser(
+        csv_path, ["pizza_id", "pizza_name", "pizza_price", "pizza_description"]
+    )
+
+    assert set(IngestPizza(parser).pizzas_graph) == set(
+        IngestPizza(serial).pizzas_graph
+    )
+
+
+def test_iter_columns(csv_path):
+    parser = ParallelCsvParser(csv_path, MAPPER, chunk_size=64)
+    serial = CsvParser(csv_path, MAPPER)
+
+    assert list(parser.iter_columns(MAPPER, batch_size=20)) == list(
+        serial.iter_columns(MAPPER, batch_size=20)
+    )
@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from ..parsers.interfaces.parser_interface import ParserInterface
+from ..processes.ingest_pizza import IngestPizza
+from ..utils.em_http_client import EMHttpClient
+from ..utils.metrics import Metrics
+from ..utils.payload_cache import PayloadCache
+
+
+class MockParserService(ParserInterface):
+    def parse(self):
+        return [
+            {
+                "pizza_id": str(i),
+                "pizza_name": f"Pizza {i}",
+                "pizza_description": "mozzarella,cheese",
+                "pizza_price": f"{i}.00",
+            }
+            for i in range(10)
+        ]
+
+
+@pytest.fixture(name="em_http_client")
+def setup_em_http_client():
+    return EMHttpClient(
+        em_base_url="http://localhost:8080",
+        em_api_key="1234567890",
+        em_client_name="pizza_service",
+    )
+
+
+def test_put_get(tmp_path):
+    metrics = Metrics()
+    payload_cache = PayloadCache(str(tmp_path), metrics=metrics)
+
+    payload_cache.put("key", b"payload")
+
+    assert "key" in payload_cache
+    assert payload_cache.get("key") == b"payload"
+    assert payload_cache.get("other") is None
+    assert metrics.to_dict()["counters"]["payload_cache_hits"] == 1
+    assert metrics.to_dict()["counters"]["payload_cache_misses"] == 1
+
+
+def test_key_of():
+    rows = [{"pizza_id": "1", "pizza_price": "10.00"}]
+
+    assert PayloadCache.key_of("1", rows) == PayloadCache.key_of("1", [dict(rows[0])])
+    assert PayloadCache.key_of("1", rows) != PayloadCache.key_of("2", rows)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    payload_cache = PayloadCache(str(tmp_path), max_bytes=10)
+    payload_cache.put("a", b"1234")
+    payload_cache.put("b", b"1234")
+    payload_cache.get("a")
+
+    payload_cache.put("c", b"1234")
+
+    assert "b" not in payload_cache
+    assert sorted(os.listdir(tmp_path)) == ["a.payload", "c.payload"]
+    assert payload_cache.size == 8
+
+
+def test_payload_bigger_than_cache_not_stored(tmp_path):
+    payload_cache = PayloadCache(str(tmp_path), max_bytes=2)
+
+    payload_cache.put("a", b"1234")
+
+    assert len(payload_cache) == 0
+
+
+def test_keeps_entries_across_instances(tmp_path):
+    PayloadCache(str(tmp_path)).put("a", b"1234")
+
+    reopened = PayloadCache(str(tmp_path))
+
+    assert reopened.size == 4
+    assert reopened.get("a") == b"1234"
+
+
+@pytest.mark.parametrize("direct_jsonld", [False, True])
+def test_iter_payloads_reuses_cached_batches(tmp_path, em_http_client, direct_jsonld):
+    payload_cache = PayloadCache(str(tmp_path))
+    payloads = list(
+        IngestPizza(MockParserService(), batch_size=4).iter_payloads(
+            em_http_client, payload_cache, direct_jsonld
+        )
+    )
+    metrics = Metrics()
+
+    cached = list(
+        IngestPizza(MockParserService(), batch_size=4, metrics=metrics).iter_payloads(
+            em_http_client, payload_cache, direct_jsonld
+        )
+    )
+
+    assert len(payloads) == 3
+    assert cached == payloads
+    assert "graph_build" not in metrics.to_dict()["timers"]
+    assert metrics.to_dict()["counters"]["pizzas"] == 10
+
+
+def test_iter_payloads_batches_are_self_contained(tmp_path, em_http_client):
+    payloads = list(
+        IngestPizza(MockParserService(), batch_size=4).iter_payloads(
+            em_http_client, PayloadCache(str(tmp_path))
+        )
+    )
+
+    # every batch has the nodes of its toppings, not only the first one
+    assert all(b"Topping" in payload for payload in payloads)
+
+
+def test_iter_payloads_requires_batch_size(tmp_path, em_http_client):
+    with pytest.raises(ValueError):
+        list(
+            IngestPizza(MockParserService()).iter_payloads(
+                em_http_client, PayloadCache(str(tmp_path))
+            )
+        )
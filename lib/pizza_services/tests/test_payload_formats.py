@@ -0,0 +1,82 @@
+import json
+
+import pytest
+from rdflib import RDFS, XSD, Graph, Literal, URIRef
+
+from ..models.pizza_model import PizzaModel
+from ..utils import payload_formats
+from ..utils.payload_formats import PAYLOAD_FORMATS, NTriplesFormat, TurtleFormat
+from ..utils.triple_buffer import TripleBuffer
+
+
+@pytest.fixture(name="graph")
+def setup_graph():
+    graph = TripleBuffer()
+    for pizza_id in range(3):
+        PizzaModel(
+            {
+                "pizza_id": str(pizza_id),
+                "pizza_name": f'Pizza "{pizza_id}"\nSpecial',
+                "pizza_price": "10.00",
+                "pizza_description": "Tomato, Mozzarella",
+            }
+        ).build_node(graph)
+    return graph
+
+
+def parse_payload(chunks) -> "tuple[dict, str]":
+    payload = json.loads(b"".join(chunks))
+    return payload, payload["inputs"]["graph"]["value"]
+
+
+@pytest.mark.parametrize("payload_format", [NTriplesFormat(), TurtleFormat()])
+def test_round_trip(graph, payload_format):
+    payload, value = parse_payload(payload_format.iter_payload(graph, "pizza_service"))
+
+    parsed = Graph().parse(data=value, format=payload_format.name.replace("-", ""))
+
+    assert set(parsed) == set(graph)
+    assert payload["client_name"] == "pizza_service"
+    assert payload["item_name"] == "insert_graph"
+    assert payload["inputs"]["graph"]["format"] == payload_format.media_type
+    assert payload["inputs"]["graph"]["roots"] == [str(next(iter(graph))[0])]
+
+
+def test_rdflib_graph(graph):
+    rdflib_graph = graph.to_graph()
+
+    _, value = parse_payload(
+        NTriplesFormat().iter_payload(rdflib_graph, "pizza_service")
+    )
+
+    assert set(Graph().parse(data=value, format="nt")) == set(rdflib_graph)
+
+
+def test_turtle_prefixed_names():
+    payload_format = TurtleFormat()
+
+    assert payload_format.term(RDFS.label) == "rdfs:label"
+    assert payload_format.term(Literal("1.0", datatype=XSD.float)) == '"1.0"^^xsd:float'
+    # not a valid local name, written in full
+    assert payload_format.term(URIRef("http://www.w3.org/2000/01/rdf-schema#a.b")) == (
+        "<http://www.w3.org/2000/01/rdf-schema#a.b>"
+    )
+
+
+def test_chunks(graph, monkeypatch):
+    monkeypatch.setattr(payload_formats, "BODY_CHUNK_SIZE", 100)
+
+    chunks = list(NTriplesFormat().iter_payload(graph, "pizza_service"))
+
+    assert len(chunks) > 2
+    assert all(isinstance(chunk, bytes) for chunk in chunks)
+    parse_payload(chunks)
+
+
+def test_empty_graph():
+    with pytest.raises(ValueError):
+        list(NTriplesFormat().iter_payload(TripleBuffer(), "pizza_service"))
+
+
+def test_registry():
+    assert PAYLOAD_FORMATS == {"n-triples": NTriplesFormat, "turtle": TurtleFormat}
@@ -0,0 +1,109 @@
+import pytest
+from rdflib import Graph
+
+from ..models.pizza_batch import PIZZA_COLUMNS, PizzaBatch
+from ..models.pizza_model import PizzaModel
+from ..models.vocabulary import PRICE_PROPERTY
+
+
+@pytest.fixture(name="pizza_array_dict")
+def setup_pizza_array_dict():
+    return [
+        {
+            "pizza_id": "1",
+            "pizza_name": "Margherita",
+            "pizza_description": "mozzarella,cheese",
+            "pizza_price": "10.00",
+        },
+        {
+            "pizza_id": "2",
+            "pizza_name": "Pepperoni",
+            "pizza_description": "mozzarella,cheese,pepperoni",
+            "pizza_price": "12.00",
+        },
+        {
+            "pizza_id": "3",
+            "pizza_name": "Bianca",
+            "pizza_description": "",
+            "pizza_price": "",
+        },
+    ]
+
+
+def test_from_rows(pizza_array_dict):
+    pizza_batch = PizzaBatch.from_rows(pizza_array_dict)
+
+    assert len(pizza_batch) == 3
+    assert pizza_batch.pizza_ids == ["1", "2", "3"]
+    assert pizza_batch.labels == ["Margherita", "Pepperoni", "Bianca"]
+    # the prices are in their canonical xsd:float form
+    assert pizza_batch.prices == ["10.0", "12.0", "0.0"]
+    # each distinct topping is stored once, an empty description has no topping
+    assert pizza_batch.toppings == ["mozzarella", "cheese", "pepperoni"]
+    assert list(pizza_batch.topping_offsets) == [0, 2, 5, 5]
+
+
+def test_toppings_of(pizza_array_dict):
+    pizza_batch = PizzaBatch.from_rows(pizza_array_dict)
+
+    assert pizza_batch.toppings_of(0) == ["mozzarella", "cheese"]
+    assert pizza_batch.toppings_of(1) == ["mozzarella", "cheese", "pepperoni"]
+    assert pizza_batch.toppings_of(2) == []
+
+
+def test_build_node_same_as_pizza_model(pizza_array_dict):
+    expected_graph = Graph()
+    for pizza in pizza_array_dict:
+        expected_graph = PizzaModel(pizza).build_node(expected_graph)
+
+    graph = PizzaBatch.from_rows(pizza_array_dict).build_node()
+
+    assert isinstance(graph, Graph)
+    assert set(graph) == set(expected_graph)
+
+
+def test_build_node_with_rooted_node(pizza_array_dict):
+    graph = Graph()
+
+    result = PizzaBatch.from_rows(pizza_array_dict[:1]).build_node(graph)
+
+    assert result is graph
+    assert len(graph) > 0
+
+
+def test_from_columns_same_as_from_rows(pizza_array_dict):
+    columns = {
+        column: [pizza[column] for pizza in pizza_array_dict]
+        for column in PIZZA_COLUMNS
+    }
+
+    pizza_batch = PizzaBatch.from_columns(columns)
+    expected_batch = PizzaBatch.from_rows(pizza_array_dict)
+
+    for attribute in PizzaBatch.__slots__:
+        assert getattr(pizza_batch, attribute) == getattr(expected_batch, attribute)
+    assert set(pizza_batch.build_node()) == set(expected_batch.build_node())
+
+
+def test_invalid_price_has_no_triple(pizza_array_dict):
+    pizza_array_dict[0]["pizza_price"] = "ten"
+    columns = {
+        column: [pizza[column] for pizza in pizza_array_dict]
+        for column in PIZZA_COLUMNS
+    }
+    expected_graph = Graph()
+    for pizza in pizza_array_dict:
+        expected_graph = PizzaModel(pizza).build_node(expected_graph)
+
+    pizza_batch = PizzaBatch.from_columns(columns)
+
+    assert pizza_batch.prices == [None, "12.0", "0.0"]
+    assert pizza_batch.invalid_prices == 1
+    assert set(pizza_batch.build_node()) == set(expected_graph)
+    assert len(list(expected_graph.triples((None, PRICE_PROPERTY, None)))) == 2
+
+
+def test_pizza_model_has_no_dict(pizza_array_dict):
+    pizza_model = PizzaModel(pizza_array_dict[0])
+
+    assert not hasattr(pizza_model, "__dict__")
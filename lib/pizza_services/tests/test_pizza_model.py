@@ -176,3 +176,58 @@ def test_serialize_node(pizza_dict):
     assert (
         "http://www.w3.org/2000/01/rdf-schema#label" in json_graph.keys()
     )  # assures that label attribute was set
+
+
+def normalize_jsonld(nodes: "list[dict]") -> "list[dict]":
+    """Sorts the JSON-LD nodes and their values, whose order is not significant"""
+    normalized = [
+        {
+            key: sorted(value, key=json.dumps) if isinstance(value, list) else value
+            for key, value in node.items()
+        }
+        for node in nodes
+    ]
+    return sorted(normalized, key=lambda node: node["@id"])
+
+
+def test_build_jsonld(pizza_dict):
+    pizza_model = PizzaModel(pizza_dict)
+
+    nodes = pizza_model.build_jsonld()
+
+    pizza_id = f"http://www.perfect-memory.com/profile/pizza/kb/{pizza_model.uuid}"
+    assert list(nodes)[0] == pizza_id
+    assert nodes[pizza_id]["@type"] == [
+        "http://www.perfect-memory.com/ontology/pizza/1.1#Pizza"
+    ]
+    assert nodes[pizza_id][
+        "http://www.perfect-memory.com/ontology/pizza/1.1#price"
+    ] == [{"@type": str(XSD.float), "@value": "10.0"}]
+    # the pizza and its two toppings
+    assert len(nodes) == 3
+
+
+def test_build_jsonld_equivalent_to_rdflib(pizza_array_dict):
+    pizza_array_dict = pizza_array_dict + [
+        # duplicated toppings, no description and a price that is not a float
+        {
+            "pizza_id": "3",
+            "pizza_name": "Cheese",
+            "pizza_description": "cheese,cheese",
+            "pizza_price": "9",
+        },
+        {"pizza_id": "4", "pizza_name": "", "pizza_description": "", "pizza_price": ""},
+        {"pizza_id": "5", "pizza_description": "ham", "pizza_price": "n/a"},
+    ]
+    graph = Graph()
+    nodes = {}
+    for pizza in pizza_array_dict:
+        graph = PizzaModel(pizza).build_node(graph)
+        nodes = PizzaModel(pizza).build_jsonld(nodes)
+
+    rdflib_nodes = json.loads(graph.serialize(format="json-ld"))
+
+    assert normalize_jsonld(nodes.values()) == normalize_jsonld(rdflib_nodes)
+    assert len(
+        Graph().parse(data=json.dumps(list(nodes.values())), format="json-ld")
+    ) == len(graph)
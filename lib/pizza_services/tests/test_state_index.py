@@ -0,0 +1,54 @@
+import threading
+
+import pytest
+
+from ..utils.state_index import StateIndex
+
+
+@pytest.fixture(name="state_index")
+def setup_state_index(tmp_path):
+    with StateIndex(str(tmp_path / "state.db")) as state_index:
+        yield state_index
+
+
+def test_init(state_index):
+    assert len(state_index) == 0
+
+
+def test_is_unchanged(state_index):
+    state_index.mark_sent([("uuid-1", "digest-1")])
+
+    assert state_index.is_unchanged("uuid-1", "digest-1")
+    assert not state_index.is_unchanged("uuid-1", "digest-2")
+    assert not state_index.is_unchanged("uuid-2", "digest-1")
+
+
+def test_mark_sent_replaces_digest(state_index):
+    state_index.mark_sent([("uuid-1", "digest-1")])
+    state_index.mark_sent([("uuid-1", "digest-2")])
+
+    assert len(state_index) == 1
+    assert state_index.is_unchanged("uuid-1", "digest-2")
+
+
+def test_persistence(tmp_path):
+    with StateIndex(str(tmp_path / "state.db")) as state_index:
+        state_index.mark_sent([("uuid-1", "digest-1")])
+
+    with StateIndex(str(tmp_path / "state.db")) as state_index:
+        assert state_index.is_unchanged("uuid-1", "digest-1")
+
+
+def test_used_from_other_threads(state_index):
+    def mark_sent(number):
+        state_index.mark_sent([(f"uuid-{number}", "digest")])
+
+    threads = [
+        threading.Thread(target=mark_sent, args=(number,)) for number in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(state_index) == 4
@@ -0,0 +1,155 @@
+from rdflib import Graph, Literal
+from rdflib.namespace import RDF, RDFS
+
+from ..models.pizza_model import PizzaModel
+from ..models.topping_registry import ToppingRegistry, normalize_topping, split_toppings
+from ..models.vocabulary import TOPPING_CLASS, TOPPING_PROPERTY, topping_uri
+from ..processes.ingest_pizza import IngestPizza
+from ..utils.triple_buffer import TripleBuffer
+
+
+class RowsParser:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def iter_rows(self):
+        return iter(self.rows)
+
+
+def test_normalize_topping():
+    assert normalize_topping("  Mozzarella   Cheese ") == "mozzarella cheese"
+    assert normalize_topping(" ") == ""
+
+
+def test_split_toppings():
+    assert split_toppings(" Onions, onions,,cheese  sauce , ") == [
+        "Onions",
+        "cheese sauce",
+    ]
+    assert split_toppings("") == []
+
+
+def test_add_once():
+    registry = ToppingRegistry()
+    graph = TripleBuffer()
+
+    first = registry.add("cheese", graph)
+    second = registry.add("cheese", graph)
+
+    assert first is second == topping_uri("cheese")
+    assert "cheese" in registry and len(registry) == 1
+    assert list(graph) == [
+        (first, RDF.type, TOPPING_CLASS),
+        (first, RDFS.label, Literal("cheese", lang="en")),
+    ]
+
+
+def test_add_jsonld_once():
+    registry = ToppingRegistry()
+    nodes = {}
+
+    topping_id = registry.add_jsonld("cheese", nodes)
+    nodes[topping_id]["extra"] = True
+    registry.add_jsonld("cheese", nodes)
+
+    assert topping_id == str(topping_uri("cheese"))
+    assert nodes[topping_id]["extra"] is True
+
+
+def test_pizza_spellings_share_a_node():
+    graph = PizzaModel(
+        {
+            "pizza_id": "1",
+            "pizza_name": "Onion",
+            "pizza_description": " Onions,onions ,",
+        }
+    ).build_node()
+
+    onions = topping_uri("onions")
+    assert set(graph.objects(predicate=TOPPING_PROPERTY)) == {onions}
+    assert len(list(graph.triples((onions, RDF.type, TOPPING_CLASS)))) == 1
+    # the node is keyed by the normalized name, and labeled with the first spelling
+    assert list(graph.objects(onions, RDFS.label)) == [Literal("Onions", lang="en")]
+
+
+def test_add_keeps_first_spelling():
+    registry = ToppingRegistry()
+    graph = TripleBuffer()
+
+    first = registry.add("Mozzarella", graph)
+    second = registry.add("mozzarella", graph)
+
+    assert first is second == topping_uri("mozzarella")
+    assert "MOZZARELLA" in registry
+    assert list(graph) == [
+        (first, RDF.type, TOPPING_CLASS),
+        (first, RDFS.label, Literal("Mozzarella", lang="en")),
+    ]
+
+
+def test_deferred_registers_confirmed_toppings():
+    registry = ToppingRegistry(deferred=True)
+    first, second, third = TripleBuffer(), TripleBuffer(), {}
+
+    registry.add("Cheese", first)
+    registry.add("cheese", second)
+    registry.confirm(["CHEESE"])
+    registry.add("cheese", third)
+    registry.add_jsonld("cheese", third)
+
+    # added to every graph until confirmed, with the first spelling as label
+    assert len(first) == len(second) == 2
+    assert set(second) == set(first)
+    assert "cheese" in registry
+    assert not third
+
+
+def test_ingest_adds_topping_nodes_once_per_run():
+    rows = [
+        {"pizza_id": str(index), "pizza_name": "P", "pizza_description": "Cheese, ham"}
+        for index in range(4)
+    ]
+    ingest_pizza = IngestPizza(RowsParser(rows), batch_size=2, use_triple_buffer=True)
+
+    first, second = list(ingest_pizza.iter_graphs())
+
+    cheese = topping_uri("cheese")
+    assert (cheese, RDF.type, TOPPING_CLASS) in first
+    assert (cheese, RDF.type, TOPPING_CLASS) not in second
+    # the pizzas of the later batches still reference the topping node
+    assert len([triple for triple in second if triple[2] == cheese]) == 2
+    merged = Graph()
+    for graph in (first, second):
+        graph.to_graph(merged)
+    assert len(merged) == len(
+        IngestPizza(RowsParser(rows), use_triple_buffer=True).pizzas_graph
+    )
+
+
+def test_ingest_sends_toppings_of_failed_batches_again():
+    rows = [
+        {"pizza_id": str(index), "pizza_name": "P", "pizza_description": "Cheese, ham"}
+        for index in range(6)
+    ]
+    registry = ToppingRegistry(deferred=True)
+    ingest_pizza = IngestPizza(
+        RowsParser(rows),
+        batch_size=2,
+        use_triple_buffer=True,
+        topping_registry=registry,
+    )
+    graphs = ingest_pizza.iter_graphs()
+
+    cheese = topping_uri("cheese")
+    first = next(graphs)
+    ingest_pizza.acknowledge_batch(sent=False)
+    second = next(graphs)
+    ingest_pizza.acknowledge_batch(sent=True)
+    third = next(graphs)
+    ingest_pizza.acknowledge_batch(sent=True)
+
+    # the batch after the failed one carries the topping nodes again
+    assert (cheese, RDF.type, TOPPING_CLASS) in first
+    assert (cheese, RDF.type, TOPPING_CLASS) in second
+    assert (cheese, RDF.type, TOPPING_CLASS) not in third
+    assert "cheese" in registry and "ham" in registry
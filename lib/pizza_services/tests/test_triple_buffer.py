@@ -0,0 +1,88 @@
+import pytest
+from rdflib import RDF, RDFS, Graph, Literal, URIRef
+
+from ..models.pizza_model import PizzaModel
+from ..utils.triple_buffer import TripleBuffer
+
+
+@pytest.fixture(name="triples")
+def setup_triples():
+    pizza = URIRef("http://www.perfect-memory.com/profile/pizza/kb/12345")
+    return [
+        (
+            pizza,
+            RDF.type,
+            URIRef("http://www.perfect-memory.com/ontology/pizza/1.1#Pizza"),
+        ),
+        (pizza, RDFS.label, Literal("Margherita", lang="en")),
+    ]
+
+
+def test_init(triples):
+    triple_buffer = TripleBuffer(triples)
+
+    assert len(triple_buffer) == 2
+    assert list(triple_buffer) == triples
+
+
+def test_add_deduplicates(triples):
+    triple_buffer = TripleBuffer()
+
+    for triple in triples + triples:
+        assert triple_buffer.add(triple) is triple_buffer
+
+    assert len(triple_buffer) == 2
+    assert triples[0] in triple_buffer
+
+
+def test_update(triples):
+    triple_buffer = TripleBuffer(triples[:1])
+
+    triple_buffer.update(triples)
+
+    assert list(triple_buffer) == triples
+
+
+def test_to_graph(triples):
+    graph = TripleBuffer(triples).to_graph()
+
+    assert isinstance(graph, Graph)
+    assert set(graph) == set(triples)
+
+
+def test_to_graph_with_rooted_node(triples):
+    graph = Graph()
+    graph.add(triples[0])
+
+    result = TripleBuffer(triples[1:]).to_graph(graph)
+
+    assert result is graph
+    assert len(graph) == 2
+
+
+def test_build_node_into_triple_buffer():
+    pizza_dict = {
+        "pizza_id": "1",
+        "pizza_name": "Margherita",
+        "pizza_description": "mozzarella,cheese",
+        "pizza_price": "10.00",
+    }
+
+    triple_buffer = PizzaModel(pizza_dict).build_node(TripleBuffer())
+
+    assert isinstance(triple_buffer, TripleBuffer)
+    assert set(triple_buffer) == set(PizzaModel(pizza_dict).build_node())
+
+
+def test_serialize(triples):
+    serialized = TripleBuffer(triples).serialize(format="nt")
+
+    assert set(Graph().parse(data=serialized, format="nt")) == set(triples)
+
+
+def test_digest(triples):
+    digest = TripleBuffer(triples).digest()
+
+    # the digest does not depend on the insertion order
+    assert TripleBuffer(reversed(triples)).digest() == digest
+    assert TripleBuffer(triples[:1]).digest() != digest
@@ -0,0 +1,90 @@
+import uuid
+
+import pytest
+from rdflib import Literal, URIRef
+from rdflib.namespace import XSD
+
+from ..models import vocabulary
+from ..models.pizza_model import PizzaModel
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    vocabulary.clear_intern_cache()
+    yield
+    vocabulary.clear_intern_cache()
+
+
+def test_constants():
+    assert vocabulary.PIZZA_CLASS == URIRef(
+        "http://www.perfect-memory.com/ontology/pizza/1.1#Pizza"
+    )
+    assert vocabulary.TOPPING_CLASS == URIRef(
+        "http://www.perfect-memory.com/ontology/pizza/1.1#Topping"
+    )
+    assert vocabulary.TOPPING_PROPERTY == URIRef(
+        "http://www.perfect-memory.com/ontology/pizza/1.1#topping"
+    )
+    assert vocabulary.PRICE_PROPERTY == URIRef(
+        "http://www.perfect-memory.com/ontology/pizza/1.1#price"
+    )
+
+
+def test_topping_uri():
+    topping_uri = vocabulary.topping_uri("cheese")
+
+    assert topping_uri == URIRef(
+        "http://www.perfect-memory.com/profile/pizza/kb/"
+        f"{uuid.uuid5(uuid.NAMESPACE_DNS, 'cheese')}"
+    )
+    # the same object is returned for the same topping
+    assert vocabulary.topping_uri("cheese") is topping_uri
+
+
+def test_literals_are_interned():
+    assert vocabulary.en_literal("cheese") == Literal("cheese", lang="en")
+    assert vocabulary.en_literal("cheese") is vocabulary.en_literal("cheese")
+    assert vocabulary.float_literal("10.00") == Literal("10.00", datatype=XSD.float)
+    assert vocabulary.float_literal("10.00") is vocabulary.float_literal("10.00")
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("10.00", "10.0"), ("12", "12.0"), (" 1e20 ", "1e+20"), ("0.0", "0.0")],
+)
+def test_canonical_price(value, expected):
+    assert vocabulary.canonical_price(value) == expected
+    # same lexical form as the one normalized by rdflib
+    assert str(vocabulary.float_literal(value)) == expected
+
+
+@pytest.mark.parametrize("value", ["", "ten", "-1.00", "nan", "inf"])
+def test_canonical_price_invalid(value):
+    assert vocabulary.canonical_price(value) is None
+
+
+def test_intern_cache_info():
+    for pizza_id in range(10):
+        PizzaModel(
+            {
+                "pizza_id": str(pizza_id),
+                "pizza_name": "Margherita",
+                "pizza_description": "mozzarella,cheese",
+                "pizza_price": "10.00",
+            }
+        ).build_node()
+
+    cache_info = vocabulary.intern_cache_info()
+
+    assert cache_info["topping_uri"]["misses"] == 2
+    assert cache_info["topping_uri"]["hits"] == 18
+    assert cache_info["float_literal"]["currsize"] == 1
+    assert cache_info["topping_uri"]["maxsize"] == vocabulary.TERM_CACHE_SIZE
+
+
+def test_clear_intern_cache():
+    vocabulary.topping_uri("cheese")
+
+    vocabulary.clear_intern_cache()
+
+    assert vocabulary.intern_cache_info()["topping_uri"]["currsize"] == 0
@@ -0,0 +1,126 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from typing import Callable, Iterable, Iterator
+
+# marks the end of the items produced by a prefetch thread
+_END = object()
+
+
+def map_in_flight(
+    executor: Executor,
+    func: Callable,
+    items: Iterable,
+    max_in_flight: int,
+    ordered: bool = True,
+) -> Iterator:
+    """
+    Maps a function over the items in an executor, keeping at most max_in_flight calls
+    submitted at the same time.
+
+    Unlike Executor.map, the items are pulled lazily, so a generator of items is never fully
+    materialized and the memory used is bounded by max_in_flight.
+
+    Args:
+        executor (Executor): The thread or process pool running the calls.
+        func (Callable): The function called with each item.
+        items (Iterable): The items to map the function over.
+        max_in_flight (int): Maximum number of calls submitted and not yet consumed.
+        ordered (bool, optional): Whether the results are yielded in the order of the items.
+        Otherwise they are yielded as soon as they complete. Defaults to True.
+
+    Yields:
+        The result of each call, in the same order as the items if ordered.
+    """
+    if not ordered:
+        yield from _map_as_completed(executor, func, items, max_in_flight)
+        return
+
+    in_flight = deque()
+    for item in items:
+        if len(in_flight) >= max_in_flight:
+            yield in_flight.popleft().result()
+        in_flight.append(executor.submit(func, item))
+
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def _map_as_completed(
+    executor: Executor, func: Callable, items: Iterable, max_in_flight: int
+) -> Iterator:
+    """Same as map_in_flight, yielding the results in completion order"""
+    pending = set()
+    for item in items:
+        if len(pending) >= max_in_flight:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+        pending.add(executor.submit(func, item))
+
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+
+def prefetch(items: Iterable, depth: int, name: str = "prefetch") -> Iterator:
+    """
+    Iterates over the items in a background thread, at most depth items ahead of the
+    consumer.
+
+    The producer blocks once depth items are waiting, so a slow consumer bounds the memory
+    used by a fast producer. An exception raised by the producer is raised again in the
+    consumer, and the producer is stopped when the consumer stops early.
+
+    Args:
+        items (Iterable): The items to produce, e.g. a lazy parser or graph builder.
+        depth (int): Maximum number of items produced and not yet consumed.
+        name (str, optional): The name of the producer thread. Defaults to "prefetch".
+
+    Yields:
+        The items, in the same order.
+
+    Raises:
+        ValueError: If depth is below 1.
+    """
+    if depth < 1:
+        raise ValueError("depth must be at least 1.")
+
+    buffer = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def put(entry: tuple) -> bool:
+        """Waits for a free slot, giving up if the consumer stopped."""
+        while not stopped.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+        except BaseException as e:  # pylint: disable=broad-except
+            put((_END, e))
+            return
+        put((_END, None))
+
+    producer = threading.Thread(target=produce, name=name, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+        producer.join()
@@ -0,0 +1,69 @@
+import os
+
+from ..parsers.csv_sources import CSV_EXTENSIONS
+
+
+class DirectoryWatcher:
+    """
+    Finds the files dropped into a directory, to ingest each of them once.
+
+    The directory is polled: a file is ready when its size and modification time did not
+    change since the previous poll, so a file still being written or copied is not picked up
+    before it is complete. A file is picked up again if it is modified after it was ingested.
+    """
+
+    def __init__(self, directory: str, extensions: "tuple[str, ...]" = CSV_EXTENSIONS):
+        """
+        Initializes the DirectoryWatcher class.
+
+        Args:
+            directory (str): The watched directory. Its subdirectories are not watched.
+            extensions (tuple[str, ...], optional): The extensions of the files picked up,
+            compared case insensitively. Defaults to CSV_EXTENSIONS.
+
+        Raises:
+            ValueError: If the directory does not exist.
+        """
+        if not os.path.isdir(directory):
+            raise ValueError(f"{directory} is not a directory.")
+
+        self.directory = directory
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        # path -> (size, modification time) of the files seen by the previous poll
+        self._seen = {}
+        # path -> (size, modification time) of the files already picked up
+        self._picked = {}
+
+    def poll(self) -> "list[str]":
+        """
+        Lists the files ready to be ingested, and marks them as picked up.
+
+        Returns:
+            list[str]: The paths of the new, or modified, complete files, oldest first.
+        """
+        current = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if (
+                    not entry.name.lower().endswith(self.extensions)
+                    or not entry.is_file()
+                ):
+                    continue
+                stat = entry.stat()
+                current[entry.path] = (stat.st_size, stat.st_mtime_ns)
+
+        ready = [
+            path
+            for path, signature in current.items()
+            if self._seen.get(path) == signature and self._picked.get(path) != signature
+        ]
+        ready.sort(key=lambda path: (current[path][1], path))
+        for path in ready:
+            self._picked[path] = current[path]
+
+        self._seen = current
+        # the removed files are forgotten, a file dropped again with the same name is new
+        self._picked = {
+            path: self._picked[path] for path in self._picked if path in current
+        }
+        return ready
@@ -1,24 +1,106 @@
+import gzip
 import json
+import logging
+import random
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Union
 
 import requests
-from rdflib import Graph
 from requests import Response
+from requests.adapters import HTTPAdapter
 
+from .concurrency import map_in_flight
+from .interfaces.output_sink_interface import OutputSinkInterface
+from .metrics import Metrics, NullMetrics
+from .outbox import Outbox
 
-class EMHttpClient:
+if TYPE_CHECKING:
+    # only annotations, so replaying an outbox does not import rdflib
+    from rdflib import Graph
+
+    from .payload_formats import PayloadFormat
+
+logger = logging.getLogger(__name__)
+
+# transient statuses, retried with a backoff
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+def _retry_after_seconds(response: Response) -> "float | None":
+    """
+    Reads the Retry-After header of a response, given either as seconds or as an HTTP date.
+
+    Returns:
+        float: The seconds to wait, or None if the header is missing or invalid.
+    """
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class EMHttpClient(OutputSinkInterface):
     """
     Class for the Exchange Manager HTTP client.
     This class is responsible for making HTTP requests to the Exchange Manager API.
     """
 
-    def __init__(self, em_base_url: str, em_api_key: str, em_client_name: str):
+    def __init__(
+        self,
+        em_base_url: str,
+        em_api_key: str,
+        em_client_name: str,
+        pool_size: int = 10,
+        compress: bool = False,
+        metrics: Metrics = None,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        max_backoff: float = 60.0,
+        outbox: Outbox = None,
+        payload_format: "PayloadFormat" = None,
+    ):
         """
         Initializes the EMHttpClient class.
 
+        The client keeps a single requests Session, so the connections to the Exchange Manager
+        are kept alive and reused by every request, including the concurrent ones.
+
         Args:
             em_base_url (str): The base URL of the Exchange Manager API.
             em_api_key (str): The API key for the Exchange Manager API.
             em_client_name (str): The client name for the Exchange Manager API.
+            pool_size (int, optional): Maximum number of connections kept in the pool.
+            Should be at least the number of concurrent requests. Defaults to 10.
+            compress (bool, optional): Whether the request body is gzip compressed.
+            Defaults to False.
+            metrics (Metrics, optional): Records the serialization duration
+            ("jsonld_serialize"), the request latency ("http_request"), the payload bytes and
+            the responses by status class. Defaults to None (nothing is recorded).
+            retries (int, optional): Number of times a request is sent again after a
+            connection error or a transient status (429, 502, 503 or 504). Defaults to 3.
+            backoff_factor (float, optional): Base of the exponential backoff, in seconds.
+            The n-th retry waits a random time up to backoff_factor * 2 ** n, or the
+            Retry-After of the response when there is one. Defaults to 0.5.
+            max_backoff (float, optional): Maximum backoff, in seconds, including the
+            Retry-After of the responses. Defaults to 60.
+            outbox (Outbox, optional): Stores each payload until the Exchange Manager accepts
+            it, so the failed batches can be replayed with replay_outbox. Defaults to None.
+            payload_format (PayloadFormat, optional): Format the graphs are serialized to,
+            streamed into a chunked request body. Defaults to None (JSON-LD).
 
         Raises:
             ValueError: If any of the parameters is None or empty.
@@ -29,8 +111,36 @@ class EMHttpClient:
         self.em_base_url = em_base_url
         self.em_api_key = em_api_key
         self.em_client_name = em_client_name
+        self.compress = compress
+        self.metrics = metrics if metrics is not None else NullMetrics()
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.outbox = outbox
+        self.payload_format = payload_format
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {
+                "x-api-key": self.em_api_key,
+                "Content-Type": "application/json",
+                "Accept": "application/json",
+                "Connection": "keep-alive",
+            }
+        )
+
+    def close(self) -> None:
+        """Closes the pooled connections of the client."""
+        self.session.close()
+
+    def is_success(self, result: "Response | None") -> bool:
+        """Checks if the Exchange Manager accepted a request."""
+        return result is not None and result.status_code // 100 == 2
 
-    def insert_graph(self, graph: Graph) -> Response:
+    def insert_graph(self, graph: "Graph") -> Response:
         """
         Inserts a graph into Exchange Manager.
 
@@ -40,9 +150,65 @@ class EMHttpClient:
         Returns:
             Response: The response from the Exchange Manager API.
         """
-        request_url = f"{self.em_base_url}/v1/requests"
-        graph_json = json.loads(graph.serialize(format="json-ld"))
+        if self.payload_format is not None:
+            return self._insert_streamed(graph)
+
+        return self._deliver(self.serialize_graph(graph))
+
+    def insert_jsonld(self, graph_json: "list[dict]") -> Response:
+        """
+        Inserts a graph, given as its list of JSON-LD nodes, into Exchange Manager.
+
+        Args:
+            graph_json (list[dict]): The JSON-LD nodes of the graph, as rdflib serializes
+            them or as built by PizzaModel.build_jsonld.
+
+        Returns:
+            Response: The response from the Exchange Manager API, or None if the request
+            could not be sent.
+        """
+        return self._deliver(self.build_payload(graph_json))
+
+    def _insert_streamed(self, graph: "Graph") -> Response:
+        """Inserts a graph serialized by the payload format, while it is being sent."""
+
+        def iter_payload() -> "Iterator[bytes]":
+            return self.payload_format.iter_payload(graph, self.em_client_name)
+
+        if self.outbox is not None:
+            # the outbox keeps the whole payload, so it is not streamed
+            return self._deliver(self.serialize_graph(graph))
+        return self.send_payload(iter_payload)
+
+    def serialize_graph(self, graph: "Graph") -> bytes:
+        """
+        Serializes the insertGraph request body of a graph, in the payload format.
 
+        Args:
+            graph (Graph): The graph, a rdflib Graph or, with a payload format, a TripleBuffer.
+
+        Returns:
+            bytes: The request body, not compressed.
+        """
+        if self.payload_format is not None:
+            return b"".join(
+                self.payload_format.iter_payload(graph, self.em_client_name)
+            )
+
+        with self.metrics.time("jsonld_serialize"):
+            graph_json = json.loads(graph.serialize(format="json-ld"))
+        return self.build_payload(graph_json)
+
+    def build_payload(self, graph_json: "list[dict]") -> bytes:
+        """
+        Serializes the insertGraph request body of a graph.
+
+        Args:
+            graph_json (list[dict]): The JSON-LD nodes of the graph.
+
+        Returns:
+            bytes: The JSON request body, not compressed.
+        """
         payload = {
             "item_name": "insert_graph",
             "priority": "normal",
@@ -57,18 +223,241 @@ class EMHttpClient:
                 }
             },
         }
+        return json.dumps(payload).encode("utf-8")
 
-        headers = {
-            "x-api-key": self.em_api_key,
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-        }
-        try:
-            # Make the POST request
-            response = requests.post(
-                request_url, headers=headers, json=payload, timeout=500
+    def send_payload(
+        self, payload: "Union[bytes, Callable[[], Iterable[bytes]]]"
+    ) -> Response:
+        """
+        Sends a request body built by build_payload to Exchange Manager.
+
+        The body can also be given as a function returning its chunks, which are sent as they
+        are produced in a chunked request. The function is called again on each retry.
+
+        Connection errors and transient statuses are retried with an exponential backoff and
+        jitter, honoring the Retry-After header. Inserting the same graph twice adds the same
+        triples, so a request is safe to send again.
+
+        Args:
+            payload (bytes | Callable): The JSON request body, or a function returning its
+            chunks.
+
+        Returns:
+            Response: The last response from the Exchange Manager API, or None if the request
+            could not be sent. Its sent_at attribute is the time.monotonic() at which its
+            request was sent.
+        """
+        request_url = f"{self.em_base_url}/v1/requests"
+
+        headers = {}
+        if self.compress:
+            headers["Content-Encoding"] = "gzip"
+
+        if isinstance(payload, bytes):
+            body = gzip.compress(payload) if self.compress else payload
+            self.metrics.increment("payload_bytes", len(body))
+        else:
+            body = None
+
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                # Make the POST request
+                sent_at = time.monotonic()
+                with self.metrics.time("http_request"):
+                    response = self.session.post(
+                        request_url,
+                        headers=headers,
+                        data=body if body is not None else self._stream_body(payload()),
+                        timeout=500,
+                    )
+                response.sent_at = sent_at
+                self.metrics.increment(
+                    f"http_responses_{response.status_code // 100}xx"
+                )
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+            except requests.RequestException as e:
+                # connection errors and timeouts are retried
+                self.metrics.increment("http_errors")
+                logger.warning(
+                    "Request to %s failed (attempt %d of %d): %s",
+                    request_url,
+                    attempt + 1,
+                    self.retries + 1,
+                    e,
+                )
+            # pylint: disable=broad-exception-caught
+            except Exception:
+                self.metrics.increment("http_errors")
+                logger.exception("Request to %s could not be sent", request_url)
+                return None
+
+            if attempt < self.retries:
+                self.metrics.increment("http_retries")
+                time.sleep(self._backoff(attempt, response))
+
+        return response
+
+    def _stream_body(self, chunks: "Iterable[bytes]") -> "Iterator[bytes]":
+        """Yields the chunks of a streamed body, compressed if needed, counting their bytes."""
+        # wbits 31 writes the gzip header and trailer
+        compressor = zlib.compressobj(wbits=31) if self.compress else None
+        for chunk in chunks:
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                self.metrics.increment("payload_bytes", len(chunk))
+                yield chunk
+        if compressor is not None:
+            chunk = compressor.flush()
+            self.metrics.increment("payload_bytes", len(chunk))
+            yield chunk
+
+    def _backoff(self, attempt: int, response: "Response | None") -> float:
+        """
+        Returns the seconds to wait before a retry: the Retry-After of the response if it has
+        one, otherwise a random time up to the exponential backoff ("full jitter"). Both are
+        capped by max_backoff.
+        """
+        if response is not None:
+            retry_after = _retry_after_seconds(response)
+            if retry_after is not None:
+                # the server value is not trusted to be reasonable
+                return min(retry_after, self.max_backoff)
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff_factor * 2**attempt)
+        )
+
+    def _deliver(self, payload: bytes, key: str = None) -> Response:
+        """
+        Sends a payload through the outbox, when there is one: the payload is stored before
+        it is sent and removed once it is accepted.
+        """
+        if self.outbox is not None and key is None:
+            key = self.outbox.put(payload)
+
+        response = self.send_payload(payload)
+
+        if key is not None and self.is_success(response):
+            self.outbox.remove(key)
+        return response
+
+    def replay_outbox(self, max_in_flight: int = 1) -> "Iterator[Response]":
+        """
+        Sends again the payloads stored in the outbox by previous runs, oldest first. Each
+        payload accepted by the Exchange Manager is removed from the outbox.
+
+        Args:
+            max_in_flight (int, optional): Maximum number of concurrent requests.
+            Defaults to 1 (serial upload).
+
+        Yields:
+            Response: The response from the Exchange Manager API for each payload.
+
+        Raises:
+            ValueError: If the client has no outbox.
+        """
+        if self.outbox is None:
+            raise ValueError("The client has no outbox to replay.")
+
+        def replay(key: str) -> Response:
+            return self._deliver(self.outbox.read(key), key)
+
+        yield from self._insert_many(replay, list(self.outbox), max_in_flight)
+
+    def get_request_status(self, request_id: str) -> dict:
+        """
+        Gets the processing status of an Exchange Manager request.
+
+        Args:
+            request_id (str): The id returned by the request creation.
+
+        Returns:
+            dict: The request, as returned by the Exchange Manager API.
+
+        Raises:
+            requests.RequestException: If the request fails or the response is an error.
+        """
+        with self.metrics.time("http_status_request"):
+            response = self.session.get(
+                f"{self.em_base_url}/v1/requests/{request_id}", timeout=60
             )
-            return response
-        # pylint: disable=broad-exception-caught
-        except Exception as e:
-            print("An error occurred:", str(e))
+        response.raise_for_status()
+        return response.json()
+
+    def insert_graphs(
+        self, graphs: "Iterable[Graph]", max_in_flight: int = 1
+    ) -> "Iterator[Response]":
+        """
+        Inserts several graphs into Exchange Manager, one request per graph.
+
+        The requests are sent concurrently by a thread pool. At most max_in_flight graphs are
+        pulled from the iterable and uploaded at the same time, so a lazy iterable of graphs
+        is never fully materialized.
+
+        Args:
+            graphs (Iterable[Graph]): The graphs to insert.
+            max_in_flight (int, optional): Maximum number of concurrent requests.
+            Defaults to 1 (serial upload).
+
+        Yields:
+            Response: The response from the Exchange Manager API for each graph, in the same
+            order as the graphs.
+        """
+        yield from self._insert_many(self.insert_graph, graphs, max_in_flight)
+
+    def insert_jsonld_graphs(
+        self, graphs_json: "Iterable[list[dict]]", max_in_flight: int = 1
+    ) -> "Iterator[Response]":
+        """
+        Inserts several graphs, given as lists of JSON-LD nodes, into Exchange Manager.
+
+        Works like insert_graphs, one request per graph.
+
+        Args:
+            graphs_json (Iterable[list[dict]]): The JSON-LD nodes of each graph to insert.
+            max_in_flight (int, optional): Maximum number of concurrent requests.
+            Defaults to 1 (serial upload).
+
+        Yields:
+            Response: The response from the Exchange Manager API for each graph, in the same
+            order as the graphs.
+        """
+        yield from self._insert_many(self.insert_jsonld, graphs_json, max_in_flight)
+
+    def insert_payloads(
+        self, payloads: "Iterable[bytes]", max_in_flight: int = 1
+    ) -> "Iterator[Response]":
+        """
+        Sends several request bodies, built by serialize_graph or build_payload, e.g. read
+        from a PayloadCache.
+
+        Works like insert_graphs, one request per payload.
+
+        Args:
+            payloads (Iterable[bytes]): The request bodies, not compressed.
+            max_in_flight (int, optional): Maximum number of concurrent requests.
+            Defaults to 1 (serial upload).
+
+        Yields:
+            Response: The response from the Exchange Manager API for each payload, in the
+            same order as the payloads.
+        """
+        yield from self._insert_many(self._deliver, payloads, max_in_flight)
+
+    @staticmethod
+    def _insert_many(
+        insert, items: Iterable, max_in_flight: int
+    ) -> "Iterator[Response]":
+        """
+        Calls the insert function for each item with at most max_in_flight concurrent calls,
+        yielding the results in the same order as the items.
+        """
+        if max_in_flight <= 1:
+            for item in items:
+                yield insert(item)
+            return
+
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            yield from map_in_flight(executor, insert, items, max_in_flight)
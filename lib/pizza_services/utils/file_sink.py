@@ -0,0 +1,196 @@
+import gzip
+import json
+import os
+import re
+import threading
+from typing import IO
+
+from rdflib import Graph
+
+from .interfaces.output_sink_interface import OutputSinkInterface
+from .metrics import Metrics, NullMetrics
+from .payload_formats import PAYLOAD_FORMATS
+
+# extension of the shards of each output format
+SHARD_EXTENSIONS = {"json-ld": ".jsonld", "n-triples": ".nt", "turtle": ".ttl"}
+
+
+def _count_jsonld_triples(graph_json: "list[dict]") -> int:
+    """Counts the triples of expanded JSON-LD nodes, one per value of each property."""
+    return sum(
+        len(values) if isinstance(values, list) else 1
+        for node in graph_json
+        for key, values in node.items()
+        if key != "@id"
+    )
+
+
+class FileSink(OutputSinkInterface):
+    """
+    Writes the graph batches to local files instead of sending them to the Exchange Manager.
+
+    The triples are written to shards of about shard_size triples as the batches arrive, so
+    only the current batch is held in memory whatever the size of the whole graph. A shard is
+    written under a temporary name and renamed once complete, so a bulk loader never reads a
+    partial shard. The shards are numbered after the ones already in the directory, so a
+    later run into the same directory adds its shards instead of overwriting the earlier
+    ones. The sink can be shared by threads, e.g. the files ingested concurrently:
+    the batches are written one at a time.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        output_format: str = "n-triples",
+        shard_size: int = 1_000_000,
+        compress: bool = False,
+        prefix: str = "pizzas",
+        metrics: Metrics = None,
+    ):
+        """
+        Initializes the FileSink class, creating the directory if needed.
+
+        Args:
+            directory (str): The directory the shards are written to.
+            output_format (str, optional): "json-ld", "n-triples" or "turtle".
+            Defaults to "n-triples".
+            shard_size (int, optional): Number of triples after which a new shard is started.
+            A batch is never split, so a shard may hold up to a batch more. Defaults to 1000000.
+            compress (bool, optional): Whether the shards are gzip compressed.
+            Defaults to False.
+            prefix (str, optional): The prefix of the shard file names. Defaults to "pizzas".
+            metrics (Metrics, optional): Records the write duration ("file_write"), the
+            triples written and the number of shards. Defaults to None (nothing is recorded).
+
+        Raises:
+            ValueError: If the format is unknown or the shard size is below 1.
+        """
+        if output_format not in SHARD_EXTENSIONS:
+            raise ValueError(f"Unknown output format: {output_format}.")
+        if shard_size < 1:
+            raise ValueError("shard_size must be at least 1.")
+
+        self.directory = directory
+        self.output_format = output_format
+        self.shard_size = shard_size
+        self.compress = compress
+        self.prefix = prefix
+        self.metrics = metrics if metrics is not None else NullMetrics()
+        # paths of the complete shards
+        self.shards = []
+        os.makedirs(directory, exist_ok=True)
+        # index of the next shard, after the shards (complete or not) of the earlier runs
+        self._next_index = self._first_free_index()
+
+        self._payload_format = (
+            PAYLOAD_FORMATS[output_format]()
+            if output_format in PAYLOAD_FORMATS
+            else None
+        )
+        self._file = None
+        self._path = None
+        self._shard_triples = 0
+        self._shard_nodes = 0
+        # guards the current shard, reentrant as a full shard is closed while writing
+        self._lock = threading.RLock()
+
+    def insert_graph(self, graph: Graph) -> str:
+        """
+        Writes a graph to the current shard.
+
+        Args:
+            graph (Graph): The graph to write, a rdflib Graph or a TripleBuffer.
+
+        Returns:
+            str: The path the shard will have once complete.
+        """
+        if self._payload_format is None:
+            return self.insert_jsonld(json.loads(graph.serialize(format="json-ld")))
+
+        with self._lock:
+            shard = self._current_shard()
+            with self.metrics.time("file_write"):
+                shard.writelines(self._payload_format.iter_text(graph))
+            self._written(len(graph))
+            return self._path
+
+    def insert_jsonld(self, graph_json: "list[dict]") -> str:
+        """
+        Writes a graph, given as its list of JSON-LD nodes, to the current shard.
+
+        Args:
+            graph_json (list[dict]): The JSON-LD nodes of the graph.
+
+        Returns:
+            str: The path the shard will have once complete.
+
+        Raises:
+            ValueError: If the output format is not JSON-LD.
+        """
+        if self._payload_format is not None:
+            raise ValueError("JSON-LD nodes can only be written to JSON-LD shards.")
+
+        with self._lock:
+            shard = self._current_shard()
+            with self.metrics.time("file_write"):
+                for node in graph_json:
+                    # the shard is a single JSON array of nodes
+                    shard.write(",\n" if self._shard_nodes else "")
+                    shard.write(json.dumps(node))
+                    self._shard_nodes += 1
+            self._written(_count_jsonld_triples(graph_json))
+            return self._path
+
+    def close(self) -> None:
+        """Completes the current shard."""
+        with self._lock:
+            if self._file is None:
+                return
+
+            if self._payload_format is None:
+                self._file.write("\n]\n")
+            self._file.close()
+            os.replace(self._path + ".part", self._path)
+            self.shards.append(self._path)
+            self.metrics.increment("shards_written")
+            self._file = None
+
+    def _current_shard(self) -> IO:
+        """Returns the shard being written, starting a new one if the current one is full."""
+        if self._file is not None and self._shard_triples >= self.shard_size:
+            self.close()
+        if self._file is None:
+            extension = SHARD_EXTENSIONS[self.output_format] + (
+                ".gz" if self.compress else ""
+            )
+            self._path = os.path.join(
+                self.directory, f"{self.prefix}-{self._next_index:05d}{extension}"
+            )
+            self._next_index += 1
+            self._file = self._open(self._path + ".part")
+            self._shard_triples = 0
+            self._shard_nodes = 0
+            if self._payload_format is None:
+                self._file.write("[\n")
+        return self._file
+
+    def _first_free_index(self) -> int:
+        """Returns the index following the highest one of the shards in the directory."""
+        # any format and compression, a shard of another format would have the same index
+        shard_name = re.compile(re.escape(self.prefix) + r"-(\d+)\..+")
+        indexes = [
+            int(match.group(1))
+            for match in map(shard_name.fullmatch, os.listdir(self.directory))
+            if match is not None
+        ]
+        return max(indexes, default=-1) + 1
+
+    def _open(self, path: str) -> IO:
+        if self.compress:
+            # the default level 9 is much slower for a small gain on this kind of text
+            return gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+        return open(path, "w", encoding="utf-8")
+
+    def _written(self, triples: int) -> None:
+        self._shard_triples += triples
+        self.metrics.increment("output_triples", triples)
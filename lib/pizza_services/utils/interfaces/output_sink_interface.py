@@ -0,0 +1,53 @@
+from typing import TYPE_CHECKING, Any, Iterable, Iterator
+
+if TYPE_CHECKING:
+    from rdflib import Graph
+
+
+class OutputSinkInterface:
+    """
+    Output sink interface class.
+
+    A sink receives the graph batches built by IngestPizza, e.g. to send them to the Exchange
+    Manager or to write them to files.
+    """
+
+    def __enter__(self) -> "OutputSinkInterface":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def insert_graph(self, graph: "Graph") -> Any:  # pragma: no cover
+        """insert_graph method to be implement in the child classes"""
+        raise NotImplementedError
+
+    def insert_jsonld(self, graph_json: "list[dict]") -> Any:  # pragma: no cover
+        """insert_jsonld method to be implement in the child classes"""
+        raise NotImplementedError
+
+    def insert_graphs(
+        self, graphs: "Iterable[Graph]", max_in_flight: int = 1
+    ) -> Iterator:
+        """
+        Inserts several graphs, yielding the result of each one in the same order.
+
+        The default implementation inserts them one by one. Child classes that can insert
+        concurrently should override this method.
+        """
+        for graph in graphs:
+            yield self.insert_graph(graph)
+
+    def insert_jsonld_graphs(
+        self, graphs_json: "Iterable[list[dict]]", max_in_flight: int = 1
+    ) -> Iterator:
+        """Same as insert_graphs, for graphs given as lists of JSON-LD nodes."""
+        for graph_json in graphs_json:
+            yield self.insert_jsonld(graph_json)
+
+    def is_success(self, result: Any) -> bool:
+        """Checks if the result of an insert means the graph was inserted."""
+        return result is not None
+
+    def close(self) -> None:
+        """Releases the resources of the sink."""
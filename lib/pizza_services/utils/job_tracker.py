@@ -0,0 +1,305 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests import Response
+
+from .em_http_client import EMHttpClient
+from .metrics import Metrics, NullMetrics
+
+# statuses of an Exchange Manager request once it is processed
+SUCCESS_STATUSES = frozenset({"done", "success", "succeeded", "completed"})
+FAILURE_STATUSES = frozenset({"failed", "error", "cancelled", "canceled"})
+
+
+class Job:
+    """An Exchange Manager request followed by a JobTracker"""
+
+    __slots__ = (
+        "request_id",
+        "submitted_at",
+        "completed_at",
+        "state",
+        "status",
+        "polls",
+        "poll_errors",
+    )
+
+    PENDING = "pending"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    TIMED_OUT = "timed_out"
+    # its status could not be read max_poll_errors times in a row
+    LOST = "lost"
+    # states of the jobs completed by the Exchange Manager, the others were given up
+    PROCESSED = frozenset({SUCCEEDED, FAILED})
+
+    def __init__(self, request_id: str, submitted_at: float):
+        self.request_id = request_id
+        self.submitted_at = submitted_at
+        self.completed_at = None
+        # state of the tracking, one of the constants above
+        self.state = Job.PENDING
+        # last status returned by the Exchange Manager
+        self.status = None
+        self.polls = 0
+        # consecutive polls that failed to read the status
+        self.poll_errors = 0
+
+    @property
+    def latency(self) -> "float | None":
+        """Seconds from the insertGraph request to its completion, None while pending."""
+        if self.completed_at is None:
+            return None
+        return self.completed_at - self.submitted_at
+
+
+def _percentile(sorted_values: "list[float]", percentile: float) -> float:
+    """Nearest-rank percentile of a sorted, non empty, list"""
+    index = max(int(round(percentile / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+class JobTracker:
+    """
+    Follows the asynchronous processing of insertGraph requests by the Exchange Manager.
+
+    The Exchange Manager accepts a request before processing it, so a 2xx response only means
+    the graph was queued. The tracker captures the id of each request and polls its status
+    until it is done, failed or timed out. A job whose status can not be read, e.g. an id the
+    status endpoint does not know, is given up after a few polls in a row.
+
+    A single scheduler thread keeps the next poll time of every pending job in a heap and hands
+    the due polls to a small thread pool, so thousands of in-flight jobs are followed with a
+    bounded number of threads. Each job is polled with an exponential backoff.
+    """
+
+    def __init__(
+        self,
+        em_http_client: EMHttpClient,
+        poll_interval: float = 1.0,
+        max_poll_interval: float = 30.0,
+        timeout: float = None,
+        max_poll_errors: int = 5,
+        pollers: int = 4,
+        metrics: Metrics = None,
+    ):
+        """
+        Initializes the JobTracker class.
+
+        Args:
+            em_http_client (EMHttpClient): The client used to get the status of the requests.
+            poll_interval (float, optional): Seconds before the first poll of a job, doubled
+            after each poll. Defaults to 1.
+            max_poll_interval (float, optional): Maximum seconds between two polls of a job.
+            Defaults to 30.
+            timeout (float, optional): Seconds after which a pending job is given up.
+            Defaults to None (no timeout).
+            max_poll_errors (int, optional): Number of consecutive polls failing to read the
+            status of a job after which it is given up as lost. Defaults to 5.
+            pollers (int, optional): Number of threads polling the statuses. Defaults to 4.
+            metrics (Metrics, optional): Records the completion latency of the processed
+            jobs ("job_latency") and the number of jobs by final state. Defaults to None
+            (nothing is recorded).
+
+        Raises:
+            ValueError: If max_poll_errors is below 1.
+        """
+        if max_poll_errors < 1:
+            raise ValueError("max_poll_errors must be at least 1.")
+
+        self.em_http_client = em_http_client
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.timeout = timeout
+        self.max_poll_errors = max_poll_errors
+        self.metrics = metrics if metrics is not None else NullMetrics()
+        self.jobs = []
+
+        # heap of (next poll time, sequence, job), the sequence breaks the ties
+        self._schedule = []
+        self._sequence = itertools.count()
+        self._pending = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=pollers)
+        self._scheduler = threading.Thread(target=self._run_scheduler, daemon=True)
+        self._scheduler.start()
+
+    def __enter__(self) -> "JobTracker":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def track(self, response: Response, submitted_at: float = None) -> Job:
+        """
+        Starts following the request created by an insertGraph response.
+
+        Args:
+            response (Response): The 2xx response of the insertGraph request, whose JSON body
+            has the id of the request ("id" or "request_id").
+            submitted_at (float, optional): The time.monotonic() at which the request was
+            sent. Defaults to None (the time the response started, less its elapsed time).
+
+        Returns:
+            Job: The tracked job, updated as its status is polled.
+
+        Raises:
+            ValueError: If the response has no request id.
+        """
+        try:
+            body = response.json()
+        except ValueError as e:
+            raise ValueError("The response has no JSON body.") from e
+        request_id = (
+            body.get("id", body.get("request_id")) if isinstance(body, dict) else None
+        )
+        if not request_id:
+            raise ValueError("The response has no request id.")
+
+        if submitted_at is None:
+            # the request was sent when the response started, so the latency includes the
+            # upload. Too late if the response waited to be tracked, e.g. behind other ones
+            submitted_at = time.monotonic() - response.elapsed.total_seconds()
+        job = Job(str(request_id), submitted_at)
+        with self._condition:
+            self.jobs.append(job)
+            self._pending += 1
+            self._push(job, time.monotonic() + self.poll_interval)
+        return job
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Waits until every tracked job is completed.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait. Defaults to None (no limit).
+
+        Returns:
+            bool: True if no job is pending anymore.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self) -> None:
+        """Stops the scheduler and the pollers. Pending jobs are not polled anymore."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._scheduler.join()
+        self._executor.shutdown(wait=True)
+
+    def report(self) -> dict:
+        """
+        Summarizes the tracked jobs.
+
+        Returns:
+            dict: The number of jobs by state, the throughput (processed jobs per second from
+            the first request to the last completion) and the completion latency in seconds
+            of the processed jobs (min, mean, p50, p95 and max).
+        """
+        with self._condition:
+            jobs = list(self.jobs)
+
+        states = {
+            Job.PENDING: 0,
+            Job.SUCCEEDED: 0,
+            Job.FAILED: 0,
+            Job.TIMED_OUT: 0,
+            Job.LOST: 0,
+        }
+        for job in jobs:
+            states[job.state] += 1
+
+        report = {"jobs": len(jobs), **states, "throughput": 0.0, "latency": None}
+        # the timed out and lost jobs were given up, they have no completion latency
+        processed = [job for job in jobs if job.state in Job.PROCESSED]
+        if not processed:
+            return report
+
+        latencies = sorted(job.latency for job in processed)
+        elapsed = max(job.completed_at for job in processed) - min(
+            job.submitted_at for job in jobs
+        )
+        report["throughput"] = len(processed) / elapsed if elapsed > 0 else 0.0
+        report["latency"] = {
+            "min": latencies[0],
+            "mean": sum(latencies) / len(latencies),
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "max": latencies[-1],
+        }
+        return report
+
+    def _push(self, job: Job, poll_at: float) -> None:
+        """Schedules the next poll of a job. Must be called holding the condition."""
+        heapq.heappush(self._schedule, (poll_at, next(self._sequence), job))
+        self._condition.notify_all()
+
+    def _run_scheduler(self) -> None:
+        """Hands the due polls to the pollers until the tracker is closed."""
+        with self._condition:
+            while not self._closed:
+                if not self._schedule:
+                    self._condition.wait()
+                    continue
+                poll_at, _, job = self._schedule[0]
+                delay = poll_at - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._schedule)
+                self._executor.submit(self._poll, job)
+
+    def _poll(self, job: Job) -> None:
+        """Gets the status of a job, then completes it or schedules its next poll."""
+        try:
+            status = self.em_http_client.get_request_status(job.request_id).get(
+                "status"
+            )
+        except (requests.RequestException, ValueError, AttributeError):
+            # polled again later, like a pending job, unless it failed too many times
+            self.metrics.increment("job_poll_errors")
+            status = None
+            failed = True
+        else:
+            failed = False
+
+        now = time.monotonic()
+        with self._condition:
+            job.polls += 1
+            job.poll_errors = job.poll_errors + 1 if failed else 0
+            if status is not None:
+                job.status = status
+
+            normalized = str(status).lower()
+            if normalized in SUCCESS_STATUSES:
+                self._complete(job, Job.SUCCEEDED, now)
+            elif normalized in FAILURE_STATUSES:
+                self._complete(job, Job.FAILED, now)
+            elif job.poll_errors >= self.max_poll_errors:
+                self._complete(job, Job.LOST, now)
+            elif self.timeout is not None and now - job.submitted_at >= self.timeout:
+                self._complete(job, Job.TIMED_OUT, now)
+            else:
+                interval = min(
+                    self.poll_interval * 2 ** min(job.polls, 16), self.max_poll_interval
+                )
+                if self.timeout is not None:
+                    # polled once more when the timeout expires
+                    interval = min(interval, job.submitted_at + self.timeout - now)
+                self._push(job, now + interval)
+
+    def _complete(self, job: Job, state: str, now: float) -> None:
+        """Records the completion of a job. Must be called holding the condition."""
+        job.state = state
+        job.completed_at = now
+        self._pending -= 1
+        self.metrics.increment(f"jobs_{state}")
+        if state in Job.PROCESSED:
+            self.metrics.observe("job_latency", job.latency)
+        self._condition.notify_all()
@@ -0,0 +1,199 @@
+import json
+import threading
+import time
+from contextlib import nullcontext
+from typing import Iterable, Iterator
+
+
+class _Timer:
+    """Context manager observing the duration of its block into a Metrics object"""
+
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+        self.start = None
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+
+class Metrics:
+    """
+    Collects the durations and counters of an ingestion run.
+
+    The parser, the ingestion process and the http client record into the same Metrics object,
+    which is exported at the end of the run as a JSON summary or a Prometheus text file.
+    The methods are thread safe, so the concurrent uploads can record into it.
+    """
+
+    def __init__(self, prefix: str = "pizza_ingestion"):
+        """
+        Initializes the Metrics class.
+
+        Args:
+            prefix (str, optional): Prefix of the metric names in the Prometheus export.
+            Defaults to "pizza_ingestion".
+        """
+        self.prefix = prefix
+        self.timers = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def time(self, name: str) -> _Timer:
+        """
+        Returns a context manager observing the duration of its block.
+
+        Args:
+            name (str): The name of the timer.
+        """
+        return _Timer(self, name)
+
+    def observe(self, name: str, seconds: float) -> None:
+        """
+        Records a duration.
+
+        Args:
+            name (str): The name of the timer.
+            seconds (float): The duration to record.
+        """
+        with self._lock:
+            timer = self.timers.setdefault(
+                name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            )
+            timer["count"] += 1
+            timer["total_seconds"] += seconds
+            timer["max_seconds"] = max(timer["max_seconds"], seconds)
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """
+        Increments a counter.
+
+        Args:
+            name (str): The name of the counter.
+            value (float, optional): The value added to the counter. Defaults to 1.
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def timed_iter(self, name: str, iterable: Iterable) -> Iterator:
+        """
+        Yields the items of the iterable, observing the time spent producing each one.
+
+        The time spent by the consumer between two items is not counted, so it measures a
+        lazy stage, like a parser or a graph builder, on its own.
+
+        Args:
+            name (str): The name of the timer.
+            iterable (Iterable): The iterable to time.
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe(name, time.perf_counter() - start)
+            yield item
+
+    def to_dict(self) -> dict:
+        """
+        Returns the recorded metrics.
+
+        Returns:
+            dict: The timers and counters, indexed by name.
+        """
+        with self._lock:
+            return {
+                "timers": {name: dict(timer) for name, timer in self.timers.items()},
+                "counters": dict(self.counters),
+            }
+
+    def to_json(self) -> str:
+        """Returns the recorded metrics as a JSON summary."""
+        return json.dumps(self.to_dict(), indent=2, sort_keys=True)
+
+    def to_prometheus(self) -> str:
+        """Returns the recorded metrics in the Prometheus text exposition format."""
+        metrics = self.to_dict()
+        lines = []
+        for name, timer in sorted(metrics["timers"].items()):
+            metric = f"{self.prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            lines.append(f"{metric}_count {timer['count']}")
+            lines.append(f"{metric}_sum {timer['total_seconds']}")
+            lines.append(f"# TYPE {metric}_max gauge")
+            lines.append(f"{metric}_max {timer['max_seconds']}")
+        for name, value in sorted(metrics["counters"].items()):
+            metric = f"{self.prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        Writes the recorded metrics to a file, in the Prometheus text format if the path ends
+        with ".prom" and as a JSON summary otherwise.
+
+        Args:
+            path (str): The path of the file.
+        """
+        content = self.to_prometheus() if path.endswith(".prom") else self.to_json()
+        with open(path, "w", encoding="utf-8") as output:
+            output.write(content)
+
+
+class NullMetrics(Metrics):
+    """Metrics that records nothing, used when no instrumentation is requested"""
+
+    def time(self, name: str) -> nullcontext:
+        return nullcontext()
+
+    def observe(self, name: str, seconds: float) -> None:
+        pass
+
+    def increment(self, name: str, value: float = 1) -> None:
+        pass
+
+    def timed_iter(self, name: str, iterable: Iterable) -> Iterator:
+        return iter(iterable)
+
+
+class CountingMetrics(NullMetrics):
+    """Metrics that records only the counters, e.g. for the summary of an uninstrumented run"""
+
+    def increment(self, name: str, value: float = 1) -> None:
+        Metrics.increment(self, name, value)
+
+
+class ScopedMetrics(Metrics):
+    """
+    Metrics of a part of a run, e.g. of one of its files, also recorded into the metrics of
+    the whole run.
+    """
+
+    def __init__(self, parent: Metrics = None):
+        """
+        Initializes the ScopedMetrics class.
+
+        Args:
+            parent (Metrics, optional): The metrics of the whole run. Defaults to None
+            (recorded only in the scoped metrics).
+        """
+        parent = parent if parent is not None else NullMetrics()
+        super().__init__(parent.prefix)
+        self.parent = parent
+
+    def observe(self, name: str, seconds: float) -> None:
+        super().observe(name, seconds)
+        self.parent.observe(name, seconds)
+
+    def increment(self, name: str, value: float = 1) -> None:
+        super().increment(name, value)
+        self.parent.increment(name, value)
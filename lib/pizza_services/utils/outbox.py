@@ -0,0 +1,109 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from typing import Iterator
+
+# extension of the payload files, the temporary files being written have another one
+PAYLOAD_EXTENSION = ".json"
+# name of a payload file: the time it was stored, then the sha256 of the payload
+PAYLOAD_NAME = re.compile(r"\d+-([0-9a-f]{64})" + re.escape(PAYLOAD_EXTENSION))
+
+
+class Outbox:
+    """
+    Durable on-disk queue of the serialized insertGraph payloads not yet accepted by the
+    Exchange Manager.
+
+    Each payload is written to its own file before it is sent and removed once the Exchange
+    Manager accepts it, so the batches of an interrupted or failed run can be replayed without
+    parsing the CSV or building the graphs again. A payload is keyed by its digest: the same
+    payload is stored only once.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initializes the Outbox class, creating the directory if needed.
+
+        Args:
+            directory (str): The directory the payload files are written to.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._last_time = 0
+        # digest of each stored payload -> key of its file, the other files are ignored
+        self._keys = {}
+        for name in os.listdir(directory):
+            match = PAYLOAD_NAME.fullmatch(name)
+            if match is not None:
+                self._keys[match.group(1)] = name[: -len(PAYLOAD_EXTENSION)]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._keys)
+
+    def __iter__(self) -> "Iterator[str]":
+        """Iterates over the keys of the stored payloads, oldest first."""
+        with self._lock:
+            return iter(sorted(self._keys.values()))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + PAYLOAD_EXTENSION)
+
+    def put(self, payload: bytes) -> str:
+        """
+        Stores a payload. The file is written atomically, so a run killed while writing it
+        never leaves a truncated payload behind.
+
+        Args:
+            payload (bytes): The serialized payload.
+
+        Returns:
+            str: The key of the payload, used to read or remove it.
+        """
+        digest = hashlib.sha256(payload).hexdigest()
+        with self._lock:
+            if digest in self._keys:
+                return self._keys[digest]
+            # the time prefix keeps the payloads in the order they were stored
+            self._last_time = max(time.time_ns(), self._last_time + 1)
+            key = f"{self._last_time:020d}-{digest}"
+            self._keys[digest] = key
+
+        path = self._path(key)
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as payload_file:
+            payload_file.write(payload)
+            payload_file.flush()
+            os.fsync(payload_file.fileno())
+        os.replace(temporary_path, path)
+        return key
+
+    def read(self, key: str) -> bytes:
+        """
+        Reads a stored payload.
+
+        Args:
+            key (str): The key of the payload.
+
+        Returns:
+            bytes: The serialized payload.
+        """
+        with open(self._path(key), "rb") as payload_file:
+            return payload_file.read()
+
+    def remove(self, key: str) -> None:
+        """
+        Removes a payload, once it was accepted by the Exchange Manager.
+
+        Args:
+            key (str): The key of the payload.
+        """
+        with self._lock:
+            self._keys.pop(key.split("-", 1)[-1], None)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
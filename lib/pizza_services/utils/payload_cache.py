@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from .metrics import Metrics, NullMetrics
+
+# extension of the cached payload files, the temporary files being written have another one
+CACHE_EXTENSION = ".payload"
+
+
+class PayloadCache:
+    """
+    Size bounded on-disk cache of the serialized insertGraph payloads.
+
+    A payload is stored under a key computed from everything it depends on (the rows of the
+    batch, the model version and the payload options), so an unchanged batch of a later run
+    is sent as is, without building nor serializing its graph again. When the cache exceeds
+    its maximum size, the least recently used payloads are removed.
+    """
+
+    def __init__(
+        self, directory: str, max_bytes: int = 1 << 30, metrics: Metrics = None
+    ):
+        """
+        Initializes the PayloadCache class, creating the directory if needed.
+
+        Args:
+            directory (str): The directory the payload files are written to.
+            max_bytes (int, optional): Maximum total size of the cached payloads, in bytes.
+            Defaults to 1 GiB.
+            metrics (Metrics, optional): Records the cache hits, misses and evictions.
+            Defaults to None (nothing is recorded).
+
+        Raises:
+            ValueError: If max_bytes is below 1.
+        """
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1.")
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.metrics = metrics if metrics is not None else NullMetrics()
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+        # key -> size of the payload, least recently used first. The modification time of a
+        # file is its last use, so the order survives across runs
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(CACHE_EXTENSION):
+                stat = os.stat(os.path.join(directory, name))
+                entries.append(
+                    (stat.st_mtime_ns, name[: -len(CACHE_EXTENSION)], stat.st_size)
+                )
+        entries.sort()
+        self._sizes = OrderedDict((key, size) for _, key, size in entries)
+        self.size = sum(self._sizes.values())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sizes)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._sizes
+
+    @staticmethod
+    def key_of(*parts) -> str:
+        """
+        Computes the key of a payload from the values it is built from.
+
+        Args:
+            *parts: JSON serializable values, e.g. the model version and the rows of a batch.
+
+        Returns:
+            str: The hexadecimal sha256 of the values.
+        """
+        return hashlib.sha256(
+            json.dumps(parts, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        ).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CACHE_EXTENSION)
+
+    def get(self, key: str) -> "bytes | None":
+        """
+        Reads a cached payload, marking it as the most recently used.
+
+        Args:
+            key (str): The key of the payload.
+
+        Returns:
+            bytes: The payload, or None if it is not cached.
+        """
+        with self._lock:
+            if key not in self._sizes:
+                self.metrics.increment("payload_cache_misses")
+                return None
+            self._sizes.move_to_end(key)
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as payload_file:
+                payload = payload_file.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # removed by another process sharing the directory
+            with self._lock:
+                self.size -= self._sizes.pop(key, 0)
+            self.metrics.increment("payload_cache_misses")
+            return None
+
+        self.metrics.increment("payload_cache_hits")
+        return payload
+
+    def put(self, key: str, payload: bytes) -> None:
+        """
+        Stores a payload, then removes the least recently used ones while the cache is too
+        big. The file is written atomically, so a killed run never leaves a truncated payload
+        behind. A payload bigger than the whole cache is not stored.
+
+        Args:
+            key (str): The key of the payload.
+            payload (bytes): The serialized payload.
+        """
+        if len(payload) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "wb") as payload_file:
+            payload_file.write(payload)
+        os.replace(temporary_path, path)
+
+        with self._lock:
+            self.size += len(payload) - self._sizes.pop(key, 0)
+            self._sizes[key] = len(payload)
+            evicted = []
+            while self.size > self.max_bytes:
+                evicted_key, evicted_size = self._sizes.popitem(last=False)
+                self.size -= evicted_size
+                evicted.append(evicted_key)
+
+        for evicted_key in evicted:
+            try:
+                os.remove(self._path(evicted_key))
+            except FileNotFoundError:
+                pass
+        self.metrics.increment("payload_cache_evictions", len(evicted))
@@ -0,0 +1,186 @@
+import json
+import re
+from typing import Iterable, Iterator
+
+from rdflib import RDF, RDFS, XSD, Literal, URIRef
+
+from ..models.vocabulary import PIZZA_KB, PIZZA_ONTOLOGY
+
+# bytes buffered before a chunk of the request body is sent
+BODY_CHUNK_SIZE = 64 * 1024
+
+# local names written as prefixed names in Turtle, the other URIs are written in full
+_LOCAL_NAME = re.compile(r"[A-Za-z0-9_][A-Za-z0-9_-]*")
+
+
+def _escape(text: str) -> str:
+    """Escapes a string for a N-Triples or Turtle quoted literal"""
+    return (
+        text.replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class PayloadFormat:
+    """
+    Serializes the graph of an insertGraph request as RDF text, streamed into the request body.
+
+    The request keeps the JSON envelope of the JSON-LD requests, but the graph value is the
+    RDF text, in the format given by the media type, instead of the JSON-LD nodes. The text is
+    written triple by triple, so the payload is never held whole in memory.
+    """
+
+    name = None
+    media_type = None
+
+    def term(self, term) -> str:
+        """Writes a RDF term."""
+        if isinstance(term, Literal):
+            literal = f'"{_escape(str(term))}"'
+            if term.language:
+                return f"{literal}@{term.language}"
+            if term.datatype:
+                return f"{literal}^^{self.term(term.datatype)}"
+            return literal
+        if isinstance(term, URIRef):
+            return f"<{term}>"
+        return term.n3()
+
+    def iter_text(self, triples: "Iterable[tuple]") -> "Iterator[str]":
+        """
+        Writes the triples.
+
+        Args:
+            triples (Iterable[tuple]): The triples of the graph.
+
+        Yields:
+            str: Pieces of the serialized graph.
+        """
+        raise NotImplementedError()
+
+    def iter_payload(
+        self, graph: "Iterable[tuple]", client_name: str
+    ) -> "Iterator[bytes]":
+        """
+        Writes the insertGraph request body of a graph, in chunks of about BODY_CHUNK_SIZE
+        bytes.
+
+        Args:
+            graph (Iterable[tuple]): The graph, a rdflib Graph or a TripleBuffer.
+            client_name (str): The client name for the Exchange Manager API.
+
+        Yields:
+            bytes: The chunks of the JSON request body.
+
+        Raises:
+            ValueError: If the graph is empty.
+        """
+        triples = iter(graph)
+        first = next(triples, None)
+        if first is None:
+            raise ValueError("An empty graph can not be inserted.")
+
+        envelope = json.dumps(
+            {
+                "item_name": "insert_graph",
+                "priority": "normal",
+                "client_name": client_name,
+                "inputs": {
+                    "graph": {
+                        "type": "graph",
+                        "format": self.media_type,
+                        # setting only the first subject as the root
+                        "roots": [str(first[0])],
+                    }
+                },
+            }
+        )
+        # the value is written last, inside the closing braces of the envelope
+        head, tail = envelope[:-3], envelope[-3:]
+
+        chunk = [head, ', "value": "']
+        size = len(head)
+        for text in self.iter_text(self._chain(first, triples)):
+            # the json string escapes, without the quotes
+            text = json.dumps(text)[1:-1]
+            chunk.append(text)
+            size += len(text)
+            if size >= BODY_CHUNK_SIZE:
+                yield "".join(chunk).encode("utf-8")
+                chunk = []
+                size = 0
+        chunk.append('"' + tail)
+        yield "".join(chunk).encode("utf-8")
+
+    @staticmethod
+    def _chain(first: tuple, triples: "Iterator[tuple]") -> "Iterator[tuple]":
+        yield first
+        yield from triples
+
+
+class NTriplesFormat(PayloadFormat):
+    """Writes one triple per line, with every URI in full"""
+
+    name = "n-triples"
+    media_type = "application/n-triples"
+
+    def iter_text(self, triples: "Iterable[tuple]") -> "Iterator[str]":
+        term = self.term
+        for subject, predicate, obj in triples:
+            yield f"{term(subject)} {term(predicate)} {term(obj)} .\n"
+
+
+class TurtleFormat(PayloadFormat):
+    """
+    Writes the consecutive triples of a subject as one statement and the URIs of the pizza
+    vocabulary as prefixed names.
+    """
+
+    name = "turtle"
+    media_type = "text/turtle"
+
+    PREFIXES = {
+        "kb": PIZZA_KB,
+        "pizza": PIZZA_ONTOLOGY,
+        "rdf": str(RDF),
+        "rdfs": str(RDFS),
+        "xsd": str(XSD),
+    }
+
+    def term(self, term) -> str:
+        if isinstance(term, URIRef):
+            for prefix, namespace in self.PREFIXES.items():
+                if term.startswith(namespace) and _LOCAL_NAME.fullmatch(
+                    term[len(namespace) :]
+                ):
+                    return f"{prefix}:{term[len(namespace):]}"
+        return super().term(term)
+
+    def iter_text(self, triples: "Iterable[tuple]") -> "Iterator[str]":
+        yield "".join(
+            f"@prefix {prefix}: <{namespace}> .\n"
+            for prefix, namespace in self.PREFIXES.items()
+        )
+
+        term = self.term
+        subject = None
+        for triple_subject, predicate, obj in triples:
+            written_predicate = "a" if predicate == RDF.type else term(predicate)
+            if triple_subject == subject:
+                yield f" ;\n    {written_predicate} {term(obj)}"
+            else:
+                if subject is not None:
+                    yield " .\n"
+                subject = triple_subject
+                yield f"\n{term(subject)} {written_predicate} {term(obj)}"
+        if subject is not None:
+            yield " .\n"
+
+
+# formats selectable by name, the JSON-LD requests are built by EMHttpClient itself
+PAYLOAD_FORMATS = {
+    payload_format.name: payload_format
+    for payload_format in (NTriplesFormat, TurtleFormat)
+}
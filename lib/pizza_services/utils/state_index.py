@@ -0,0 +1,78 @@
+import sqlite3
+import threading
+from typing import Iterable
+
+
+class StateIndex:
+    """
+    Persistent index of the pizzas already sent to the Exchange Manager.
+
+    The index is a SQLite database mapping the deterministic uuid of each pizza to the digest
+    of the triples that were sent for it. It lets an ingestion skip the pizzas that did not
+    change since the last successful run.
+
+    The index can be shared by threads, e.g. the stages of a pipeline or the files ingested
+    concurrently: the database is accessed by one of them at a time.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initializes the StateIndex class, creating the database if needed.
+
+        Args:
+            path (str): The path to the SQLite database file.
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS sent_pizzas (uuid TEXT PRIMARY KEY, digest TEXT NOT NULL)"
+        )
+        self.connection.commit()
+
+    def __enter__(self) -> "StateIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM sent_pizzas"
+            ).fetchone()[0]
+
+    def is_unchanged(self, pizza_uuid: str, digest: str) -> bool:
+        """
+        Checks if a pizza was already sent with the same triples.
+
+        Args:
+            pizza_uuid (str): The uuid of the pizza.
+            digest (str): The digest of the current triples of the pizza.
+
+        Returns:
+            bool: True if the pizza was sent with the same digest, False if it is new or changed.
+        """
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT digest FROM sent_pizzas WHERE uuid = ?", (pizza_uuid,)
+            ).fetchone()
+        return row is not None and row[0] == digest
+
+    def mark_sent(self, records: "Iterable[tuple[str, str]]") -> None:
+        """
+        Records pizzas as sent.
+
+        Args:
+            records (Iterable[tuple[str, str]]): The (uuid, digest) of each sent pizza.
+        """
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO sent_pizzas (uuid, digest) VALUES (?, ?)",
+                records,
+            )
+
+    def close(self) -> None:
+        """Closes the database connection."""
+        with self._lock:
+            self.connection.close()
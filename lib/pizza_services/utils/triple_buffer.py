@@ -0,0 +1,95 @@
+import hashlib
+from typing import Iterable, Iterator
+
+from rdflib import Graph
+
+
+class TripleBuffer:
+    """
+    Append-only accumulator of triples.
+
+    It implements the small part of the rdflib Graph API used to build and send the pizzas
+    graph (add, len, iteration, membership and serialize), but keeps the triples in a plain
+    dict used as an insertion ordered set. Adding a triple is a single hash insertion, instead
+    of the three permutation indexes maintained by the rdflib Memory store, which makes it a
+    better fit for workloads that only build and export the triples.
+    """
+
+    def __init__(self, triples: "Iterable[tuple]" = ()):
+        """
+        Initializes the TripleBuffer class.
+
+        Args:
+            triples (Iterable[tuple], optional): Triples to initialize the buffer with.
+        """
+        self._triples = dict.fromkeys(triples)
+
+    def __len__(self) -> int:
+        return len(self._triples)
+
+    def __iter__(self) -> "Iterator[tuple]":
+        return iter(self._triples)
+
+    def __contains__(self, triple: tuple) -> bool:
+        return triple in self._triples
+
+    def add(self, triple: tuple) -> "TripleBuffer":
+        """
+        Adds a triple to the buffer. Duplicated triples are ignored.
+
+        Args:
+            triple (tuple): The (subject, predicate, object) triple to add.
+
+        Returns:
+            TripleBuffer: The buffer itself, like Graph.add.
+        """
+        self._triples[triple] = None
+        return self
+
+    def update(self, triples: "Iterable[tuple]") -> "TripleBuffer":
+        """
+        Adds several triples to the buffer. Duplicated triples are ignored.
+
+        Args:
+            triples (Iterable[tuple]): The triples to add.
+
+        Returns:
+            TripleBuffer: The buffer itself.
+        """
+        self._triples.update(dict.fromkeys(triples))
+        return self
+
+    def digest(self) -> str:
+        """
+        Returns a digest of the content of the buffer, independent of the insertion order.
+
+        Returns:
+            str: The sha256 hex digest of the sorted N-Triples of the buffer.
+        """
+        lines = sorted(" ".join(term.n3() for term in triple) for triple in self)
+        return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+    def to_graph(self, graph: Graph = None) -> Graph:
+        """
+        Converts the buffer into a rdflib Graph.
+
+        Args:
+            graph (Graph, optional): The graph to add the triples to.
+            If the graph is None, a new graph is created. Defaults to None.
+
+        Returns:
+            Graph: The graph with the triples of the buffer.
+        """
+        if graph is None:
+            graph = Graph()
+
+        graph.addN((subject, predicate, obj, graph) for subject, predicate, obj in self)
+        return graph
+
+    def serialize(self, *args, **kwargs):
+        """
+        Serializes the triples by converting the buffer into a Graph.
+
+        Accepts the same arguments as Graph.serialize.
+        """
+        return self.to_graph().serialize(*args, **kwargs)